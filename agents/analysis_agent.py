@@ -2,7 +2,8 @@
 Analysis Agent - Data analysis and reasoning
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from utils.deadline import Deadline
 from utils.logger import SystemLogger
 
 class AnalysisAgent:
@@ -10,12 +11,22 @@ class AnalysisAgent:
         self.name = "Analysis"
         self.logger = SystemLogger()
     
-    def analyze(self, data: List[Dict], analysis_type: str) -> Dict[str, Any]:
+    def analyze(self, data: List[Dict], analysis_type: str,
+                deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Analyze data based on the type of analysis requested
+        Skipped entirely if the deadline has already run out
         """
         self.logger.log_agent_action(self.name, "Analyzing", analysis_type)
         
+        if deadline and deadline.expired():
+            return {
+                'success': False,
+                'analysis': 'Analysis skipped: time budget exhausted',
+                'confidence': 0.0,
+                'degraded': True
+            }
+        
         if not data:
             return {
                 'success': False,
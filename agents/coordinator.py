@@ -2,42 +2,306 @@
 Coordinator Agent - Orchestrates all worker agents
 """
 
-from typing import Dict, List, Any
+import hashlib
+import re
+import threading
+import time
+from contextlib import nullcontext
+from functools import partial
+from typing import Dict, Generator, List, Any, Optional
 from agents.research_agent import ResearchAgent
 from agents.analysis_agent import AnalysisAgent
 from agents.memory_agent import MemoryAgent
+from utils.deadline import Deadline
+from utils.fragment_cache import FragmentCache
 from utils.logger import SystemLogger
+from utils.response_cache import ResponseCache
+from utils.session_memory import SessionMemoryPool, DEFAULT_BUDGET_BYTES
+from utils.task_graph import TaskGraph
+from utils.tracing import tracer
+
+# Markers that start a new sequential stage in a multi-step query
+SEQUENCE_MARKERS = r'\b(?:first|and then|after that|next|finally)\b'
+
+# Verbs that introduce an analysis sub-task rather than a research sub-task
+ANALYSIS_VERBS = [
+    'analyze', 'compare', 'identify', 'summarize', 'tradeoffs',
+    'evaluate', 'recommend'
+]
+
+# Appended to responses built from partial results after the time budget ran out
+DEGRADED_NOTICE = "\n⚠️  Partial results: the time budget ran out before every step could finish.\n"
+
+# Appended instead when a step failed outright
+FAILED_NOTICE = "\n⚠️  Partial results: some steps failed before they could finish.\n"
+
+# Why an analysis sub-task produced no analysis
+SKIPPED_OUT_OF_TIME = "time budget exhausted"
+SKIPPED_AFTER_FAILURE = "an earlier step failed"
+
+# Seconds a pipeline checkpoint is kept for a retry to resume from
+DEFAULT_CHECKPOINT_TTL = 600
 
 class CoordinatorAgent:
-    def __init__(self):
-        self.research = ResearchAgent()
-        self.analysis = AnalysisAgent()
-        self.memory = MemoryAgent()
+    def __init__(self, max_parallel_tasks: int = 4, cache_similarity_threshold: float = 0.95,
+                 session_memory_budget: int = DEFAULT_BUDGET_BYTES,
+                 session_spill_dir: Optional[str] = "logs/sessions",
+                 corpus_index: Optional[str] = None,
+                 checkpoint_ttl: Optional[float] = DEFAULT_CHECKPOINT_TTL,
+                 memory_shards: int = 1, memory: Optional[MemoryAgent] = None):
+        # Worker agents are built on first use (see the properties below)
+        self.corpus_index = corpus_index
+        # With more than one shard, the default memory is partitioned across worker processes
+        self.memory_shards = memory_shards
+        # Completed stages of research + analysis pipelines, kept for resuming a failed
+        # or timed-out run; None disables checkpointing
+        self.checkpoint_ttl = checkpoint_ttl
+        self._research = None
+        self._analysis = None
+        # A default memory built elsewhere (e.g. a SharedMemoryAgent) is used as given
+        self._memory = memory
+        self._init_lock = threading.Lock()
+        
         self.logger = SystemLogger()
         self.name = "Coordinator"
+        self.max_parallel_tasks = max_parallel_tasks
+        self.response_cache = ResponseCache(similarity_threshold=cache_similarity_threshold)
+        # Rendered topic blocks, reused across responses until the corpus changes
+        self.fragments = FragmentCache()
+        
+        # Per-session memory; research, analysis and the response cache stay shared.
+        # Session agents index inline rather than each running a write-behind thread
+        self.sessions = SessionMemoryPool(
+            partial(MemoryAgent, write_behind=False),
+            budget_bytes=session_memory_budget,
+            spill_dir=session_spill_dir
+        )
         
-    def process_query(self, query: str) -> str:
+    @property
+    def research(self) -> ResearchAgent:
+        """The research agent, built on first use"""
+        if self._research is None:
+            with self._init_lock:
+                if self._research is None:
+                    self._research = ResearchAgent(index_path=self.corpus_index)
+        return self._research
+    
+    @property
+    def analysis(self) -> AnalysisAgent:
+        """The analysis agent, built on first use"""
+        if self._analysis is None:
+            with self._init_lock:
+                if self._analysis is None:
+                    self._analysis = AnalysisAgent()
+        return self._analysis
+    
+    @property
+    def memory(self) -> MemoryAgent:
+        """The default (session-less) memory agent, built on first use"""
+        if self._memory is None:
+            with self._init_lock:
+                if self._memory is None:
+                    if self.memory_shards > 1:
+                        from agents.sharded_memory import ShardedMemoryAgent
+                        self._memory = ShardedMemoryAgent(shards=self.memory_shards)
+                    else:
+                        self._memory = MemoryAgent()
+        return self._memory
+    
+    def prewarm(self, background: bool = False) -> Optional[threading.Thread]:
+        """
+        Build every agent and load heavy modules (numpy) ahead of the first query
+        With background=True this runs on a daemon thread, which is returned
+        """
+        if background:
+            thread = threading.Thread(target=self.prewarm, name="prewarm", daemon=True)
+            thread.start()
+            return thread
+        
+        with tracer.span("prewarm"):
+            self.research
+            self.analysis
+            self.memory.embed("warm up")
+        return None
+    
+    def search_memory(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                      session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Filtered retrieval from a session's memory, or from the default memory without one
+        Returns None for an unknown session; searching never creates one
+        """
+        with self.sessions.use(session_id, create=False) if session_id else nullcontext(self.memory) as memory:
+            if memory is None:
+                return None
+            return memory.retrieve(query, top_k=top_k, filters=filters)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Session memory, cache and embedding statistics of this coordinator"""
+        return {
+            'session_memory': self.sessions.get_statistics(),
+            'response_cache': self.response_cache.get_statistics(),
+            'fragment_cache': self.fragments.get_statistics(),
+            'embeddings': self.memory.embedder.get_statistics()
+        }
+    
+    def close(self):
+        """Flush and stop the default memory, if it was built"""
+        if self._memory is not None:
+            self._memory.close()
+    
+    def process_query(self, query: str, deadline: Optional[Deadline] = None,
+                      session_id: Optional[str] = None) -> str:
         """
         Main entry point for processing user queries
         Analyzes complexity and routes to appropriate handlers
         """
+        return self.process_query_with_metadata(query, deadline=deadline, session_id=session_id)['response']
+    
+    def process_query_with_metadata(self, query: str, route: Optional[str] = None,
+                                    deadline: Optional[Deadline] = None,
+                                    session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Process a query and return the response together with its metadata
+        Returns: {'response': str, 'metadata': {'route', 'confidence', 'degraded', ...}}
+        """
+        chunks = []
+        stream = self.stream_query(query, route=route, deadline=deadline, session_id=session_id)
+        while True:
+            try:
+                chunks.append(next(stream))
+            except StopIteration as done:
+                return {'response': "".join(chunks), 'metadata': done.value}
+    
+    def stream_query(self, query: str, route: Optional[str] = None,
+                     deadline: Optional[Deadline] = None,
+                     session_id: Optional[str] = None) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Process a query, yielding each response section as soon as it is ready
+        The generator's return value is the response metadata
+        An explicit route ('memory', 'simple', 'complex', 'multi-step') skips classification
+        With a deadline, stages that run out of time return partial results and the
+        response is marked as degraded
+        Every stage is timed as a tracing span under the query's id
+        With a session id, the query reads and writes that session's memory only
+        """
+        query_id = tracer.new_query_id()
+        session = self.sessions.use(session_id) if session_id else nullcontext(self.memory)
+        with session as memory:
+            # Only the time spent producing sections counts, not the consumer's time between them
+            metadata = yield from tracer.stream("query", self._route_query(query, route, deadline, memory),
+                                                query_id=query_id)
+        
+        if session_id:
+            return {**metadata, 'query_id': query_id, 'session_id': session_id}
+        return {**metadata, 'query_id': query_id}
+    
+    def _route_query(self, query: str, route: Optional[str], deadline: Optional[Deadline],
+                     memory: MemoryAgent) -> Generator[str, None, Dict[str, Any]]:
+        """Check the response cache, then route the query to its handler; runs in the query span"""
         self.logger.log_agent_action(self.name, "Processing Query", query)
         
+        complexity = route or self.classify_query(query)
+        tracer.current_span().set_attribute('route', complexity)
+        
         # Check if it's a memory query
-        if self._is_memory_query(query):
-            return self._handle_memory_query(query)
+        if complexity == "memory":
+            return (yield from self._stream_memory_query(query, deadline, memory))
         
-        # Analyze query complexity
-        complexity = self._analyze_complexity(query)
         self.logger.log_agent_action(self.name, f"Complexity: {complexity}", query)
         
+        # Reuse the answer to the same or a near-identical earlier question
+        with tracer.span("cache_lookup"):
+            cached = self.response_cache.lookup(
+                query, complexity, self.research.corpus_version, self.memory.embed
+            )
+        if cached:
+            self.logger.log_agent_action(self.name, f"Cache Hit ({cached['metadata']['cache']})", query)
+            yield cached['response']
+            
+            # The answer may have been computed for another session; remember it in this one
+            if memory is not self.memory:
+                with tracer.span("memory_store"):
+                    memory.store(
+                        key=query,
+                        value={'response': cached['response']},
+                        metadata={
+                            'agent': 'Coordinator',
+                            'confidence': cached['metadata'].get('confidence', 0.8),
+                            'query_type': complexity
+                        }
+                    )
+            return cached['metadata']
+        
         # Route based on complexity
         if complexity == "simple":
-            return self._handle_simple_query(query)
+            stream = self._stream_simple_query(query, deadline, memory)
         elif complexity == "complex":
-            return self._handle_complex_query(query)
+            stream = self._stream_complex_query(query, deadline, memory)
         else:  # multi-step
-            return self._handle_multistep_query(query)
+            stream = self._stream_multistep_query(query, deadline, memory)
+        
+        started = time.perf_counter()
+        chunks = []
+        metadata = yield from self._record_chunks(stream, chunks)
+        
+        # Partial answers must not be served to later, unhurried requests or to retries
+        if metadata.get('degraded') or metadata.get('failed_stages'):
+            return metadata
+        
+        self.response_cache.store(
+            query, complexity, self.research.corpus_version, self.memory.embed,
+            response="".join(chunks), metadata=metadata, latency=time.perf_counter() - started
+        )
+        return metadata
+    
+    def _checkpoint_id(self, query: str, route: str) -> str:
+        """
+        Agent-state key for a pipeline's checkpoint
+        Derived from the query rather than the per-attempt query id, so retrying
+        the same question finds it; the corpus version keeps stale stages out
+        """
+        content = f"{route}|{self.research.corpus_version}|{ResponseCache.normalize(query)}"
+        return "checkpoint:" + hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    
+    def _load_checkpoint(self, memory: MemoryAgent, checkpoint_id: str) -> Dict[str, Any]:
+        """Completed stages saved by an earlier attempt, by stage name"""
+        if self.checkpoint_ttl is None:
+            return {}
+        state = memory.get_agent_state(checkpoint_id)
+        return dict(state['stages']) if state else {}
+    
+    def _save_checkpoint(self, memory: MemoryAgent, checkpoint_id: str, query: str, stages: Dict[str, Any]):
+        """Record the stages completed so far; the ttl restarts with every save"""
+        if self.checkpoint_ttl is None:
+            return
+        with tracer.span("checkpoint"):
+            memory.update_agent_state(checkpoint_id, {'query': query, 'stages': dict(stages)},
+                                      ttl=self.checkpoint_ttl)
+    
+    def _clear_checkpoint(self, memory: MemoryAgent, checkpoint_id: str):
+        """Drop a pipeline's checkpoint once it has completed"""
+        if self.checkpoint_ttl is not None:
+            memory.clear_agent_state(checkpoint_id)
+    
+    def _record_chunks(self, stream: Generator[str, None, Dict[str, Any]],
+                       chunks: List[str]) -> Generator[str, None, Dict[str, Any]]:
+        """Pass a response stream through while keeping a copy of its chunks"""
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as done:
+                return done.value
+            chunks.append(chunk)
+            yield chunk
+    
+    def classify_query(self, query: str) -> str:
+        """
+        Decide how a query will be routed
+        Returns: 'memory', 'simple', 'complex', or 'multi-step'
+        """
+        if self._is_memory_query(query):
+            return "memory"
+        return self._analyze_complexity(query)
     
     def _is_memory_query(self, query: str) -> bool:
         """Detect if query is asking about past conversations"""
@@ -77,201 +341,500 @@ class CoordinatorAgent:
         else:
             return "simple"
     
-    def _handle_memory_query(self, query: str) -> str:
+    def _stream_memory_query(self, query: str, deadline: Optional[Deadline] = None,
+                             memory: Optional[MemoryAgent] = None) -> Generator[str, None, Dict[str, Any]]:
         """Handle queries about past conversations"""
+        memory = memory or self.memory
         self.logger.log_agent_action(self.name, "Routing to Memory", query)
         
         # Retrieve from memory
-        memory_result = self.memory.retrieve(query)
-        
-        if memory_result['results']:
-            response = f"📚 I found {memory_result['count']} relevant items from our previous discussions:\n\n"
-            
-            for idx, record in enumerate(memory_result['results'][:5], 1):
-                response += f"{idx}. Topic: {record['key']}\n"
-                response += f"   Timestamp: {record['metadata']['timestamp']}\n"
-                response += f"   Confidence: {record['metadata']['confidence']:.2f}\n"
+        with tracer.span("memory_retrieve"):
+            memory_result = memory.retrieve(query, deadline=deadline)
+        degraded = memory_result['degraded']
+        
+        if not memory_result['results']:
+            yield "❌ I couldn't find any previous discussions on that topic. Try asking something else!"
+            if degraded:
+                yield DEGRADED_NOTICE
+            return {'route': 'memory', 'confidence': 0.0, 'degraded': degraded}
+        
+        yield f"📚 I found {memory_result['count']} relevant items from our previous discussions:\n\n"
+        
+        for idx, record in enumerate(memory_result['results'][:5], 1):
+            with tracer.span("format"):
+                section = f"{idx}. Topic: {record['key']}\n"
+                section += f"   Timestamp: {record['metadata']['timestamp']}\n"
+                section += f"   Confidence: {record['metadata']['confidence']:.2f}\n"
                 
                 # Show summary of value
                 if isinstance(record['value'], dict):
                     if 'research' in record['value']:
-                        response += f"   Research findings: {len(record['value']['research'])} topics\n"
+                        section += f"   Research findings: {len(record['value']['research'])} topics\n"
                     if 'analysis' in record['value']:
                         analysis_preview = record['value']['analysis'][:100]
-                        response += f"   Analysis: {analysis_preview}...\n"
+                        section += f"   Analysis: {analysis_preview}...\n"
                 elif isinstance(record['value'], list):
-                    response += f"   Contains {len(record['value'])} items\n"
-                
-                response += "\n"
+                    section += f"   Contains {len(record['value'])} items\n"
             
-            return response
-        else:
-            return "❌ I couldn't find any previous discussions on that topic. Try asking something else!"
+            yield section + "\n"
+        
+        if degraded:
+            yield DEGRADED_NOTICE
+        
+        confidence = max(r['metadata']['confidence'] for r in memory_result['results'][:5])
+        return {'route': 'memory', 'confidence': confidence, 'degraded': degraded}
     
-    def _handle_simple_query(self, query: str) -> str:
+    def _stream_simple_query(self, query: str, deadline: Optional[Deadline] = None,
+                             memory: Optional[MemoryAgent] = None) -> Generator[str, None, Dict[str, Any]]:
         """
         Handle simple queries that only need research
-        Flow: Research -> Store in Memory -> Respond
+        Flow: Research -> Respond (one section per topic) -> Store in Memory
         """
+        memory = memory or self.memory
         self.logger.log_agent_action(self.name, "Simple Query - Research Only", query)
         
         # Step 1: Research
-        research_result = self.research.search(query)
+        with tracer.span("research"):
+            research_result = self.research.search(query, deadline=deadline)
+        degraded = research_result['degraded']
         
         if not research_result['success'] or not research_result['data']:
-            return "❌ I couldn't find information on that topic in the knowledge base. Try rephrasing your question."
+            yield "❌ I couldn't find information on that topic in the knowledge base. Try rephrasing your question."
+            if degraded:
+                yield DEGRADED_NOTICE
+            return {'route': 'simple', 'confidence': research_result['confidence'], 'degraded': degraded}
         
         # Step 2: Format response
-        response = "✅ Here's what I found:\n\n"
+        yield "✅ Here's what I found:\n\n"
         
         for item in research_result['data']:
-            topic = item['topic']
-            data = item['data']
-            
-            response += f"📌 {topic.upper()}\n"
-            response += "─" * 50 + "\n"
-            
-            # Display different types of data
-            if 'types' in data:
-                response += f"Types:\n"
-                for t in data['types']:
-                    response += f"  • {t}\n"
-            
-            if 'description' in data:
-                response += f"\nDescription: {data['description']}\n"
-            
-            if 'techniques' in data:
-                response += f"Techniques:\n"
-                for tech in data['techniques']:
-                    response += f"  • {tech}\n"
-            
-            response += "\n"
+            with tracer.span("format"):
+                section = self._topic_section(item)
+            yield section
+        
+        if degraded:
+            yield DEGRADED_NOTICE
         
         # Step 3: Store in memory
-        self.memory.store(
-            key=query,
-            value=research_result['data'],
-            metadata={
-                'agent': 'Research',
-                'confidence': research_result['confidence'],
-                'query_type': 'simple'
-            }
-        )
+        with tracer.span("memory_store"):
+            memory.store(
+                key=query,
+                value=research_result['data'],
+                metadata={
+                    'agent': 'Research',
+                    'confidence': research_result['confidence'],
+                    'query_type': 'simple'
+                }
+            )
         
-        return response
+        return {'route': 'simple', 'confidence': research_result['confidence'], 'degraded': degraded}
     
-    def _handle_complex_query(self, query: str) -> str:
+    def _stream_complex_query(self, query: str, deadline: Optional[Deadline] = None,
+                              memory: Optional[MemoryAgent] = None) -> Generator[str, None, Dict[str, Any]]:
         """
         Handle complex queries requiring research + analysis
-        Flow: Research -> Analysis -> Store in Memory -> Respond
+        Flow: Research -> Respond with findings -> Analysis -> Respond -> Store in Memory
         """
+        memory = memory or self.memory
         self.logger.log_agent_action(self.name, "Complex Query - Research + Analysis", query)
         
-        # Step 1: Research
-        research_result = self.research.search(query)
+        checkpoint_id = self._checkpoint_id(query, 'complex')
+        stages = self._load_checkpoint(memory, checkpoint_id)
+        resumed = list(stages)
+        
+        # Step 1: Research, unless an earlier attempt got that far
+        if 'research' in stages:
+            research_result = stages['research']
+            self.logger.log_agent_action(self.name, "Resuming From Checkpoint", "research")
+        else:
+            with tracer.span("research"):
+                research_result = self.research.search(query, deadline=deadline)
+            if research_result['data'] and not research_result['degraded']:
+                stages['research'] = research_result
+                self._save_checkpoint(memory, checkpoint_id, query, stages)
         
         if not research_result['success'] or not research_result['data']:
-            return "❌ I couldn't find sufficient information to analyze. Try a different question."
+            yield "❌ I couldn't find sufficient information to analyze. Try a different question."
+            if research_result['degraded']:
+                yield DEGRADED_NOTICE
+            return {
+                'route': 'complex',
+                'confidence': research_result['confidence'],
+                'degraded': research_result['degraded']
+            }
+        
+        with tracer.span("format"):
+            section = "".join([
+                "✅ RESEARCH & ANALYSIS RESULTS\n", "=" * 70, "\n\n",
+                "📊 RESEARCH FINDINGS:\n", "─" * 70, "\n",
+                *(f"  • {item['topic']}\n" for item in research_result['data'])
+            ])
+        yield section
         
         # Step 2: Analysis
-        analysis_result = self.analysis.analyze(
-            data=research_result['data'],
-            analysis_type=query
-        )
+        with tracer.span("analysis"):
+            analysis_result = self.analysis.analyze(
+                data=research_result['data'],
+                analysis_type=query,
+                deadline=deadline
+            )
+        degraded = research_result['degraded'] or analysis_result.get('degraded', False)
         
-        # Step 3: Format response
-        response = "✅ RESEARCH & ANALYSIS RESULTS\n"
-        response += "=" * 70 + "\n\n"
+        with tracer.span("format"):
+            section = f"\n🔍 ANALYSIS:\n"
+            section += "─" * 70 + "\n"
+            section += analysis_result['analysis']
+            section += f"\n\n📈 Confidence Score: {analysis_result['confidence']:.2f}\n"
+            if degraded:
+                section += DEGRADED_NOTICE
+        yield section
         
-        response += "📊 RESEARCH FINDINGS:\n"
-        response += "─" * 70 + "\n"
-        for item in research_result['data']:
-            response += f"  • {item['topic']}\n"
-        
-        response += f"\n🔍 ANALYSIS:\n"
-        response += "─" * 70 + "\n"
-        response += analysis_result['analysis']
-        
-        response += f"\n\n📈 Confidence Score: {analysis_result['confidence']:.2f}\n"
-        
-        # Step 4: Store in memory
-        self.memory.store(
-            key=query,
-            value={
-                'research': research_result['data'],
-                'analysis': analysis_result['analysis']
-            },
-            metadata={
-                'agents': ['Research', 'Analysis'],
-                'confidence': (research_result['confidence'] + analysis_result['confidence']) / 2,
-                'query_type': 'complex'
-            }
-        )
+        # Step 3: Store in memory
+        confidence = (research_result['confidence'] + analysis_result['confidence']) / 2
+        with tracer.span("memory_store"):
+            memory.store(
+                key=query,
+                value={
+                    'research': research_result['data'],
+                    'analysis': analysis_result['analysis']
+                },
+                metadata={
+                    'agents': ['Research', 'Analysis'],
+                    'confidence': confidence,
+                    'query_type': 'complex'
+                }
+            )
         
-        return response
+        # Analysis is the last stage; once it has run in full there is nothing left to resume
+        if not degraded:
+            self._clear_checkpoint(memory, checkpoint_id)
+        
+        metadata = {'route': 'complex', 'confidence': confidence, 'degraded': degraded}
+        if resumed:
+            metadata['resumed_stages'] = resumed
+        return metadata
     
-    def _handle_multistep_query(self, query: str) -> str:
+    def _stream_multistep_query(self, query: str, deadline: Optional[Deadline] = None,
+                                memory: Optional[MemoryAgent] = None) -> Generator[str, None, Dict[str, Any]]:
         """
         Handle multi-step queries with multiple operations
-        Flow: Research -> Analysis -> Synthesis -> Store -> Respond
+        Flow: Task Graph (Research -> Analysis, independent sub-tasks in parallel) -> Synthesis -> Store
+        Each step is yielded as soon as the nodes it reports on have finished
         """
+        memory = memory or self.memory
         self.logger.log_agent_action(self.name, "Multi-Step Query - Full Pipeline", query)
         
-        response = "✅ MULTI-STEP ANALYSIS\n"
-        response += "=" * 70 + "\n\n"
+        graph = self._build_task_graph(query, deadline)
+        self.logger.log_agent_action(self.name, f"Task Graph: {len(graph.nodes)} nodes", query)
+        
+        # Nodes completed by an earlier attempt are restored instead of run again
+        checkpoint_id = self._checkpoint_id(query, 'multi-step')
+        stages = self._load_checkpoint(memory, checkpoint_id)
+        resumed = []
+        for node_id, saved in stages.items():
+            node = graph.nodes.get(node_id)
+            if (node is not None and node.kind == saved['kind'] and node.clause == saved['clause']
+                    and self._is_finished_result(node.kind, saved['result'])):
+                graph.restore(node_id, saved['result'])
+                resumed.append(node_id)
+        if resumed:
+            self.logger.log_agent_action(self.name, "Resuming From Checkpoint", ", ".join(resumed))
+        
+        research_nodes = [n for n in graph.nodes.values() if n.kind == 'research']
+        analysis_nodes = [n for n in graph.nodes.values() if n.kind == 'analysis']
+        research_data = None
+        analyses = []
+        next_analysis = 0
+        finished = set()
+        
+        yield "✅ MULTI-STEP ANALYSIS\n" + "=" * 70 + "\n\n"
+        
+        for node in graph.execute():
+            finished.add(node.node_id)
+            if node.error:
+                self.logger.log_error(f"Task '{node.node_id}' failed: {node.error}")
+            elif not node.restored and node.kind != 'synthesis' and self._is_finished_result(node.kind, node.result):
+                stages[node.node_id] = {'kind': node.kind, 'clause': node.clause, 'result': node.result}
+                self._save_checkpoint(memory, checkpoint_id, query, stages)
+            
+            # Step 1: Research, once every research node is done
+            if research_data is None and all(n.node_id in finished for n in research_nodes):
+                research_data = self._merge_task_data(n.result for n in research_nodes)
+                
+                with tracer.span("format"):
+                    if research_data:
+                        found = [f"  ✓ Found: {item['topic']}\n" for item in research_data]
+                    else:
+                        found = ["  ✗ No data found\n"]
+                    section = "".join([
+                        "🔎 STEP 1: RESEARCH\n", "─" * 70, "\n", *found,
+                        "\n🧠 STEP 2: ANALYSIS\n", "─" * 70, "\n"
+                    ])
+                yield section
+            
+            if research_data is None:
+                continue
+            
+            # Step 2: Analysis, one sub-task at a time in query order
+            while next_analysis < len(analysis_nodes) and analysis_nodes[next_analysis].node_id in finished:
+                with tracer.span("format"):
+                    section = self._render_analysis_node(analysis_nodes[next_analysis], len(analysis_nodes), analyses)
+                next_analysis += 1
+                if section:
+                    yield section
         
-        # Step 1: Research
-        response += "🔎 STEP 1: RESEARCH\n"
-        response += "─" * 70 + "\n"
+        if not analyses and not any(n.result and n.result.get('degraded') for n in analysis_nodes):
+            yield "  ✗ Cannot analyze without data\n"
         
-        research_result = self.research.search(query)
+        # Step 3: Synthesis & Recommendation
+        section = f"\n💡 STEP 3: SYNTHESIS & RECOMMENDATIONS\n"
+        section += "─" * 70 + "\n"
+        section += graph.nodes['synthesis'].result['synthesis']
+        degraded = any(n.result and n.result.get('degraded') for n in graph.nodes.values())
+        failed = [n.node_id for n in graph.nodes.values() if n.error]
+        if failed:
+            section += FAILED_NOTICE
+        elif degraded:
+            section += DEGRADED_NOTICE
+        yield section
         
-        if research_result['data']:
-            for item in research_result['data']:
-                response += f"  ✓ Found: {item['topic']}\n"
-        else:
-            response += "  ✗ No data found\n"
+        # Step 4: Store comprehensive result
+        with tracer.span("memory_store"):
+            memory.store(
+                key=query,
+                value={
+                    'research': research_data,
+                    'analysis': "\n".join(analyses) if analyses else 'No analysis performed',
+                    'type': 'multi-step'
+                },
+                metadata={
+                    'agents': ['Research', 'Analysis', 'Memory'],
+                    'confidence': 0.85,
+                    'query_type': 'multi-step'
+                }
+            )
         
-        # Step 2: Analysis
-        response += f"\n🧠 STEP 2: ANALYSIS\n"
-        response += "─" * 70 + "\n"
+        # A partial or failed run keeps its checkpoint so that a retry can pick up where it stopped
+        if not degraded and not failed:
+            self._clear_checkpoint(memory, checkpoint_id)
+        
+        metadata = {
+            'route': 'multi-step',
+            'confidence': 0.85,
+            'degraded': degraded,
+            'node_timings': graph.get_timings()
+        }
+        if resumed:
+            metadata['resumed_stages'] = resumed
+        if failed:
+            metadata['failed_stages'] = failed
+        return metadata
+    
+    @staticmethod
+    def _is_finished_result(kind: str, result: Dict[str, Any]) -> bool:
+        """Whether a task result is complete enough to checkpoint and resume from"""
+        if result.get('degraded'):
+            return False
+        return kind != 'analysis' or result.get('analysis') is not None
+    
+    def _topic_section(self, item: Dict[str, Any]) -> str:
+        """
+        A research topic's simple-query section, from the fragment cache
+        One-line fragments (findings bullets) are cheaper to format than to look up
+        """
+        render = partial(self._format_topic_section, item)
+        return self.fragments.get('section', item['topic'], self.research.corpus_version, render)
+    
+    def _format_topic_section(self, item: Dict[str, Any]) -> str:
+        """Render one research topic for a simple-query response"""
+        topic = item['topic']
+        data = item['data']
         
-        if research_result['data']:
-            analysis_result = self.analysis.analyze(
-                data=research_result['data'],
-                analysis_type=query
-            )
-            response += analysis_result['analysis']
-        else:
-            response += "  ✗ Cannot analyze without data\n"
-            analysis_result = {'analysis': 'No analysis performed', 'confidence': 0.0}
+        parts = [f"📌 {topic.upper()}\n", "─" * 50, "\n"]
         
-        # Step 3: Synthesis & Recommendation
-        response += f"\n💡 STEP 3: SYNTHESIS & RECOMMENDATIONS\n"
-        response += "─" * 70 + "\n"
+        # Display different types of data
+        if 'types' in data:
+            parts.append("Types:\n")
+            parts.extend(f"  • {t}\n" for t in data['types'])
         
-        if 'recommend' in query.lower():
-            response += "Based on the research and analysis:\n\n"
-            response += "  • Consider the tradeoffs identified above\n"
-            response += "  • The best approach depends on your specific requirements\n"
-            response += "  • Evaluate based on your use case constraints\n"
-        else:
-            response += "Key findings have been analyzed and stored.\n"
-            response += "You can ask follow-up questions or request memory recall.\n"
+        if 'description' in data:
+            parts.append(f"\nDescription: {data['description']}\n")
         
-        # Step 4: Store comprehensive result
-        self.memory.store(
-            key=query,
-            value={
-                'research': research_result['data'],
-                'analysis': analysis_result['analysis'],
-                'type': 'multi-step'
-            },
-            metadata={
-                'agents': ['Research', 'Analysis', 'Memory'],
-                'confidence': 0.85,
-                'query_type': 'multi-step'
-            }
+        if 'techniques' in data:
+            parts.append("Techniques:\n")
+            parts.extend(f"  • {tech}\n" for tech in data['techniques'])
+        
+        parts.append("\n")
+        return "".join(parts)
+    
+    def _render_analysis_node(self, node, node_count: int, analyses: List[str]) -> str:
+        """Render one analysis sub-task, recording its text in analyses"""
+        if not node.result:
+            return ""
+        if not node.result['analysis']:
+            if node.result.get('skipped'):
+                return f"▸ {node.clause}\n  ⚠️  Skipped: {node.result['skipped']}\n\n"
+            return ""
+        
+        section = f"▸ {node.clause}\n" if node_count > 1 else ""
+        if node.result['analysis'] in analyses:
+            return section + "  (covered by the analysis above)\n\n"
+        
+        analyses.append(node.result['analysis'])
+        section += node.result['analysis']
+        if node_count > 1:
+            section += "\n"
+        return section
+    
+    def _decompose_query(self, query: str) -> List[List[str]]:
+        """
+        Split a multi-step query into ordered stages of clauses
+        Sequence markers start a new stage; comma clauses within a stage are independent
+        """
+        clause_separators = r',|;|\band (?=(?:' + '|'.join(ANALYSIS_VERBS) + r')\b)'
+        
+        stages = []
+        for segment in re.split(SEQUENCE_MARKERS, query, flags=re.IGNORECASE):
+            clauses = []
+            for clause in re.split(clause_separators, segment, flags=re.IGNORECASE):
+                clause = re.sub(r'^(?:and|then)\s+', '', clause.strip(' .?!'), flags=re.IGNORECASE)
+                if clause:
+                    clauses.append(clause)
+            if clauses:
+                stages.append(clauses)
+
+        self._complete_bare_verbs(stages)
+        return stages or [[query]]
+
+    def _complete_bare_verbs(self, stages: List[List[str]]):
+        """
+        Give clauses that are only a verb ("Find and analyze X") the subject of the
+        next clause, or of the previous one when they come last; edits stages in place
+        """
+        positions = [(s, c) for s, clauses in enumerate(stages) for c in range(len(clauses))]
+        subjects = []
+        for s, c in positions:
+            words = stages[s][c].split(None, 1)
+            subjects.append(words[1] if len(words) > 1 else None)
+
+        for index, (s, c) in enumerate(positions):
+            if subjects[index] is not None:
+                continue
+            following = [subject for subject in subjects[index + 1:] if subject]
+            preceding = [subject for subject in subjects[:index] if subject]
+            subject = following[0] if following else (preceding[-1] if preceding else None)
+            if subject:
+                stages[s][c] = f"{stages[s][c]} {subject}"
+    
+    def _classify_clause(self, clause: str) -> str:
+        """Decide whether a clause is a research or an analysis sub-task"""
+        clause_lower = clause.lower()
+        if any(verb in clause_lower for verb in ANALYSIS_VERBS):
+            return 'analysis'
+        return 'research'
+    
+    def _build_task_graph(self, query: str, deadline: Optional[Deadline] = None) -> TaskGraph:
+        """
+        Build the task graph for a multi-step query
+        Each stage depends on the previous one; within a stage, analysis
+        sub-tasks depend on the research sub-tasks and run in parallel
+        """
+        graph = TaskGraph(max_workers=self.max_parallel_tasks)
+        stages = self._decompose_query(query)
+        has_analysis = any(
+            self._classify_clause(c) == 'analysis' for clauses in stages for c in clauses
         )
         
-        return response
\ No newline at end of file
+        previous_stage = []
+        for stage_idx, clauses in enumerate(stages):
+            research = [c for c in clauses if self._classify_clause(c) == 'research']
+            analysis = [c for c in clauses if self._classify_clause(c) == 'analysis']
+            
+            # Analysis needs data, so research the whole query if no clause asks for it
+            if stage_idx == 0 and not research:
+                research.append(query)
+            
+            current_stage = []
+            for clause in research:
+                node_id = f"research_{len(graph.nodes) + 1}"
+                graph.add_node(node_id, 'research', clause,
+                               partial(self._run_research_task, clause, deadline), previous_stage)
+                current_stage.append(node_id)
+            
+            research_ids = list(current_stage)
+            for clause in analysis:
+                node_id = f"analysis_{len(graph.nodes) + 1}"
+                graph.add_node(node_id, 'analysis', clause,
+                               partial(self._run_analysis_task, clause, deadline), previous_stage + research_ids)
+                current_stage.append(node_id)
+            
+            previous_stage = current_stage
+        
+        # Every multi-step query gets at least one analysis of the full query
+        if not has_analysis:
+            graph.add_node(f"analysis_{len(graph.nodes) + 1}", 'analysis', query,
+                           partial(self._run_analysis_task, query, deadline), previous_stage)
+        
+        graph.add_node('synthesis', 'synthesis', query,
+                       partial(self._run_synthesis_task, query), list(graph.nodes))
+        
+        return graph
+    
+    def _run_research_task(self, clause: str, deadline: Optional[Deadline],
+                           inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Task graph node: research a single clause"""
+        with tracer.span("research", node=clause):
+            result = self.research.search(clause, deadline=deadline)
+        return {'data': result['data'], 'confidence': result['confidence'], 'degraded': result['degraded']}
+    
+    def _run_analysis_task(self, clause: str, deadline: Optional[Deadline],
+                           inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Task graph node: analyze the data gathered by upstream nodes
+        An analysis of failed (None) or degraded upstream results is itself degraded,
+        so it is neither checkpointed nor cached and a retry computes it again
+        """
+        failed = any(result is None for result in inputs.values())
+        partial = failed or any(result.get('degraded') for result in inputs.values() if result)
+        skipped = SKIPPED_AFTER_FAILURE if failed else SKIPPED_OUT_OF_TIME
+        
+        data = self._merge_task_data(inputs.values())
+        if not data:
+            if partial:
+                return {'data': [], 'analysis': None, 'confidence': 0.0, 'degraded': True, 'skipped': skipped}
+            return {'data': [], 'analysis': None, 'confidence': 0.0}
+        
+        with tracer.span("analysis", node=clause):
+            result = self.analysis.analyze(data=data, analysis_type=clause, deadline=deadline)
+        if result.get('degraded'):
+            return {'data': data, 'analysis': None, 'confidence': 0.0, 'degraded': True,
+                    'skipped': SKIPPED_OUT_OF_TIME}
+        return {'data': data, 'analysis': result['analysis'], 'confidence': result['confidence'],
+                'degraded': partial}
+    
+    def _run_synthesis_task(self, query: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Task graph node: synthesize recommendations from all sub-task results"""
+        if 'recommend' in query.lower():
+            synthesis = "Based on the research and analysis:\n\n"
+            synthesis += "  • Consider the tradeoffs identified above\n"
+            synthesis += "  • The best approach depends on your specific requirements\n"
+            synthesis += "  • Evaluate based on your use case constraints\n"
+        else:
+            synthesis = "Key findings have been analyzed and stored.\n"
+            synthesis += "You can ask follow-up questions or request memory recall.\n"
+        
+        return {'data': self._merge_task_data(inputs.values()), 'synthesis': synthesis}
+    
+    def _merge_task_data(self, results) -> List[Dict]:
+        """Merge research items carried by task results, deduplicated by topic"""
+        merged = {}
+        for result in results:
+            if not result:
+                continue
+            for item in result['data']:
+                if item['topic'] not in merged:
+                    merged[item['topic']] = item
+        
+        items = list(merged.values())
+        items.sort(key=lambda x: x['relevance_score'], reverse=True)
+        return items
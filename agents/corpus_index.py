@@ -0,0 +1,283 @@
+"""
+Corpus Index - Compiled inverted index over the research corpus
+The index is a flat binary artifact (a header, then numpy arrays and offset
+tables) that can be built in memory or compiled once and mmapped read-only,
+so every process shares the same pages instead of rebuilding it on startup
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+# Bump when the artifact layout changes; older artifacts are rejected
+FORMAT_VERSION = 1
+MAGIC = b"CORPIDX\0"
+
+# Tokens are maximal runs of letters and digits. A query word made only of
+# such characters occurs in a document exactly when it occurs inside one of
+# the document's tokens, which is what lets the term dictionary answer it
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Sections in file order, with their numpy dtypes ('bytes' for raw UTF-8)
+SECTIONS = [
+    ('topic_offsets', '<u8'),
+    ('topics', 'bytes'),
+    ('text_offsets', '<u8'),
+    ('texts', 'bytes'),
+    ('term_offsets', '<u8'),
+    ('terms', 'bytes'),
+    ('posting_offsets', '<u8'),
+    ('posting_docs', '<u4'),
+    ('posting_freqs', '<u4'),
+    ('doc_lengths', '<u4'),
+    ('topic_word_offsets', '<u8'),
+    ('topic_words', 'bytes'),
+    ('topic_word_posting_offsets', '<u8'),
+    ('topic_word_posting_docs', '<u4'),
+]
+
+# magic, format version, documents, terms, topic words, postings, corpus checksum, payload CRC
+HEADER_FORMAT = "<8sIIIIQ32sI4x"
+SECTION_FORMAT = "<QQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT) + struct.calcsize(SECTION_FORMAT) * len(SECTIONS)
+
+
+def corpus_checksum(knowledge_base: Dict[str, Any]) -> bytes:
+    """SHA-256 of the corpus in topic order; an artifact built from other content is stale"""
+    return hashlib.sha256(json.dumps(knowledge_base, default=str).encode('utf-8')).digest()
+
+
+def search_text(data: Any) -> str:
+    """The text a topic's data is matched against"""
+    return str(data).lower()
+
+
+def _pack_strings(strings: List[str], separator: bytes = b"") -> Tuple["np.ndarray", bytes]:
+    """Concatenate strings into one UTF-8 blob with an offset table of len(strings) + 1"""
+    import numpy as np
+
+    encoded = [s.encode('utf-8') + separator for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _pack_postings(postings: Dict[str, Dict[int, int]]) -> Dict[str, Any]:
+    """Sorted dictionary, offset table and flattened (doc, frequency) postings"""
+    import numpy as np
+
+    terms = sorted(postings)
+    term_offsets, term_bytes = _pack_strings(terms, separator=b"\n")
+    posting_offsets = np.zeros(len(terms) + 1, dtype='<u8')
+    np.cumsum([len(postings[term]) for term in terms], out=posting_offsets[1:])
+    docs = np.fromiter((doc for term in terms for doc in sorted(postings[term])), dtype='<u4')
+    freqs = np.fromiter((postings[term][doc] for term in terms for doc in sorted(postings[term])), dtype='<u4')
+    return {'terms': terms, 'term_offsets': term_offsets, 'term_bytes': term_bytes,
+            'posting_offsets': posting_offsets, 'docs': docs, 'freqs': freqs}
+
+
+def compile_corpus(knowledge_base: Dict[str, Any]) -> bytes:
+    """Serialize the corpus and its index into the binary artifact format"""
+    import numpy as np
+
+    topics = list(knowledge_base)
+    texts = [search_text(knowledge_base[topic]) for topic in topics]
+
+    term_postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+    topic_word_postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+    doc_lengths = np.zeros(len(topics), dtype='<u4')
+    for doc, (topic, text) in enumerate(zip(topics, texts)):
+        tokens = TOKEN_PATTERN.findall(text)
+        doc_lengths[doc] = len(tokens)
+        for token, count in Counter(tokens).items():
+            term_postings[token][doc] = count
+        for word in set(topic.split()):
+            topic_word_postings[word][doc] = 1
+
+    terms = _pack_postings(term_postings)
+    topic_words = _pack_postings(topic_word_postings)
+    topic_offsets, topic_bytes = _pack_strings(topics)
+    text_offsets, text_bytes = _pack_strings(texts, separator=b"\n")
+
+    arrays = {
+        'topic_offsets': topic_offsets,
+        'topics': topic_bytes,
+        'text_offsets': text_offsets,
+        'texts': text_bytes,
+        'term_offsets': terms['term_offsets'],
+        'terms': terms['term_bytes'],
+        'posting_offsets': terms['posting_offsets'],
+        'posting_docs': terms['docs'],
+        'posting_freqs': terms['freqs'],
+        'doc_lengths': doc_lengths,
+        'topic_word_offsets': topic_words['term_offsets'],
+        'topic_words': topic_words['term_bytes'],
+        'topic_word_posting_offsets': topic_words['posting_offsets'],
+        'topic_word_posting_docs': topic_words['docs'],
+    }
+
+    # Lay the sections out after the header, each 8-byte aligned
+    payload = bytearray()
+    table = []
+    for name, _ in SECTIONS:
+        data = arrays[name]
+        raw = data if isinstance(data, bytes) else data.tobytes()
+        payload += b"\0" * (-(HEADER_SIZE + len(payload)) % 8)
+        table.append((HEADER_SIZE + len(payload), len(raw)))
+        payload += raw
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, FORMAT_VERSION, len(topics), len(terms['terms']),
+                         len(topic_words['terms']), len(terms['docs']), corpus_checksum(knowledge_base),
+                         zlib.crc32(payload))
+    header += b"".join(struct.pack(SECTION_FORMAT, offset, length) for offset, length in table)
+    return header + bytes(payload)
+
+
+def write_artifact(knowledge_base: Dict[str, Any], path: str) -> int:
+    """Compile the corpus to a file, atomically; returns its size in bytes"""
+    artifact = compile_corpus(knowledge_base)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(artifact)
+    os.replace(tmp_path, path)
+    return len(artifact)
+
+
+class CorpusIndex:
+    """
+    Read-only view of a compiled corpus artifact
+    Arrays are zero-copy views of the underlying buffer, which is either the
+    bytes of an in-memory build or a read-only mmap of a compiled file
+    """
+
+    def __init__(self, buffer, source: str = "memory"):
+        import numpy as np
+
+        self._buffer = buffer
+        self.source = source
+        self._topic_word_list = None
+
+        fixed = struct.calcsize(HEADER_FORMAT)
+        if len(buffer) < HEADER_SIZE:
+            raise ValueError(f"{source} is not a corpus index")
+        (magic, version, self.num_docs, self.num_terms, self.num_topic_words, self.num_postings,
+         self.corpus_checksum, self.payload_crc) = struct.unpack_from(HEADER_FORMAT, buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{source} is not a corpus index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{source} has format version {version}, expected {FORMAT_VERSION}")
+
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for i, (name, dtype) in enumerate(SECTIONS):
+            offset, length = struct.unpack_from(SECTION_FORMAT, buffer, fixed + i * struct.calcsize(SECTION_FORMAT))
+            if offset + length > len(buffer):
+                raise ValueError(f"{source} is truncated")
+            self._sections[name] = (offset, length)
+            if dtype != 'bytes':
+                setattr(self, name, np.frombuffer(buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize,
+                                                  offset=offset))
+
+    @classmethod
+    def build(cls, knowledge_base: Dict[str, Any]) -> "CorpusIndex":
+        """Index a corpus in memory"""
+        return cls(compile_corpus(knowledge_base))
+
+    @classmethod
+    def load(cls, path: str) -> "CorpusIndex":
+        """Map a compiled artifact read-only; pages are shared with other processes using it"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    def verify(self) -> bool:
+        """Check the payload against its CRC (reads the whole artifact)"""
+        return zlib.crc32(self._buffer[HEADER_SIZE:]) == self.payload_crc
+
+    def is_current(self, knowledge_base: Dict[str, Any]) -> bool:
+        """Whether the artifact was compiled from exactly this corpus"""
+        return corpus_checksum(knowledge_base) == self.corpus_checksum
+
+    def _string(self, section: str, offsets: "np.ndarray", i: int, separator: int = 0) -> str:
+        start = self._sections[section][0]
+        return bytes(self._buffer[start + int(offsets[i]):start + int(offsets[i + 1]) - separator]).decode('utf-8')
+
+    def topic(self, doc: int) -> str:
+        return self._string('topics', self.topic_offsets, doc)
+
+    def text(self, doc: int) -> str:
+        return self._string('texts', self.text_offsets, doc, separator=1)
+
+    def _entries_containing(self, section: str, offsets: "np.ndarray", needle: bytes) -> List[int]:
+        """Ids of the dictionary entries that contain needle, via find() over the joined dictionary"""
+        import numpy as np
+
+        start, length = self._sections[section]
+        end = start + length
+        ids = []
+        position = self._buffer.find(needle, start, end)
+        while position != -1:
+            entry = int(np.searchsorted(offsets, position - start, side='right')) - 1
+            ids.append(entry)
+            # Continue after this entry; matches never span the newline separators
+            position = self._buffer.find(needle, start + int(offsets[entry + 1]), end)
+        return ids
+
+    def _postings(self, ids: List[int], posting_offsets: "np.ndarray", posting_docs: "np.ndarray") -> Set[int]:
+        import numpy as np
+
+        if not ids:
+            return set()
+        docs = np.concatenate([posting_docs[posting_offsets[i]:posting_offsets[i + 1]] for i in ids])
+        return set(np.unique(docs).tolist())
+
+    def docs_containing(self, word: str) -> Set[int]:
+        """Documents whose search text contains word as a substring"""
+        needle = word.encode('utf-8')
+        if TOKEN_PATTERN.fullmatch(word):
+            ids = self._entries_containing('terms', self.term_offsets, needle)
+            return self._postings(ids, self.posting_offsets, self.posting_docs)
+
+        # Words with punctuation can match across tokens; scan the texts instead
+        import numpy as np
+
+        start, length = self._sections['texts']
+        end = start + length
+        docs = set()
+        position = self._buffer.find(needle, start, end)
+        while position != -1:
+            doc = int(np.searchsorted(self.text_offsets, position - start, side='right')) - 1
+            if position + len(needle) < start + int(self.text_offsets[doc + 1]):
+                docs.add(doc)
+                position = self._buffer.find(needle, start + int(self.text_offsets[doc + 1]), end)
+            else:
+                position = self._buffer.find(needle, position + 1, end)
+        return docs
+
+    def docs_with_topic_word_in(self, query: str) -> Set[int]:
+        """Documents whose topic has a word that occurs in the query"""
+        if self._topic_word_list is None:
+            self._topic_word_list = [self._string('topic_words', self.topic_word_offsets, i, separator=1)
+                                     for i in range(self.num_topic_words)]
+        ids = [i for i, word in enumerate(self._topic_word_list) if word in query]
+        return self._postings(ids, self.topic_word_posting_offsets, self.topic_word_posting_docs)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'source': self.source,
+            'format_version': FORMAT_VERSION,
+            'documents': self.num_docs,
+            'terms': self.num_terms,
+            'postings': self.num_postings,
+            'avg_doc_length': round(float(self.doc_lengths.mean()), 1) if self.num_docs else 0.0,
+            'bytes': len(self._buffer)
+        }
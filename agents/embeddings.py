@@ -0,0 +1,378 @@
+"""
+Embeddings - Pluggable text embedding providers with a persistent vector cache
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache is still safe within one process
+    fcntl = None
+
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+# Where the default provider persists its vectors
+DEFAULT_CACHE_DIR = "logs/embeddings"
+
+# Words too common to say anything about a text's topic
+STOPWORDS = frozenset("""
+a an and are as at be but by can did do does for from had has have how i if in into is it its
+me more most my of on or our so than that the their them then there these they this to was
+we were what when where which who why will with would you your about also any been being
+both each other out over such up very just only some should could may might must
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+class EmbeddingProvider:
+    """
+    Turns texts into unit-length float32 vectors
+    Subclasses set `name` and `dimension` and implement embed()
+    """
+
+    name = "base"
+    dimension = 0
+
+    @property
+    def signature(self) -> str:
+        """Identifies the vector space; vectors from different signatures are not comparable"""
+        return f"{self.name}-{self.dimension}"
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed a batch of texts into a (len(texts), dimension) array"""
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> "np.ndarray":
+        """Embed a single text"""
+        return self.embed([text])[0]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {'provider': self.signature}
+
+
+@lru_cache(maxsize=65536)
+def _hash_token(token: str, dimension: int) -> Tuple[int, float]:
+    """Bucket and sign of a token; stable across processes, unlike hash()"""
+    value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value % dimension, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Deterministic local embedder using the hashing trick
+    Tokens are hashed into a fixed number of signed buckets with log-scaled counts,
+    so there is no vocabulary to maintain and every word contributes
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lowercase content words, with a plain plural 's' removed"""
+        tokens = []
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in STOPWORDS:
+                continue
+            if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+                token = token[:-1]
+            tokens.append(token)
+        return tokens
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(self.tokenize(text)).items():
+                bucket, sign = _hash_token(token, self.dimension)
+                vectors[row, bucket] += sign * (1.0 + math.log(count))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class VocabularyEmbedder(EmbeddingProvider):
+    """
+    Bag of words over a fixed list of ML terms (the original memory vectors)
+    Matches terms as substrings, so 'networks' counts towards 'network'
+    """
+
+    name = "vocabulary"
+
+    VOCABULARY = [
+        'neural', 'network', 'learning', 'deep', 'machine', 'data', 'model',
+        'training', 'optimization', 'gradient', 'descent', 'transformer',
+        'attention', 'layer', 'algorithm', 'classification', 'regression',
+        'supervised', 'unsupervised', 'reinforcement', 'cnn', 'rnn', 'lstm',
+        'gan', 'autoencoder', 'embedding', 'feature', 'backpropagation',
+        'loss', 'accuracy', 'precision', 'recall', 'f1', 'score',
+        'overfitting', 'underfitting', 'regularization', 'dropout',
+        'batch', 'normalization', 'activation', 'relu', 'sigmoid', 'softmax',
+        'convolutional', 'recurrent', 'feedforward', 'architecture',
+        'weights', 'bias', 'parameter', 'hyperparameter', 'epoch',
+        'tensorflow', 'pytorch', 'keras', 'vision', 'nlp', 'speech',
+        'image', 'text', 'sequence', 'time', 'series', 'prediction',
+        'inference', 'deployment', 'research', 'paper', 'study',
+        'experiment', 'dataset', 'preprocessing', 'augmentation',
+        'transfer', 'fine', 'tuning', 'pretrained', 'bert', 'gpt',
+        't5', 'roberta', 'xlnet', 'efficientnet', 'resnet', 'vgg',
+        'yolo', 'mask', 'rcnn', 'segmentation', 'detection', 'recognition',
+        'generation', 'synthesis', 'style', 'adversarial', 'q-learning',
+        'policy', 'value', 'reward', 'agent', 'environment', 'state', 'action'
+    ]
+
+    dimension = len(VOCABULARY)
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            for i, term in enumerate(self.VOCABULARY):
+                vectors[row, i] = sum(1 for word in words if term in word)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+# Layout of the cache file header; the records follow it
+HEADER_SIZE = 64
+CACHE_MAGIC = b"EMBCACHE"
+CACHE_VERSION = 1
+
+
+class EmbeddingCache:
+    """
+    Content hash → vector store in a memory-mapped file
+    Records are appended under an exclusive file lock and never rewritten, so
+    several processes can share one cache file; each process picks up records
+    appended by the others when it misses
+    """
+
+    def __init__(self, path: str, dimension: int, signature: str, initial_capacity: int = 1024):
+        self.path = path
+        self.dimension = dimension
+        self.signature = signature
+        self.initial_capacity = initial_capacity
+
+        self._rows: Dict[bytes, int] = {}
+        self._records = None
+        self._header = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        """Content hash a text is cached under"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def _dtypes(self):
+        import numpy as np
+
+        header = np.dtype([('magic', 'S8'), ('version', '<u4'), ('dimension', '<u4'),
+                           ('count', '<u8'), ('signature', 'S40')])
+        record = np.dtype([('key', 'V16'), ('vector', '<f4', (self.dimension,))])
+        return header, record
+
+    def _open(self):
+        """Map the cache file, creating it if needed; caller holds the lock"""
+        import numpy as np
+
+        header_dtype, record_dtype = self._dtypes()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.path, 'a+b') as f:
+            self._file_lock(f)
+            try:
+                if os.fstat(f.fileno()).st_size < HEADER_SIZE:
+                    header = np.zeros((), dtype=header_dtype)
+                    header['magic'] = CACHE_MAGIC
+                    header['version'] = CACHE_VERSION
+                    header['dimension'] = self.dimension
+                    header['signature'] = self.signature.encode('utf-8')
+                    f.truncate(0)
+                    f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+                    f.truncate(HEADER_SIZE + self.initial_capacity * record_dtype.itemsize)
+            finally:
+                self._file_unlock(f)
+
+        self._header = np.memmap(self.path, dtype=header_dtype, mode='r+', shape=())
+        header = self._header[()]
+        if (header['magic'] != CACHE_MAGIC or header['version'] != CACHE_VERSION
+                or header['dimension'] != self.dimension
+                or header['signature'].decode('utf-8') != self.signature):
+            raise ValueError(f"{self.path} holds vectors for a different embedding provider")
+        self._map_records()
+
+    def _map_records(self):
+        """(Re)map the record area at the current file size; caller holds the lock"""
+        import numpy as np
+
+        _, record_dtype = self._dtypes()
+        capacity = (os.path.getsize(self.path) - HEADER_SIZE) // record_dtype.itemsize
+        self._records = np.memmap(self.path, dtype=record_dtype, mode='r+',
+                                  offset=HEADER_SIZE, shape=(capacity,))
+
+    def _refresh(self):
+        """Index records appended since the last refresh, by this or another process"""
+        count = int(self._header['count'])
+        if count > len(self._records):
+            self._map_records()
+        for row in range(len(self._rows), count):
+            self._rows[bytes(self._records[row]['key'])] = row
+
+    def get_many(self, digests: List[bytes]) -> Dict[bytes, "np.ndarray"]:
+        """Cached vectors for the digests that have one"""
+        with self._lock:
+            if self._records is None:
+                self._open()
+            if any(digest not in self._rows for digest in digests):
+                self._refresh()
+            return {digest: self._records[self._rows[digest]]['vector'].copy()
+                    for digest in digests if digest in self._rows}
+
+    def put_many(self, digests: List[bytes], vectors: "np.ndarray"):
+        """Append vectors for digests that are not cached yet"""
+        with self._lock:
+            if self._records is None:
+                self._open()
+            with open(self.path, 'r+b') as f:
+                self._file_lock(f)
+                try:
+                    self._refresh()
+                    new = [(digest, vector) for digest, vector in zip(digests, vectors)
+                           if digest not in self._rows]
+                    count = len(self._rows)
+                    if count + len(new) > len(self._records):
+                        # Double the record area; other processes remap when they see the count
+                        capacity = max(2 * len(self._records), count + len(new))
+                        f.truncate(HEADER_SIZE + capacity * self._records.dtype.itemsize)
+                        self._map_records()
+
+                    for digest, vector in new:
+                        if digest in self._rows:
+                            continue
+                        self._records[count] = (digest, vector)
+                        self._rows[digest] = count
+                        count += 1
+                    # Publish the records before the count that makes them visible
+                    self._records.flush()
+                    self._header['count'] = count
+                    self._header.flush()
+                finally:
+                    self._file_unlock(f)
+
+    @staticmethod
+    def _file_lock(f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    @staticmethod
+    def _file_unlock(f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """
+    Wraps a provider with a persistent content-hash cache
+    Only texts never embedded before (by any process sharing the cache file)
+    reach the wrapped provider, in one batch per call
+    """
+
+    def __init__(self, provider: EmbeddingProvider, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.provider = provider
+        self.name = provider.name
+        self.dimension = provider.dimension
+        self.cache = EmbeddingCache(
+            os.path.join(cache_dir, f"{provider.signature}.cache"), provider.dimension, provider.signature
+        )
+        self.stats = {'hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        self._cache_error = None
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        import numpy as np
+
+        if self._cache_error:
+            return self.provider.embed(texts)
+
+        digests = [EmbeddingCache.digest(text) for text in texts]
+        try:
+            cached = self.cache.get_many(digests)
+        except (OSError, ValueError) as e:
+            self._disable_cache(e)
+            return self.provider.embed(texts)
+
+        # Embed each distinct missing text once
+        missing: Dict[bytes, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest not in cached:
+                missing.setdefault(digest, text)
+        if missing:
+            fresh = self.provider.embed(list(missing.values()))
+            try:
+                self.cache.put_many(list(missing), fresh)
+            except (OSError, ValueError) as e:
+                self._disable_cache(e)
+            cached.update(zip(missing, fresh))
+
+        with self._stats_lock:
+            self.stats['misses'] += len(missing)
+            self.stats['hits'] += len(texts) - len(missing)
+
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([cached[digest] for digest in digests])
+
+    def _disable_cache(self, error: Exception):
+        """Keep embedding without the cache after it fails"""
+        print(f"Warning: Embedding cache disabled: {error}")
+        self._cache_error = str(error)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'provider': self.signature,
+                **self.stats,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+                'cached_vectors': len(self.cache),
+                'cache_file': self.cache.path,
+                'cache_error': self._cache_error
+            }
+
+
+_default_provider: Optional[EmbeddingProvider] = None
+_default_lock = threading.Lock()
+
+
+def get_default_provider() -> EmbeddingProvider:
+    """Process-wide hashing embedder backed by the on-disk cache, shared by all memory agents"""
+    global _default_provider
+    if _default_provider is None:
+        with _default_lock:
+            if _default_provider is None:
+                _default_provider = CachedEmbeddingProvider(HashingEmbedder())
+    return _default_provider
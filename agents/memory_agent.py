@@ -2,33 +2,93 @@
 Memory Agent - Knowledge persistence and retrieval with vector search
 """
 
+import atexit
+import bisect
+import heapq
 import json
+import threading
+import time
+from collections import defaultdict, deque
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-import numpy as np
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
+from agents.embeddings import EmbeddingProvider, get_default_provider
+from utils.deadline import Deadline
 from utils.logger import SystemLogger
 
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+# Metadata filters accepted by MemoryAgent.retrieve()
+FILTER_KEYS = ('query_type', 'agent', 'min_confidence', 'since', 'until')
+
 class MemoryAgent:
-    def __init__(self):
+    def __init__(self, write_behind: bool = True, batch_size: int = 32, flush_interval: float = 0.05,
+                 embedder: Optional[EmbeddingProvider] = None):
         self.name = "Memory"
         self.logger = SystemLogger()
         
+        # Shared, disk-cached embedder unless one is given
+        self.embedder = embedder or get_default_provider()
+        
         # Memory storage structures
         self.conversation_memory = []
         self.knowledge_base = {}
         self.agent_states = {}
+        # (expires_at, agent_name) for states stored with a ttl, soonest first
+        self._state_expiry = []
+        # Serialized size of each agent state, and their total, for estimate_size()
+        self._state_sizes: Dict[str, int] = {}
+        self._state_bytes = 0
         
-        # Simple vector storage (in production, use FAISS or Chroma)
+        # Vector storage, one embedding per key (in production, use FAISS or Chroma)
         self.vector_store = {}
         
+        # Secondary indexes over conversation_memory rows for filtered retrieval
+        self._reset_indexes()
+        
+        # Guards the stores above when queries are served concurrently
+        self._lock = threading.RLock()
+        
+        # Write-behind queue: records waiting to be embedded and indexed
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._in_flight = 0
+        self._queue_condition = threading.Condition()
+        self._writer = None
+        self._closed = False
+        
+        if write_behind:
+            self._writer = threading.Thread(target=self._write_behind_loop, name="memory-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+        
     def store(self, key: str, value: Any, metadata: Dict[str, Any]) -> Dict[str, bool]:
         """
         Store information with metadata and vector representation
+        In write-behind mode the record is queued and indexed by a background worker;
+        reads flush the queue first, so stored records are always visible to them
         """
         self.logger.log_agent_action(self.name, "Storing", key)
+        record = self._new_record(key, value, metadata)
+        
+        # Decided under the condition close() takes, so a queued record is always flushed
+        with self._queue_condition:
+            queued = self.write_behind and not self._closed
+            if queued:
+                self._pending.append(record)
+                self._queue_condition.notify_all()
+        if not queued:
+            self._index_records([record])
         
-        # Create record with timestamp
-        record = {
+        return {'success': True, 'stored': key}
+    
+    @staticmethod
+    def _new_record(key: str, value: Any, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a record with timestamp"""
+        return {
             'key': key,
             'value': value,
             'metadata': {
@@ -37,47 +97,278 @@ class MemoryAgent:
                 'confidence': metadata.get('confidence', 0.8)
             }
         }
-        
+    
+    def _index_records(self, records: List[Dict[str, Any]]):
+        """Embed records and add them to the memory stores"""
+        # Embed the whole batch outside the lock
+        vectors = self.embedder.embed([self._record_text(record['key'], record['value']) for record in records])
+        
+        with self._lock:
+            for record, vector in zip(records, vectors):
+                self._add_record(record, vector)
+    
+    def _add_record(self, record: Dict[str, Any], vector: "np.ndarray"):
+        """Add an embedded record to the memory stores; caller holds the lock"""
         # Store in knowledge base
-        self.knowledge_base[key] = record
+        self.knowledge_base[record['key']] = record
         
         # Store in conversation memory
         self.conversation_memory.append(record)
+        self._index_row(len(self.conversation_memory) - 1, record)
         
-        # Create and store vector representation
-        vector = self._create_vector(key, value)
-        self.vector_store[key] = vector
-        
-        return {'success': True, 'stored': key}
+        # Store vector representation
+        self.vector_store[record['key']] = vector
+    
+    def _reset_indexes(self):
+        """Empty the secondary indexes; caller holds the lock (or is __init__)"""
+        self._rows_by_query_type: Dict[str, List[int]] = defaultdict(list)
+        self._rows_by_agent: Dict[str, List[int]] = defaultdict(list)
+        # Parallel sorted lists: (timestamps, rows) and (confidences, rows)
+        self._timestamps: List[str] = []
+        self._timestamp_rows: List[int] = []
+        self._confidences: List[float] = []
+        self._confidence_rows: List[int] = []
+        # The row each key was last stored in; earlier rows for the key are superseded
+        self._latest_row: Dict[str, int] = {}
+        # Serialized size of all indexed rows, for estimate_size()
+        self._record_bytes = 0
+    
+    def _index_row(self, row: int, record: Dict[str, Any]):
+        """Add a conversation_memory row to the secondary indexes; caller holds the lock"""
+        metadata = record['metadata']
+        self._latest_row[record['key']] = row
+        self._record_bytes += len(json.dumps(record, default=str))
+        
+        if metadata.get('query_type') is not None:
+            self._rows_by_query_type[metadata['query_type']].append(row)
+        for agent in self._record_agents(metadata):
+            self._rows_by_agent[agent].append(row)
+        
+        # Rows usually arrive in timestamp order, so this is nearly always an append
+        position = bisect.bisect_right(self._timestamps, metadata['timestamp'])
+        self._timestamps.insert(position, metadata['timestamp'])
+        self._timestamp_rows.insert(position, row)
+        
+        position = bisect.bisect_right(self._confidences, metadata['confidence'])
+        self._confidences.insert(position, metadata['confidence'])
+        self._confidence_rows.insert(position, row)
+    
+    @staticmethod
+    def _record_agents(metadata: Dict[str, Any]) -> List[str]:
+        """Agents named in a record's metadata ('agent' or 'agents')"""
+        agents = list(metadata.get('agents') or [])
+        if metadata.get('agent'):
+            agents.append(metadata['agent'])
+        return agents
     
-    def retrieve(self, query: str, top_k: int = 5) -> Dict[str, Any]:
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """Take up to batch_size pending records; caller holds the queue condition"""
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        self._in_flight += len(batch)
+        return batch
+    
+    def _finish_batch(self, batch: List[Dict[str, Any]]):
+        """Index a taken batch and wake up anyone waiting for the queue to drain"""
+        try:
+            self._index_records(batch)
+        finally:
+            with self._queue_condition:
+                self._in_flight -= len(batch)
+                self._queue_condition.notify_all()
+    
+    def _write_behind_loop(self):
+        """Background worker: index pending records in micro-batches"""
+        while True:
+            with self._queue_condition:
+                while not self._pending and not self._closed:
+                    self._queue_condition.wait()
+                if not self._pending:
+                    return
+                # Give a burst of stores a moment to fill the batch
+                if len(self._pending) < self.batch_size and not self._closed:
+                    self._queue_condition.wait(self.flush_interval)
+                batch = self._take_batch()
+            
+            if batch:
+                self._finish_batch(batch)
+    
+    def flush(self):
+        """Block until every stored record has been indexed, helping with the work"""
+        while True:
+            with self._queue_condition:
+                if not self._pending and not self._in_flight:
+                    return
+                if not self._pending:
+                    self._queue_condition.wait()
+                    continue
+                batch = self._take_batch()
+            
+            self._finish_batch(batch)
+    
+    def set_write_behind(self, enabled: bool):
+        """
+        Turn write-behind indexing on or off
+        While off, store() embeds and indexes each record before returning, so its
+        cost shows up in the query that stored it (e.g. when profiling)
+        """
+        with self._queue_condition:
+            if enabled and self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._write_behind_loop, name="memory-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+            self.write_behind = enabled
+        self.flush()
+    
+    def close(self):
+        """Flush the write-behind queue and stop the background worker"""
+        with self._queue_condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue_condition.notify_all()
+        
+        # The exit hook would keep a closed agent alive until the process ends
+        atexit.unregister(self.close)
+        self.flush()
+        if self._writer:
+            self._writer.join()
+    
+    def retrieve(self, query: str, top_k: int = 5, deadline: Optional[Deadline] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Retrieve relevant information using keyword and vector similarity search
+        Falls back to keyword-only results if the deadline runs out
+        
+        filters restrict the search to records whose metadata matches all of:
+          query_type      a route name, or a list of them
+          agent           an agent name, or a list of them ('agent' or 'agents' metadata)
+          min_confidence  lowest confidence to include
+          since / until   timestamp range, inclusive (ISO string or datetime)
+        Only the latest record for each key is considered when filtering
         """
         self.logger.log_agent_action(self.name, "Retrieving", query)
+        self.flush()
         
-        # Keyword search
-        keyword_results = self._keyword_search(query)
-        
-        # Vector similarity search
-        vector_results = self._vector_search(query, top_k)
+        degraded = False
+        with self._lock:
+            # Narrow to qualifying rows via the secondary indexes before any scoring
+            rows = self._filter_rows(filters) if filters else None
+            records = [self.conversation_memory[row] for row in rows] if rows is not None else None
+            
+            # Keyword search
+            keyword_results = self._keyword_search(query, records)
+            
+            # Vector similarity search
+            if deadline and deadline.expired():
+                vector_results = []
+                degraded = True
+            else:
+                keys = [record['key'] for record in records] if records is not None else None
+                vector_results = self._vector_search(query, top_k, keys)
         
         # Merge and deduplicate results
         all_results = self._merge_results(keyword_results, vector_results)
         
-        return {
+        result = {
             'success': True,
             'results': all_results[:top_k],
             'count': len(all_results),
-            'query': query
+            'query': query,
+            'degraded': degraded
         }
+        if rows is not None:
+            result['filters'] = filters
+            result['candidates'] = len(rows)
+        return result
+    
+    def _filter_rows(self, filters: Dict[str, Any]) -> List[int]:
+        """
+        Rows whose record matches every filter; caller holds the lock
+        The most selective index supplies the candidates, which are then checked
+        against the remaining filters one by one
+        """
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown memory filter(s): {', '.join(sorted(unknown))}")
+        
+        query_types = self._as_set(filters.get('query_type'))
+        agents = self._as_set(filters.get('agent'))
+        min_confidence = filters.get('min_confidence')
+        since = self._as_timestamp(filters.get('since'))
+        until = self._as_timestamp(filters.get('until'))
+        if min_confidence is not None and (isinstance(min_confidence, bool)
+                                           or not isinstance(min_confidence, (int, float))):
+            raise ValueError("min_confidence must be a number")
+        if any(bound is not None and not isinstance(bound, str) for bound in (since, until)):
+            raise ValueError("since and until must be ISO timestamps or datetimes")
+        
+        # Candidate row lists from each index, as lists of lists to avoid copying buckets
+        candidates = []
+        if query_types is not None:
+            candidates.append([self._rows_by_query_type.get(value, []) for value in query_types])
+        if agents is not None:
+            candidates.append([self._rows_by_agent.get(value, []) for value in agents])
+        if min_confidence is not None:
+            start = bisect.bisect_left(self._confidences, min_confidence)
+            candidates.append([self._confidence_rows[start:]])
+        if since is not None or until is not None:
+            start = bisect.bisect_left(self._timestamps, since) if since is not None else 0
+            end = bisect.bisect_right(self._timestamps, until) if until is not None else len(self._timestamps)
+            candidates.append([self._timestamp_rows[start:end]])
+        
+        if candidates:
+            smallest = min(candidates, key=lambda lists: sum(len(rows) for rows in lists))
+            rows = sorted({row for lists in smallest for row in lists})
+        else:
+            rows = range(len(self.conversation_memory))
+        
+        matching = []
+        for row in rows:
+            record = self.conversation_memory[row]
+            if self._latest_row.get(record['key']) != row:
+                continue
+            metadata = record['metadata']
+            if query_types is not None and metadata.get('query_type') not in query_types:
+                continue
+            if agents is not None and not agents.intersection(self._record_agents(metadata)):
+                continue
+            if min_confidence is not None and metadata['confidence'] < min_confidence:
+                continue
+            if since is not None and metadata['timestamp'] < since:
+                continue
+            if until is not None and metadata['timestamp'] > until:
+                continue
+            matching.append(row)
+        return matching
     
-    def _keyword_search(self, query: str) -> List[Dict]:
-        """Search using keyword matching"""
+    @staticmethod
+    def _as_set(value: Any) -> Optional[set]:
+        """A filter value or list of values as a set"""
+        if value is None:
+            return None
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return set(value)
+        return {value}
+    
+    @staticmethod
+    def _as_timestamp(value: Any) -> Optional[str]:
+        """Timestamps are stored as ISO strings, which sort chronologically"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+    
+    def _keyword_search(self, query: str, records: Optional[List[Dict[str, Any]]] = None) -> List[Dict]:
+        """
+        Search using keyword matching
+        Searches the given records only, if any, instead of the whole memory
+        """
         query_lower = query.lower()
         results = []
         
-        for key, record in self.knowledge_base.items():
+        for record in (records if records is not None else self.knowledge_base.values()):
+            key = record['key']
             # Check key match
             if any(word in key.lower() for word in query_lower.split()):
                 results.append({
@@ -97,7 +388,7 @@ class MemoryAgent:
                 })
         
         # Also search conversation memory
-        for record in self.conversation_memory:
+        for record in (records if records is not None else self.conversation_memory):
             if record['key'] in [r['key'] for r in results]:
                 continue
             
@@ -111,15 +402,23 @@ class MemoryAgent:
         
         return results
     
-    def _vector_search(self, query: str, top_k: int) -> List[Dict]:
-        """Search using vector similarity (cosine similarity)"""
-        if not self.vector_store:
+    def _vector_search(self, query: str, top_k: int, keys: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Search using vector similarity (cosine similarity)
+        Scores the given keys only, if any, instead of every stored vector
+        """
+        if not self.vector_store or keys == []:
             return []
         
-        query_vector = self._create_vector(query, query)
+        query_vector = self.embed(query)
+        
+        if keys is None:
+            candidates = self.vector_store.items()
+        else:
+            candidates = [(key, self.vector_store[key]) for key in keys if key in self.vector_store]
         
         similarities = []
-        for key, stored_vector in self.vector_store.items():
+        for key, stored_vector in candidates:
             similarity = self._cosine_similarity(query_vector, stored_vector)
             if similarity > 0.3:  # Threshold
                 similarities.append({
@@ -167,57 +466,23 @@ class MemoryAgent:
         
         return results
     
-    def _create_vector(self, text: str, content: Any) -> np.ndarray:
-        """
-        Create simple vector representation (bag of words with TF-IDF-like weighting)
-        In production, use proper embeddings (OpenAI, Sentence Transformers, etc.)
-        """
-        # Combine text and content
-        full_text = text + " " + json.dumps(content)
-        full_text = full_text.lower()
-        
-        # Simple vocabulary (top 100 ML terms)
-        vocab = [
-            'neural', 'network', 'learning', 'deep', 'machine', 'data', 'model',
-            'training', 'optimization', 'gradient', 'descent', 'transformer',
-            'attention', 'layer', 'algorithm', 'classification', 'regression',
-            'supervised', 'unsupervised', 'reinforcement', 'cnn', 'rnn', 'lstm',
-            'gan', 'autoencoder', 'embedding', 'feature', 'backpropagation',
-            'loss', 'accuracy', 'precision', 'recall', 'f1', 'score',
-            'overfitting', 'underfitting', 'regularization', 'dropout',
-            'batch', 'normalization', 'activation', 'relu', 'sigmoid', 'softmax',
-            'convolutional', 'recurrent', 'feedforward', 'architecture',
-            'weights', 'bias', 'parameter', 'hyperparameter', 'epoch',
-            'tensorflow', 'pytorch', 'keras', 'vision', 'nlp', 'speech',
-            'image', 'text', 'sequence', 'time', 'series', 'prediction',
-            'inference', 'deployment', 'research', 'paper', 'study',
-            'experiment', 'dataset', 'preprocessing', 'augmentation',
-            'transfer', 'fine', 'tuning', 'pretrained', 'bert', 'gpt',
-            't5', 'roberta', 'xlnet', 'efficientnet', 'resnet', 'vgg',
-            'yolo', 'mask', 'rcnn', 'segmentation', 'detection', 'recognition',
-            'generation', 'synthesis', 'style', 'adversarial', 'q-learning',
-            'policy', 'value', 'reward', 'agent', 'environment', 'state', 'action'
-        ]
-        
-        # Create vector
-        vector = np.zeros(len(vocab))
-        words = full_text.split()
-        
-        for i, term in enumerate(vocab):
-            # Count occurrences
-            count = sum(1 for word in words if term in word)
-            # Simple TF-IDF-like weighting
-            vector[i] = count * (1 + np.log(1 + len(vocab)))
-        
-        # Normalize
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = vector / norm
-        
-        return vector
-    
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
+    @staticmethod
+    def _record_text(text: str, content: Any) -> str:
+        """Text a record is embedded from: its key plus its serialized value"""
+        return text + " " + json.dumps(content)
+    
+    def _create_vector(self, text: str, content: Any) -> "np.ndarray":
+        """Create the vector representation of a single record"""
+        return self.embedder.embed_one(self._record_text(text, content))
+    
+    def embed(self, text: str) -> "np.ndarray":
+        """Get the normalized vector used to search memory for a piece of text"""
+        return self.embedder.embed_one(text)
+    
+    def _cosine_similarity(self, vec1: "np.ndarray", vec2: "np.ndarray") -> float:
         """Calculate cosine similarity between two vectors"""
+        import numpy as np
+        
         dot_product = np.dot(vec1, vec2)
         norm1 = np.linalg.norm(vec1)
         norm2 = np.linalg.norm(vec2)
@@ -227,38 +492,148 @@ class MemoryAgent:
         
         return float(dot_product / (norm1 * norm2))
     
-    def update_agent_state(self, agent_name: str, state: Dict[str, Any]) -> Dict[str, bool]:
-        """Update the state of a specific agent"""
+    def update_agent_state(self, agent_name: str, state: Dict[str, Any],
+                           ttl: Optional[float] = None) -> Dict[str, bool]:
+        """
+        Update the state of a specific agent
+        With a ttl (in seconds) the state expires and is dropped after that long
+        """
         self.logger.log_agent_action(self.name, "Updating Agent State", agent_name)
         
-        self.agent_states[agent_name] = {
-            **state,
-            'last_updated': datetime.now().isoformat()
-        }
+        with self._lock:
+            self._expire_agent_states()
+            entry = {
+                **state,
+                'last_updated': datetime.now().isoformat()
+            }
+            if ttl is not None:
+                # Wall-clock time, so expiry survives export_state()/load_state()
+                entry['expires_at'] = time.time() + ttl
+                heapq.heappush(self._state_expiry, (entry['expires_at'], agent_name))
+            self._set_agent_state(agent_name, entry)
         
         return {'success': True, 'agent': agent_name}
     
     def get_agent_state(self, agent_name: str) -> Optional[Dict[str, Any]]:
-        """Retrieve the state of a specific agent"""
-        return self.agent_states.get(agent_name)
+        """Retrieve the state of a specific agent, or None if it is unknown or expired"""
+        with self._lock:
+            self._expire_agent_states()
+            return self.agent_states.get(agent_name)
+    
+    def clear_agent_state(self, agent_name: str) -> Dict[str, bool]:
+        """Remove the state of a specific agent"""
+        with self._lock:
+            removed = self._drop_agent_state(agent_name)
+        return {'success': True, 'agent': agent_name, 'removed': removed}
+    
+    def _set_agent_state(self, agent_name: str, entry: Dict[str, Any]):
+        """Store an agent state and account for its size; caller holds the lock"""
+        size = len(json.dumps(entry, default=str))
+        self._state_bytes += size - self._state_sizes.get(agent_name, 0)
+        self._state_sizes[agent_name] = size
+        self.agent_states[agent_name] = entry
+    
+    def _drop_agent_state(self, agent_name: str) -> bool:
+        """Remove an agent state, if present; caller holds the lock"""
+        self._state_bytes -= self._state_sizes.pop(agent_name, 0)
+        return self.agent_states.pop(agent_name, None) is not None
+    
+    def _replace_agent_states(self, states: Dict[str, Any]):
+        """Replace every agent state, e.g. from a snapshot; caller holds the lock"""
+        self.agent_states = {}
+        self._state_sizes = {}
+        self._state_bytes = 0
+        for agent_name, agent_state in states.items():
+            self._set_agent_state(agent_name, agent_state)
+        self._state_expiry = [(agent_state['expires_at'], agent_name)
+                              for agent_name, agent_state in self.agent_states.items()
+                              if agent_state.get('expires_at') is not None]
+        heapq.heapify(self._state_expiry)
+        self._expire_agent_states()
+    
+    def _expire_agent_states(self):
+        """Drop agent states whose ttl has passed; caller holds the lock"""
+        now = time.time()
+        while self._state_expiry and self._state_expiry[0][0] <= now:
+            expires_at, agent_name = heapq.heappop(self._state_expiry)
+            state = self.agent_states.get(agent_name)
+            # Skip heap entries for states that were since replaced or removed
+            if state is not None and state.get('expires_at') == expires_at:
+                self._drop_agent_state(agent_name)
     
     def get_conversation_history(self, limit: int = 10) -> List[Dict]:
         """Get recent conversation history"""
+        self.flush()
         return self.conversation_memory[-limit:]
     
     def clear_memory(self) -> Dict[str, bool]:
         """Clear all memory (useful for testing)"""
         self.logger.log_agent_action(self.name, "Clearing Memory", "all")
         
-        self.conversation_memory = []
-        self.knowledge_base = {}
-        self.agent_states = {}
-        self.vector_store = {}
+        self.flush()
+        with self._lock:
+            self.conversation_memory = []
+            self.knowledge_base = {}
+            self._replace_agent_states({})
+            self.vector_store = {}
+            self._reset_indexes()
         
         return {'success': True}
     
+    def export_state(self) -> Dict[str, Any]:
+        """Snapshot of all stored data in a JSON-serializable form"""
+        self.flush()
+        with self._lock:
+            self._expire_agent_states()
+            return {
+                'conversation_memory': list(self.conversation_memory),
+                'agent_states': dict(self.agent_states),
+                'vectors': {key: vector.tolist() for key, vector in self.vector_store.items()}
+            }
+    
+    def load_state(self, state: Dict[str, Any]):
+        """Replace all stored data with a snapshot from export_state()"""
+        import numpy as np
+        
+        self.flush()
+        records = state.get('conversation_memory', [])
+        # Later records win, as they do in store()
+        knowledge_base = {record['key']: record for record in records}
+        
+        # Vectors from another embedding provider are not comparable; embed those records again
+        vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in state.get('vectors', {}).items()
+                   if key in knowledge_base and len(vector) == self.embedder.dimension}
+        stale = [key for key in knowledge_base if key not in vectors]
+        if stale:
+            texts = [self._record_text(key, knowledge_base[key]['value']) for key in stale]
+            vectors.update(zip(stale, self.embedder.embed(texts)))
+        
+        with self._lock:
+            self.conversation_memory = list(records)
+            self.knowledge_base = knowledge_base
+            self._replace_agent_states(state.get('agent_states', {}))
+            self.vector_store = vectors
+            self._reset_indexes()
+            for row, record in enumerate(self.conversation_memory):
+                self._index_row(row, record)
+    
+    def estimate_size(self) -> int:
+        """
+        Approximate number of bytes held by stored records, vectors and agent states
+        Sizes are tracked as data is added, so this does not walk the stores
+        """
+        self.flush()
+        with self._lock:
+            self._expire_agent_states()
+            # Every vector comes from the same embedder
+            vectors = len(self.vector_store) * next(iter(self.vector_store.values())).nbytes if self.vector_store else 0
+            return self._record_bytes + vectors + self._state_bytes
+    
     def get_statistics(self) -> Dict[str, int]:
         """Get memory statistics"""
+        self.flush()
+        with self._lock:
+            self._expire_agent_states()
         return {
             'conversations': len(self.conversation_memory),
             'knowledge_items': len(self.knowledge_base),
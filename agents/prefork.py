@@ -0,0 +1,240 @@
+"""
+Pre-forked Coordinator - Runs queries on a pool of coordinator worker processes
+Workers are forked once at construction, before any threads are started, and
+each runs its own CoordinatorAgent. Their default memory is one shared memory
+segment: this process is its single writer, and every worker reads the
+vectors in place instead of holding its own copy
+"""
+
+import atexit
+import multiprocessing
+import pickle
+import signal
+import threading
+import zlib
+from typing import Dict, List, Any, Optional, Tuple
+from agents.coordinator import CoordinatorAgent
+from agents.shared_memory import SharedMemoryAgent, SharedMemoryWriter
+from utils.deadline import Deadline
+from utils.tracing import tracer
+
+
+def _worker_main(tasks, store_connection, segment: str, options: Dict[str, Any]):
+    """Worker process: answer ('query' | 'search' | 'stats', arguments) requests one at a time"""
+    # Ctrl-C reaches the whole process group; the parent decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    coordinator = CoordinatorAgent(memory=SharedMemoryAgent(segment, store_connection), **options)
+    coordinator.prewarm()
+
+    while True:
+        try:
+            request = tasks.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+
+        kind, arguments = request
+        try:
+            if kind == 'search':
+                reply = (coordinator.search_memory(**arguments), None)
+            elif kind == 'stats':
+                reply = (coordinator.get_statistics(), None)
+            else:
+                # Spans are recorded in this process; the caller gets their per-stage totals
+                with tracer.collect() as spans:
+                    result = coordinator.process_query_with_metadata(**arguments)
+                result['metadata']['stage_timings'] = tracer.stage_timings(spans)
+                reply = (result, None)
+        except Exception as e:
+            reply = (None, e)
+        try:
+            tasks.send(reply)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            # Nothing was written; report the failure instead
+            tasks.send((None, RuntimeError(f"Query worker could not return its result: {e}")))
+
+    # Keep the conversations of sessions served by this worker
+    coordinator.sessions.spill_all()
+    coordinator.close()
+
+
+class PreforkCoordinator(CoordinatorAgent):
+    """
+    CoordinatorAgent whose queries run in worker processes
+    process_query_with_metadata() blocks the calling thread while a worker
+    answers, so callers bring the concurrency (QueryScheduler, BatchRunner).
+    Queries with a session id always go to the same worker, which holds that
+    session's memory; other queries go to the least busy worker.
+    A worker that dies is taken out of routing rather than replaced: forking
+    again once this process runs threads could copy a held lock into the child
+    """
+
+    def __init__(self, workers: int = 4, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Pre-forked workers need a platform with fork()")
+
+        self.writer = SharedMemoryWriter()
+        super().__init__(**options)
+
+        context = multiprocessing.get_context('fork')
+        self.workers = workers
+        self._tasks = []
+        self._processes = []
+        # A worker answers one query at a time; its lock is held for the round trip
+        self._locks = [threading.Lock() for _ in range(workers)]
+        self._outstanding = [0] * workers
+        self._alive = [True] * workers
+        self._dispatch_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'dispatched': [0] * workers, 'failed': 0}
+
+        for index in range(workers):
+            parent_end, child_end = context.Pipe()
+            store_connection = self.writer.connect()
+            process = context.Process(target=_worker_main, args=(child_end, store_connection, self.writer.name, options),
+                                      name=f"query-worker-{index}", daemon=True)
+            process.start()
+            child_end.close()
+            store_connection.close()
+            self._tasks.append(parent_end)
+            self._processes.append(process)
+
+        # This process reads the shared memory too (memory queries, /memory/search)
+        self._memory = SharedMemoryAgent(self.writer.name, self.writer.connect())
+        self.writer.start()
+        atexit.register(self.close)
+
+    def process_query_with_metadata(self, query: str, route: Optional[str] = None,
+                                    deadline: Optional[Deadline] = None,
+                                    session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Answer a query on a worker process; same result as CoordinatorAgent"""
+        # Deadlines are based on time.monotonic(), which all processes on a host share
+        worker, result = self._dispatch('query', {'query': query, 'route': route, 'deadline': deadline,
+                                                  'session_id': session_id}, session_id)
+        result['metadata']['worker'] = worker
+        return result
+
+    def search_memory(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                      session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Session memories live on the session's worker; the default memory is read here"""
+        if not session_id:
+            return super().search_memory(query, top_k=top_k, filters=filters)
+        return self._dispatch('search', {'query': query, 'top_k': top_k, 'filters': filters,
+                                         'session_id': session_id}, session_id)[1]
+
+    def _dispatch(self, kind: str, arguments: Dict[str, Any], session_id: Optional[str]) -> Tuple[int, Any]:
+        """Run a request on a worker; returns the worker and its result"""
+        worker = self._pick_worker(session_id)
+        return worker, self._call_worker(worker, kind, arguments)
+
+    def _call_worker(self, worker: int, kind: str, arguments: Dict[str, Any]) -> Any:
+        """Run a request on a given worker, already counted as in flight on it"""
+        result, error = None, None
+        try:
+            with self._locks[worker]:
+                try:
+                    self._tasks[worker].send((kind, arguments))
+                    result, error = self._tasks[worker].recv()
+                except (EOFError, OSError):
+                    error = RuntimeError(f"Query worker {worker} exited")
+                    self._mark_dead(worker)
+        finally:
+            with self._dispatch_lock:
+                self._outstanding[worker] -= 1
+                if error is not None:
+                    self.stats['failed'] += 1
+
+        if error is not None:
+            raise error
+        return result
+
+    def _pick_worker(self, session_id: Optional[str]) -> int:
+        """
+        The session's worker, or the one with the fewest queries in flight
+        Only live workers are considered; a session whose worker died moves to
+        another one and starts with an empty session memory
+        """
+        worker = None
+        with self._dispatch_lock:
+            exited = [i for i in range(self.workers) if self._alive[i] and not self._processes[i].is_alive()]
+            for dead in exited:
+                self._alive[dead] = False
+            live = [i for i in range(self.workers) if self._alive[i]]
+            if live:
+                if session_id:
+                    slot = zlib.crc32(session_id.encode('utf-8'))
+                    worker = slot % self.workers if self._alive[slot % self.workers] else live[slot % len(live)]
+                else:
+                    worker = min(live, key=lambda i: self._outstanding[i])
+                self._outstanding[worker] += 1
+                self.stats['dispatched'][worker] += 1
+
+        for dead in exited:
+            self.logger.log_error(f"Query worker {dead} exited; routing around it")
+        if worker is None:
+            raise RuntimeError("No query workers are running")
+        return worker
+
+    def _mark_dead(self, worker: int):
+        """Take a worker whose pipe broke out of routing"""
+        with self._dispatch_lock:
+            if not self._alive[worker]:
+                return
+            self._alive[worker] = False
+        self.logger.log_error(f"Query worker {worker} exited; routing around it")
+
+    def close(self):
+        """Stop the workers (they spill their sessions), then the shared memory"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        for worker, tasks in enumerate(self._tasks):
+            with self._locks[worker]:
+                try:
+                    tasks.send(None)
+                except OSError:
+                    pass
+        for process, tasks in zip(self._processes, self._tasks):
+            process.join()
+            tasks.close()
+
+        super().close()
+        self.writer.close()
+
+    def _worker_reports(self) -> List[Optional[Dict[str, Any]]]:
+        """
+        Each worker's session memory, cache and embedding statistics (None if it is dead)
+        A busy worker replies once its current query is done
+        """
+        reports = []
+        for worker in range(self.workers):
+            with self._dispatch_lock:
+                alive = self._alive[worker]
+                if alive:
+                    self._outstanding[worker] += 1
+            try:
+                reports.append(self._call_worker(worker, 'stats', {}) if alive else None)
+            except RuntimeError:
+                reports.append(None)
+        return reports
+
+    def get_worker_statistics(self) -> Dict[str, Any]:
+        """
+        Queries dispatched per worker, the shared memory segment's state and each
+        worker coordinator's statistics. This process answers no queries, so its
+        own caches and session memories stay empty; the workers' are the real ones
+        """
+        coordinators = self._worker_reports()
+        with self._dispatch_lock:
+            return {
+                'workers': self.workers,
+                'alive': [self._alive[i] and process.is_alive() for i, process in enumerate(self._processes)],
+                'dispatched': list(self.stats['dispatched']),
+                'in_flight': list(self._outstanding),
+                'failed': self.stats['failed'],
+                'shared_memory': self.writer.get_statistics(),
+                'coordinators': coordinators
+            }
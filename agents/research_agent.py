@@ -2,14 +2,34 @@
 Research Agent - Information retrieval and search
 """
 
-from typing import Dict, List, Any
+from typing import Dict, Any, Optional
+from agents.corpus_index import CorpusIndex
+from utils.deadline import Deadline
 from utils.logger import SystemLogger
 
 class ResearchAgent:
-    def __init__(self):
+    def __init__(self, index_path: Optional[str] = None):
         self.name = "Research"
         self.logger = SystemLogger()
         self.knowledge_base = self._initialize_knowledge_base()
+        # Bumped whenever the corpus changes so derived caches can be invalidated
+        self.corpus_version = 1
+        self.index = self._load_index(index_path)
+    
+    def _load_index(self, index_path: Optional[str]) -> CorpusIndex:
+        """
+        Map the compiled corpus index if there is a current one, else build it in memory
+        See compile_corpus.py for producing the artifact
+        """
+        if index_path:
+            try:
+                index = CorpusIndex.load(index_path)
+                if index.is_current(self.knowledge_base):
+                    return index
+                print(f"Warning: Corpus index {index_path} is stale; rebuilding it in memory")
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not load corpus index: {e}")
+        return CorpusIndex.build(self.knowledge_base)
     
     def _initialize_knowledge_base(self) -> Dict[str, Any]:
         """
@@ -96,25 +116,36 @@ class ResearchAgent:
             }
         }
     
-    def search(self, query: str) -> Dict[str, Any]:
+    def search(self, query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Search the knowledge base for relevant information
         Simulates web search with mock data
+        Stops early with the topics found so far if the deadline runs out
         """
         self.logger.log_agent_action(self.name, "Searching", query)
         
         query_lower = query.lower()
+        query_words = query_lower.split()
         results = []
+        degraded = False
+        
+        # Documents containing each significant query word, from the inverted index
+        word_matches = {word: self.index.docs_containing(word) for word in set(query_words) if len(word) > 3}
         
-        # Search through knowledge base
-        for topic, data in self.knowledge_base.items():
-            # Check if topic is in query or query keywords match topic
-            if self._is_relevant(query_lower, topic, data):
-                results.append({
-                    'topic': topic,
-                    'data': data,
-                    'relevance_score': self._calculate_relevance(query_lower, topic, data)
-                })
+        # A topic is relevant if one of its words is in the query or its data mentions a query word
+        candidates = self.index.docs_with_topic_word_in(query_lower).union(*word_matches.values())
+        
+        for doc in sorted(candidates):
+            if deadline and deadline.expired():
+                degraded = True
+                break
+            
+            topic = self.index.topic(doc)
+            results.append({
+                'topic': topic,
+                'data': self.knowledge_base[topic],
+                'relevance_score': self._calculate_relevance(query_lower, topic, doc, word_matches)
+            })
         
         # Sort by relevance
         results.sort(key=lambda x: x['relevance_score'], reverse=True)
@@ -127,26 +158,11 @@ class ResearchAgent:
             'data': results,
             'confidence': confidence,
             'source': 'knowledge_base',
-            'query': query
+            'query': query,
+            'degraded': degraded
         }
     
-    def _is_relevant(self, query: str, topic: str, data: Dict) -> bool:
-        """Check if topic/data is relevant to query"""
-        # Direct topic match
-        if topic in query or any(word in query for word in topic.split()):
-            return True
-        
-        # Check data fields
-        data_str = str(data).lower()
-        query_words = query.split()
-        
-        # Check if significant query words appear in data
-        relevant_words = [w for w in query_words if len(w) > 3]
-        matches = sum(1 for word in relevant_words if word in data_str)
-        
-        return matches >= 1
-    
-    def _calculate_relevance(self, query: str, topic: str, data: Dict) -> float:
+    def _calculate_relevance(self, query: str, topic: str, doc: int, word_matches: Dict[str, set]) -> float:
         """Calculate relevance score for ranking"""
         score = 0.0
         
@@ -161,13 +177,33 @@ class ResearchAgent:
         score += len(matching_words) * 0.3
         
         # Data content match
-        data_str = str(data).lower()
         for word in query_words:
-            if len(word) > 3 and word in data_str:
+            if len(word) > 3 and doc in word_matches[word]:
                 score += 0.1
         
         return min(score, 2.0)  # Cap at 2.0
     
+    def add_topic(self, topic: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add or replace a topic in the knowledge base"""
+        self.logger.log_agent_action(self.name, "Adding Topic", topic)
+        
+        self.knowledge_base[topic.lower()] = data
+        self.corpus_version += 1
+        self.index = CorpusIndex.build(self.knowledge_base)
+        
+        return {'success': True, 'topic': topic, 'corpus_version': self.corpus_version}
+    
+    def add_topics(self, topics: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Add or replace many topics, reindexing once"""
+        self.logger.log_agent_action(self.name, "Adding Topics", f"{len(topics)} topics")
+        
+        for topic, data in topics.items():
+            self.knowledge_base[topic.lower()] = data
+        self.corpus_version += 1
+        self.index = CorpusIndex.build(self.knowledge_base)
+        
+        return {'success': True, 'topics': len(topics), 'corpus_version': self.corpus_version}
+    
     def get_topic_details(self, topic: str) -> Dict[str, Any]:
         """Get detailed information about a specific topic"""
         self.logger.log_agent_action(self.name, "Fetching Details", topic)
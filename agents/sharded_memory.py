@@ -0,0 +1,295 @@
+"""
+Sharded Memory Agent - MemoryAgent interface over records partitioned across processes
+Each shard is a MemoryAgent in its own worker process, reached over a pipe.
+Records are routed to one shard by a hash of their key, and searches are
+scattered to every shard in parallel and merged into a global top-k
+"""
+
+import atexit
+import heapq
+import itertools
+import multiprocessing
+import pickle
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
+from agents.embeddings import EmbeddingProvider, get_default_provider
+from agents.memory_agent import MemoryAgent
+from utils.deadline import Deadline
+from utils.logger import SystemLogger
+
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+
+def _shard_main(connection, embedder: Optional[EmbeddingProvider]):
+    """
+    Worker process: serve (method, args, kwargs, reply) requests against a local MemoryAgent
+    Requests are handled in arrival order, so a read always sees earlier writes
+    """
+    # The parent logs every operation; shards only record their own errors
+    SystemLogger.configure(console=False, level='warning')
+    memory = MemoryAgent(embedder=embedder)
+
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+
+        method, args, kwargs, reply = request
+        result, error = None, None
+        try:
+            # Attributes are read as-is; methods are called
+            attribute = getattr(memory, method)
+            result = attribute(*args, **kwargs) if callable(attribute) else attribute
+        except Exception as e:
+            error = e
+
+        if reply:
+            try:
+                connection.send((result, error))
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                # Nothing was written; report the failure instead
+                connection.send((None, RuntimeError(f"Memory shard could not return '{method}': {e}")))
+        elif error is not None:
+            memory.logger.log_error(f"Memory shard request '{method}' failed: {error}")
+
+    memory.close()
+    connection.close()
+
+
+class ShardedMemoryAgent:
+    """
+    Drop-in replacement for MemoryAgent that spreads records over worker processes
+    Writes (store, update_agent_state) are pipelined without waiting for a reply;
+    reads wait for every shard they touch
+    """
+
+    def __init__(self, shards: Optional[int] = None, embedder: Optional[EmbeddingProvider] = None):
+        self.name = "Memory"
+        self.logger = SystemLogger()
+
+        # Used here for query embeddings (e.g. the response cache); shards build
+        # their own default provider unless a picklable embedder is given
+        self.embedder = embedder or get_default_provider()
+
+        self.shards = shards or multiprocessing.cpu_count()
+        # Off: stores wait for their shard to index the record (see set_write_behind)
+        self.write_behind = True
+        # Spawned rather than forked: the parent may hold locks in other threads
+        context = multiprocessing.get_context('spawn')
+        self._connections = []
+        self._processes = []
+        # One lock per shard pipe, always taken in shard order
+        self._locks = [threading.Lock() for _ in range(self.shards)]
+        self._closed = False
+
+        for index in range(self.shards):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_shard_main, args=(child_end, embedder),
+                                      name=f"memory-shard-{index}", daemon=True)
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+
+        atexit.register(self.close)
+
+    def shard_for(self, key: str) -> int:
+        """The shard a key lives on; stable across processes and runs"""
+        return zlib.crc32(key.encode('utf-8')) % self.shards
+
+    def _send(self, shard: int, method: str, *args, **kwargs):
+        """Queue a request on a shard without waiting for it"""
+        with self._locks[shard]:
+            try:
+                self._connections[shard].send((method, args, kwargs, False))
+            except OSError:
+                raise RuntimeError(f"Memory shard {shard} exited") from None
+
+    def _call(self, shard: int, method: str, *args, **kwargs) -> Any:
+        """Run a request on one shard and return its result"""
+        return self._gather({shard: (args, kwargs)}, method)[0]
+
+    def _broadcast(self, method: str, *args, **kwargs) -> List[Any]:
+        """Run the same request on every shard in parallel"""
+        return self._gather({shard: (args, kwargs) for shard in range(self.shards)}, method)
+
+    def _gather(self, requests: Dict[int, Tuple[tuple, Dict[str, Any]]], method: str) -> List[Any]:
+        """
+        Send each shard its request, then collect the replies in shard order
+        Shards work on their requests concurrently; the first error is raised here
+        """
+        shards = sorted(requests)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            for shard in shards:
+                args, kwargs = requests[shard]
+                self._connections[shard].send((method, args, kwargs, True))
+            replies = []
+            for shard in shards:
+                replies.append(self._connections[shard].recv())
+        except (EOFError, OSError):
+            # A broken pipe or reset connection on either side means the shard process is gone
+            raise RuntimeError(f"Memory shard {shard} exited") from None
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+
+        for _, error in replies:
+            if error is not None:
+                raise error
+        return [result for result, _ in replies]
+
+    def store(self, key: str, value: Any, metadata: Dict[str, Any]) -> Dict[str, bool]:
+        """Store a record on the shard that owns its key"""
+        self.logger.log_agent_action(self.name, "Storing", key)
+        if self.write_behind:
+            self._send(self.shard_for(key), 'store', key, value, metadata)
+        else:
+            self._call(self.shard_for(key), 'store', key, value, metadata)
+        return {'success': True, 'stored': key}
+
+    def set_write_behind(self, enabled: bool):
+        """
+        Turn write-behind indexing on or off, on every shard
+        While off, store() waits until its shard has indexed the record
+        """
+        self._broadcast('set_write_behind', enabled)
+        self.write_behind = enabled
+
+    def flush(self):
+        """Block until every shard has indexed all records stored so far"""
+        self._broadcast('flush')
+
+    def close(self):
+        """Flush and stop every shard process"""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+
+        for shard, connection in enumerate(self._connections):
+            with self._locks[shard]:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+        for process, connection in zip(self._processes, self._connections):
+            process.join()
+            connection.close()
+
+    def retrieve(self, query: str, top_k: int = 5, deadline: Optional[Deadline] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Search every shard in parallel and merge their results into a global top-k
+        Accepts the same filters as MemoryAgent.retrieve()
+        """
+        self.logger.log_agent_action(self.name, "Retrieving", query)
+
+        # Deadlines are based on time.monotonic(), which all processes on a host share
+        replies = self._broadcast('retrieve', query, top_k=top_k, deadline=deadline, filters=filters)
+
+        # Each shard's results are sorted by score already
+        merged = heapq.merge(*(reply['results'] for reply in replies), key=lambda r: r['score'], reverse=True)
+        result = {
+            'success': True,
+            'results': list(itertools.islice(merged, top_k)),
+            'count': sum(reply['count'] for reply in replies),
+            'query': query,
+            'degraded': any(reply['degraded'] for reply in replies)
+        }
+        if filters:
+            result['filters'] = filters
+            result['candidates'] = sum(reply['candidates'] for reply in replies)
+        return result
+
+    def embed(self, text: str) -> "np.ndarray":
+        """Get the normalized vector used to search memory for a piece of text"""
+        return self.embedder.embed_one(text)
+
+    def update_agent_state(self, agent_name: str, state: Dict[str, Any],
+                           ttl: Optional[float] = None) -> Dict[str, bool]:
+        """Update the state of a specific agent, on the shard that owns its name"""
+        self.logger.log_agent_action(self.name, "Updating Agent State", agent_name)
+        self._send(self.shard_for(agent_name), 'update_agent_state', agent_name, state, ttl=ttl)
+        return {'success': True, 'agent': agent_name}
+
+    def get_agent_state(self, agent_name: str) -> Optional[Dict[str, Any]]:
+        """Retrieve the state of a specific agent, or None if it is unknown or expired"""
+        return self._call(self.shard_for(agent_name), 'get_agent_state', agent_name)
+
+    def clear_agent_state(self, agent_name: str) -> Dict[str, bool]:
+        """Remove the state of a specific agent"""
+        return self._call(self.shard_for(agent_name), 'clear_agent_state', agent_name)
+
+    @property
+    def conversation_memory(self) -> List[Dict[str, Any]]:
+        """Every stored record across all shards, oldest first"""
+        self.flush()
+        records = itertools.chain.from_iterable(self._broadcast('conversation_memory'))
+        return sorted(records, key=lambda record: record['metadata']['timestamp'])
+
+    @property
+    def knowledge_base(self) -> Dict[str, Dict[str, Any]]:
+        """The latest record for each key across all shards"""
+        return {record['key']: record for record in self.conversation_memory}
+
+    @property
+    def agent_states(self) -> Dict[str, Dict[str, Any]]:
+        """The states of all agents across all shards"""
+        states = {}
+        for shard_states in self._broadcast('agent_states'):
+            states.update(shard_states)
+        return states
+
+    def get_conversation_history(self, limit: int = 10) -> List[Dict]:
+        """Get recent conversation history across all shards"""
+        self.flush()
+        records = itertools.chain.from_iterable(self._broadcast('get_conversation_history', limit))
+        return sorted(records, key=lambda record: record['metadata']['timestamp'])[-limit:]
+
+    def clear_memory(self) -> Dict[str, bool]:
+        """Clear all memory on every shard"""
+        self.logger.log_agent_action(self.name, "Clearing Memory", "all")
+        self._broadcast('clear_memory')
+        return {'success': True}
+
+    def export_state(self) -> Dict[str, Any]:
+        """Snapshot of all shards in MemoryAgent.export_state() form"""
+        state = {'conversation_memory': [], 'agent_states': {}, 'vectors': {}}
+        for shard_state in self._broadcast('export_state'):
+            state['conversation_memory'].extend(shard_state['conversation_memory'])
+            state['agent_states'].update(shard_state['agent_states'])
+            state['vectors'].update(shard_state['vectors'])
+        state['conversation_memory'].sort(key=lambda record: record['metadata']['timestamp'])
+        return state
+
+    def load_state(self, state: Dict[str, Any]):
+        """Replace all stored data with a snapshot, partitioned over the shards"""
+        parts = [{'conversation_memory': [], 'agent_states': {}, 'vectors': {}} for _ in range(self.shards)]
+        for record in state.get('conversation_memory', []):
+            parts[self.shard_for(record['key'])]['conversation_memory'].append(record)
+        for agent_name, agent_state in state.get('agent_states', {}).items():
+            parts[self.shard_for(agent_name)]['agent_states'][agent_name] = agent_state
+        for key, vector in state.get('vectors', {}).items():
+            parts[self.shard_for(key)]['vectors'][key] = vector
+
+        self._gather({shard: ((part,), {}) for shard, part in enumerate(parts)}, 'load_state')
+
+    def estimate_size(self) -> int:
+        """Approximate number of bytes held by all shards"""
+        return sum(self._broadcast('estimate_size'))
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Get memory statistics summed over all shards"""
+        totals = Counter()
+        for stats in self._broadcast('get_statistics'):
+            totals.update(stats)
+        return {**totals, 'shards': self.shards}
@@ -0,0 +1,379 @@
+"""
+Shared Memory Agent - Memory records and vectors in a multiprocessing.shared_memory segment
+One writer embeds and appends records; readers in any number of processes
+map the same segment, follow its version counter and index new records as
+they appear. A reader's vectors are views into the segment, never copies
+"""
+
+import json
+import struct
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection, Pipe, wait
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
+from agents.embeddings import EmbeddingProvider, get_default_provider
+from agents.memory_agent import MemoryAgent
+from utils.logger import SystemLogger
+
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+MAGIC = b"SHMEMORY"
+
+# magic, version, generation, records, record log bytes used, record capacity,
+# record log capacity, vector dimension
+HEADER_FORMAT = "<8sQQQQQQI4x"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+VERSION_FORMAT = "<Q"
+VERSION_OFFSET = 8
+
+# Initial size of a segment; it doubles whenever an append does not fit
+DEFAULT_CAPACITY = 1024
+DEFAULT_LOG_BYTES = 1024 * 1024
+
+
+class SegmentGeneration:
+    """
+    Arrays over one generation of the data segment:
+    record offsets (capacity + 1), vectors (capacity x dimension) and the JSON record log
+    Rows below the published record count are never modified
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory, capacity: int, log_capacity: int, dimension: int):
+        import numpy as np
+
+        self.segment = segment
+        self.capacity = capacity
+        self.log_capacity = log_capacity
+        self.offsets = np.ndarray((capacity + 1,), dtype='<u8', buffer=segment.buf)
+        self.vectors = np.ndarray((capacity, dimension), dtype='<f4', buffer=segment.buf,
+                                  offset=(capacity + 1) * 8)
+        log_start = (capacity + 1) * 8 + capacity * dimension * 4
+        self.log = np.ndarray((log_capacity,), dtype='u1', buffer=segment.buf, offset=log_start)
+
+    @staticmethod
+    def size(capacity: int, log_capacity: int, dimension: int) -> int:
+        return (capacity + 1) * 8 + capacity * dimension * 4 + log_capacity
+
+    def record(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.log[int(self.offsets[row]):int(self.offsets[row + 1])].tobytes())
+
+    def close(self):
+        """Unmap the segment; views handed out must have been dropped"""
+        del self.offsets, self.vectors, self.log
+        self.segment.close()
+
+
+def read_header(header: shared_memory.SharedMemory) -> Tuple[int, ...]:
+    """
+    Consistent (version, generation, records, log_used, capacity, log_capacity, dimension)
+    The writer makes the version odd while it updates the header; retry until
+    the version is even and unchanged across the read
+    """
+    while True:
+        version = struct.unpack_from(VERSION_FORMAT, header.buf, VERSION_OFFSET)[0]
+        if version % 2:
+            continue
+        magic, *fields = struct.unpack_from(HEADER_FORMAT, header.buf)
+        if magic != MAGIC:
+            raise ValueError(f"{header.name} is not a shared memory segment")
+        if struct.unpack_from(VERSION_FORMAT, header.buf, VERSION_OFFSET)[0] == version:
+            return (version, *fields[1:])
+
+
+class SharedMemoryWriter:
+    """
+    The single writer of a shared memory segment
+    Clients send records over their connection (see connect()); a background
+    thread embeds them in batches, appends them, publishes the new version and
+    replies with it. Clearing or outgrowing the segment starts a new generation
+    """
+
+    def __init__(self, embedder: Optional[EmbeddingProvider] = None,
+                 capacity: int = DEFAULT_CAPACITY, log_bytes: int = DEFAULT_LOG_BYTES):
+        self.embedder = embedder or get_default_provider()
+        self.logger = SystemLogger()
+        self.initial_capacity = capacity
+        self.initial_log_bytes = log_bytes
+
+        self._header = shared_memory.SharedMemory(create=True, size=HEADER_SIZE)
+        self.name = self._header.name
+        self._version = 0
+        self._generation = 0
+        self._count = 0
+        self._log_used = 0
+        self._current = self._create_generation(capacity, log_bytes)
+        self._publish()
+
+        self._connections: List[Connection] = []
+        self._running = False
+        self._thread = None
+        self.stats = {'records': 0, 'batches': 0, 'generations': 1}
+
+    def connect(self) -> Connection:
+        """A new client connection; hand it to a SharedMemoryAgent (before forking, or via a pipe)"""
+        ours, theirs = Pipe()
+        self._connections.append(ours)
+        return theirs
+
+    def start(self):
+        """Start serving client requests"""
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="shared-memory-writer", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        """Writer thread: batch up every request that is waiting, then apply them in order"""
+        while self._running:
+            requests = []
+            for connection in wait(list(self._connections), timeout=0.2):
+                try:
+                    while connection.poll():
+                        requests.append((connection, connection.recv()))
+                except (EOFError, OSError):
+                    self._connections.remove(connection)
+
+            appends = []
+            for connection, (operation, payload) in requests:
+                if operation == 'append':
+                    appends.append((connection, payload))
+                    continue
+                self._apply_appends(appends)
+                appends = []
+                self._clear()
+                self._reply(connection, None)
+            self._apply_appends(appends)
+
+    def _apply_appends(self, appends: List[Tuple[Connection, Dict[str, Any]]]):
+        """Embed and append the records of several requests as one batch, with one version bump"""
+        if not appends:
+            return
+
+        error = None
+        try:
+            records = [record for _, payload in appends for record in payload['records']]
+            vectors = [vector for _, payload in appends for vector in payload['vectors']]
+            self._append(records, vectors)
+            self.stats['batches'] += 1
+        except Exception as e:
+            self.logger.log_error(f"Shared memory append failed: {e}")
+            error = e
+
+        for connection, _ in appends:
+            self._reply(connection, error)
+
+    def _reply(self, connection: Connection, error: Optional[Exception]):
+        try:
+            connection.send((self._version, error))
+        except (OSError, ValueError):
+            pass
+
+    def _append(self, records: List[Dict[str, Any]], vectors: List[Optional[List[float]]]):
+        """Write records and their vectors after the published ones, then publish them"""
+        import numpy as np
+
+        if not records:
+            return
+        dimension = self.embedder.dimension
+        # Embed the records that came without a usable vector
+        missing = [i for i, vector in enumerate(vectors) if vector is None or len(vector) != dimension]
+        if missing:
+            embedded = self.embedder.embed([MemoryAgent._record_text(records[i]['key'], records[i]['value'])
+                                            for i in missing])
+            vectors = list(vectors)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+
+        encoded = [json.dumps(record, default=str).encode('utf-8') for record in records]
+        needed_rows = self._count + len(records)
+        needed_bytes = self._log_used + sum(len(data) for data in encoded)
+        if needed_rows > self._current.capacity or needed_bytes > self._current.log_capacity:
+            self._grow(needed_rows, needed_bytes)
+
+        current = self._current
+        row, position = self._count, self._log_used
+        current.vectors[row:row + len(records)] = np.asarray(vectors, dtype=np.float32)
+        for data in encoded:
+            current.log[position:position + len(data)] = np.frombuffer(data, dtype='u1')
+            position += len(data)
+            row += 1
+            current.offsets[row] = position
+
+        # Readers only look at rows below the published count
+        self._count, self._log_used = row, position
+        self.stats['records'] += len(records)
+        self._publish()
+
+    def _create_generation(self, capacity: int, log_capacity: int) -> SegmentGeneration:
+        segment = shared_memory.SharedMemory(
+            name=f"{self.name}_{self._generation}", create=True,
+            size=SegmentGeneration.size(capacity, log_capacity, self.embedder.dimension)
+        )
+        return SegmentGeneration(segment, capacity, log_capacity, self.embedder.dimension)
+
+    def _switch_generation(self, capacity: int, log_capacity: int, copy: bool):
+        """Move to a new data segment, optionally copying the published records"""
+        old = self._current
+        self._generation += 1
+        self._current = self._create_generation(capacity, log_capacity)
+        if copy:
+            self._current.offsets[:self._count + 1] = old.offsets[:self._count + 1]
+            self._current.vectors[:self._count] = old.vectors[:self._count]
+            self._current.log[:self._log_used] = old.log[:self._log_used]
+        else:
+            self._count, self._log_used = 0, 0
+        self._publish()
+        self.stats['generations'] += 1
+
+        # Readers that still map the old generation keep it until they move on
+        old.close()
+        old.segment.unlink()
+
+    def _grow(self, rows: int, log_bytes: int):
+        capacity, log_capacity = self._current.capacity, self._current.log_capacity
+        while capacity < rows:
+            capacity *= 2
+        while log_capacity < log_bytes:
+            log_capacity *= 2
+        self._switch_generation(capacity, log_capacity, copy=True)
+
+    def _clear(self):
+        self._switch_generation(self.initial_capacity, self.initial_log_bytes, copy=False)
+
+    def _publish(self):
+        """Update the header under the version counter: odd while writing, even when done"""
+        struct.pack_into(VERSION_FORMAT, self._header.buf, VERSION_OFFSET, self._version + 1)
+        self._version += 2
+        struct.pack_into(HEADER_FORMAT, self._header.buf, 0, MAGIC, self._version - 1, self._generation,
+                         self._count, self._log_used, self._current.capacity, self._current.log_capacity,
+                         self.embedder.dimension)
+        struct.pack_into(VERSION_FORMAT, self._header.buf, VERSION_OFFSET, self._version)
+
+    def close(self):
+        """Stop the writer thread and remove the segment"""
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        if self._current is not None:
+            self._current.close()
+            self._current.segment.unlink()
+            self._current = None
+            self._header.close()
+            self._header.unlink()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'segment': self.name,
+            'version': self._version,
+            'capacity': self._current.capacity if self._current else 0,
+            'bytes': (SegmentGeneration.size(self._current.capacity, self._current.log_capacity,
+                                             self.embedder.dimension) if self._current else 0)
+        }
+
+
+class SharedMemoryAgent(MemoryAgent):
+    """
+    MemoryAgent whose records live in a shared memory segment
+    Stores go to the segment's writer and return once published; reads first
+    index whatever other processes have appended since the last read.
+    Agent states stay local to the process
+    """
+
+    def __init__(self, segment: str, connection: Connection, embedder: Optional[EmbeddingProvider] = None):
+        super().__init__(write_behind=False, embedder=embedder)
+        self.segment = segment
+        self._connection = connection
+        self._connection_lock = threading.Lock()
+        self._header = shared_memory.SharedMemory(name=segment)
+        self._current: Optional[SegmentGeneration] = None
+        self._generation = None
+        self._seen_version = None
+        self._synced_rows = 0
+
+    def store(self, key: str, value: Any, metadata: Dict[str, Any]) -> Dict[str, bool]:
+        """Store a record through the writer; it is visible to every reader once this returns"""
+        self.logger.log_agent_action(self.name, "Storing", key)
+        self._request('append', {'records': [self._new_record(key, value, metadata)], 'vectors': [None]})
+        return {'success': True, 'stored': key}
+
+    def _request(self, operation: str, payload: Any):
+        """Send a request to the writer and wait until it is published"""
+        with self._connection_lock:
+            self._connection.send((operation, payload))
+            _, error = self._connection.recv()
+        if error is not None:
+            raise error
+        self.flush()
+
+    def flush(self):
+        """Index the records appended since the last read"""
+        version = struct.unpack_from(VERSION_FORMAT, self._header.buf, VERSION_OFFSET)[0]
+        if version == self._seen_version:
+            return
+
+        with self._lock:
+            while True:
+                version, generation, count, _, capacity, log_capacity, dimension = read_header(self._header)
+                if generation == self._generation:
+                    break
+                # Cleared or grown: map the new generation and index it from the start
+                self._detach()
+                try:
+                    segment = shared_memory.SharedMemory(name=f"{self.segment}_{generation}")
+                except FileNotFoundError:
+                    # Already replaced by a newer generation
+                    continue
+                self._current = SegmentGeneration(segment, capacity, log_capacity, dimension)
+                self._generation = generation
+                break
+
+            for row in range(self._synced_rows, count):
+                self._add_record(self._current.record(row), self._current.vectors[row])
+            self._synced_rows = count
+            self._seen_version = version
+
+    def _detach(self):
+        """Drop every record and unmap the current generation; caller holds the lock"""
+        self.conversation_memory = []
+        self.knowledge_base = {}
+        self.vector_store = {}
+        self._reset_indexes()
+        self._synced_rows = 0
+        self._generation = None
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    def clear_memory(self) -> Dict[str, bool]:
+        """Clear the shared records (for every reader) and this process's agent states"""
+        self.logger.log_agent_action(self.name, "Clearing Memory", "all")
+        self._request('clear', None)
+        with self._lock:
+            self._replace_agent_states({})
+        return {'success': True}
+
+    def load_state(self, state: Dict[str, Any]):
+        """Replace the shared records with a snapshot from export_state()"""
+        records = state.get('conversation_memory', [])
+        vectors = state.get('vectors', {})
+        self._request('clear', None)
+        self._request('append', {'records': records, 'vectors': [vectors.get(record['key']) for record in records]})
+
+        with self._lock:
+            self._replace_agent_states(state.get('agent_states', {}))
+
+    def close(self):
+        """Unmap the segment and disconnect from the writer"""
+        with self._lock:
+            if self._header is None:
+                return
+            self._detach()
+            self._header.close()
+            self._header = None
+        self._connection.close()
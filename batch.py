@@ -0,0 +1,215 @@
+"""
+Batch mode for the Multi-Agent Chat System
+Streams queries from a JSONL file through a worker pool and writes ordered
+JSONL results incrementally; an interrupted run can be resumed
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple
+from agents.coordinator import CoordinatorAgent
+from utils.deadline import Deadline
+from utils.logger import SystemLogger
+from utils.replay import extract_query
+from utils.tracing import tracer
+
+# Bytes read per step when looking for the last result of an interrupted run
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def read_lines(path: str, offset: int = 0, line_number: int = 0) -> Iterator[Tuple[int, int, str]]:
+    """Yield (byte offset, line number, text) for each line from `offset` on, one at a time"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                return
+            line_number += 1
+            yield position, line_number, line.decode('utf-8', errors='replace')
+
+
+def resume_point(output_path: str, input_path: str) -> Tuple[int, int]:
+    """
+    Input offset and line number to continue from after an interrupted run
+    Results are written in input order, so the last complete result marks the
+    end of the finished prefix; a partially written final result is truncated
+    """
+    if not os.path.exists(output_path):
+        return 0, 0
+
+    with open(output_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = position = f.tell()
+        data = b""
+        # Read backward until the last complete line is in the buffer
+        while position > 0:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            end = data.rfind(b"\n")
+            if end != -1 and (data.rfind(b"\n", 0, end) != -1 or position == 0):
+                break
+
+        end = data.rfind(b"\n")
+        if end == -1:
+            f.truncate(0)
+            return 0, 0
+        if position + end + 1 < size:
+            f.truncate(position + end + 1)
+
+        last = json.loads(data[data.rfind(b"\n", 0, end) + 1:end])
+
+    # Continue after the input line the last result came from
+    with open(input_path, 'rb') as f:
+        f.seek(last['offset'])
+        f.readline()
+        return f.tell(), last['line']
+
+
+class BatchRunner:
+    def __init__(self, coordinator: CoordinatorAgent, workers: int = 4,
+                 field: Optional[str] = None, timeout: Optional[float] = None):
+        self.coordinator = coordinator
+        self.workers = workers
+        self.field = field
+        self.timeout = timeout
+        # Results held back waiting for earlier lines; bounds memory on large files
+        self.window = workers * 4
+
+    def process(self, offset: int, line_number: int, line: str) -> Dict[str, Any]:
+        """Answer one input line"""
+        result = {'offset': offset, 'line': line_number}
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict) and (record.get('id') or record.get('request_id')):
+                result['id'] = record.get('id') or record.get('request_id')
+        except json.JSONDecodeError:
+            pass
+
+        query = extract_query(line, self.field)
+        if not query:
+            return {**result, 'error': "No query found on this line"}
+        result['query'] = query
+
+        deadline = Deadline(self.timeout) if self.timeout else None
+        started = time.perf_counter()
+        try:
+            with tracer.collect() as spans:
+                answer = self.coordinator.process_query_with_metadata(query, deadline=deadline)
+        except Exception as e:
+            return {**result, 'error': str(e), 'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)}
+
+        metadata = answer['metadata']
+        timings = tracer.stage_timings(spans)
+        # Pre-forked workers trace in their own process and send their stages back
+        for name, duration in metadata.get('stage_timings', {}).items():
+            timings[name] = round(timings.get(name, 0.0) + duration, 3)
+        return {
+            **result,
+            'response': answer['response'],
+            'route': metadata.get('route'),
+            'confidence': metadata.get('confidence'),
+            'degraded': bool(metadata.get('degraded')),
+            'cached': 'cache' in metadata,
+            'timings': timings,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def run(self, input_path: str, output_path: str, resume: bool = False,
+            limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Process the input file and append results to the output file in input order
+        Each result is flushed as soon as every earlier line is done
+        """
+        offset, line_number = resume_point(output_path, input_path) if resume else (0, 0)
+        stats = {'processed': 0, 'errors': 0, 'resumed_at_line': line_number}
+        started = time.perf_counter()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        pending = deque()
+        try:
+            with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+                lines = read_lines(input_path, offset, line_number)
+                submitted = 0
+                while True:
+                    # Keep the window full, then write the oldest result when it is done
+                    while len(pending) < self.window and (limit is None or submitted < limit):
+                        item = next(lines, None)
+                        if item is None:
+                            break
+                        if not item[2].strip():
+                            continue
+                        pending.append(pool.submit(self.process, *item))
+                        submitted += 1
+                    if not pending:
+                        break
+
+                    result = pending.popleft().result()
+                    out.write(json.dumps(result, default=str) + "\n")
+                    out.flush()
+                    stats['processed'] += 1
+                    if result.get('error'):
+                        stats['errors'] += 1
+                    if stats['processed'] % 100 == 0:
+                        print(f"  {stats['processed']} done (line {result['line']})", file=sys.stderr, flush=True)
+        finally:
+            # On interruption, drop queued work; the output holds the finished prefix
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        stats['elapsed_s'] = round(time.perf_counter() - started, 3)
+        stats['throughput_qps'] = round(stats['processed'] / stats['elapsed_s'], 2) if stats['elapsed_s'] else 0.0
+        return stats
+
+
+def main():
+    """Entry point for batch processing"""
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of queries in parallel")
+    parser.add_argument('input', help="JSONL file with one query per line")
+    parser.add_argument('-o', '--output', help="JSONL results file (default: <input>.results.jsonl)")
+    parser.add_argument('--workers', type=int, default=4, help="parallel queries (default: 4)")
+    parser.add_argument('--field', help="JSON field holding the query (default: query, body, title or text)")
+    parser.add_argument('--timeout', type=float, help="per-query deadline in seconds")
+    parser.add_argument('--resume', action='store_true', help="continue after the last result in the output file")
+    parser.add_argument('--limit', type=int, help="process at most this many lines")
+    parser.add_argument('--corpus-index', metavar='PATH', help="compiled research corpus index to map")
+    parser.add_argument('--memory-shards', type=int, default=1, metavar='N',
+                        help="partition memory across N worker processes (default: 1)")
+    parser.add_argument('--prefork', type=int, default=0, metavar='N',
+                        help="answer queries in N pre-forked worker processes sharing one memory")
+    parser.add_argument('--verbose', action='store_true', help="print agent activity to the console")
+    args = parser.parse_args()
+    if args.prefork and args.memory_shards > 1:
+        parser.error("--memory-shards cannot be combined with --prefork (workers share one memory segment)")
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    if not args.verbose:
+        SystemLogger.configure(console=False)
+
+    if args.prefork:
+        from agents.prefork import PreforkCoordinator
+        coordinator = PreforkCoordinator(workers=args.prefork, corpus_index=args.corpus_index)
+    else:
+        coordinator = CoordinatorAgent(corpus_index=args.corpus_index, memory_shards=args.memory_shards)
+    runner = BatchRunner(coordinator, workers=args.workers, field=args.field, timeout=args.timeout)
+    try:
+        stats = runner.run(args.input, output, resume=args.resume, limit=args.limit)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun with --resume to continue from {output}", file=sys.stderr)
+        sys.exit(130)
+
+    print(f"✅ {stats['processed']} queries ({stats['errors']} errors) in {stats['elapsed_s']}s "
+          f"({stats['throughput_qps']} QPS) → {output}")
+    if stats['resumed_at_line']:
+        print(f"   Resumed after line {stats['resumed_at_line']}")
+
+
+if __name__ == "__main__":
+    main()
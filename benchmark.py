@@ -0,0 +1,319 @@
+"""
+Performance benchmark for the Multi-Agent Chat System
+Runs the five test scenarios repeatedly, sweeps the scaling axes and
+compares the results against a saved baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from agents.coordinator import CoordinatorAgent
+from test_scenarios import SCENARIOS
+from utils.logger import SystemLogger
+from utils.tracing import tracer
+
+DEFAULT_MEMORY_SIZES = [10, 100, 1000, 10000]
+DEFAULT_CORPUS_SIZES = [10, 100, 1000]
+DEFAULT_QUERY_LENGTHS = [8, 32, 128, 512]
+SWEEPS = ('memory', 'corpus', 'query_length')
+
+# Latency metrics compared against the baseline
+DEFAULT_METRICS = ['p50_ms', 'p95_ms']
+# Changes smaller than this are treated as timer noise
+DEFAULT_MIN_DELTA_MS = 0.5
+
+# Words used to build synthetic memory records, topics and long queries
+FILLER_WORDS = [
+    'model', 'training', 'data', 'layer', 'gradient', 'inference', 'dataset',
+    'feature', 'accuracy', 'sequence', 'vision', 'speech', 'policy', 'reward',
+    'embedding', 'attention', 'batch', 'loss', 'parameter', 'architecture'
+]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency distribution of samples given in seconds, reported in milliseconds"""
+    ordered = sorted(samples)
+
+    def quantile(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'p50_ms': round(quantile(0.5), 3),
+        'p95_ms': round(quantile(0.95), 3),
+        'p99_ms': round(quantile(0.99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+
+def filler_text(words: int, offset: int = 0) -> str:
+    """Deterministic filler text of the given number of words"""
+    return " ".join(FILLER_WORDS[(offset + i) % len(FILLER_WORDS)] for i in range(words))
+
+
+class Benchmark:
+    def __init__(self, repeats: int = 20, warmup: int = 3):
+        self.repeats = repeats
+        self.warmup = warmup
+
+    def time_query(self, coordinator: CoordinatorAgent, query: str) -> float:
+        """
+        Time one query end to end
+        The response cache is cleared first so every repeat does the full work
+        """
+        coordinator.response_cache.clear()
+        started = time.perf_counter()
+        coordinator.process_query(query)
+        return time.perf_counter() - started
+
+    def measure(self, coordinator: CoordinatorAgent, query: str) -> Dict[str, Any]:
+        """
+        Repeat a query and report its latency distribution and per-stage latencies
+        Memory is restored before every repeat, so the records each query stores
+        don't grow the store later repeats search
+        """
+        snapshot = coordinator.memory.export_state()
+        for _ in range(self.warmup):
+            coordinator.memory.load_state(snapshot)
+            self.time_query(coordinator, query)
+
+        tracer.reset()
+        samples = []
+        for _ in range(self.repeats):
+            coordinator.memory.load_state(snapshot)
+            samples.append(self.time_query(coordinator, query))
+        return {
+            'route': coordinator.classify_query(query),
+            'latency': summarize(samples),
+            'stages': tracer.get_summary()
+        }
+
+    def run_scenarios(self, names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Benchmark the test scenarios against one coordinator"""
+        coordinator = CoordinatorAgent()
+
+        # Run every scenario once, in order, so the memory scenario has history to search
+        for scenario in SCENARIOS:
+            coordinator.process_query(scenario['query'])
+
+        results = {}
+        for scenario in SCENARIOS:
+            if names and scenario['name'] not in names:
+                continue
+            print(f"  scenario {scenario['name']}...", flush=True)
+            results[scenario['name']] = {'query': scenario['query'], **self.measure(coordinator, scenario['query'])}
+
+        coordinator.memory.close()
+        return results
+
+    def sweep_memory(self, sizes: List[int]) -> List[Dict[str, Any]]:
+        """Memory scenario latency as the memory store grows"""
+        query = next(s['query'] for s in SCENARIOS if s['name'] == 'memory')
+        points = []
+        for size in sizes:
+            print(f"  memory size {size}...", flush=True)
+            coordinator = CoordinatorAgent()
+
+            started = time.perf_counter()
+            for i in range(size):
+                coordinator.memory.store(
+                    key=f"benchmark record {i}: {filler_text(8, i)}",
+                    value={'description': filler_text(24, i)},
+                    metadata={'agent': 'Research', 'confidence': 0.8, 'query_type': 'simple'}
+                )
+            coordinator.memory.flush()
+            prefill_s = time.perf_counter() - started
+
+            points.append({'size': size, 'prefill_s': round(prefill_s, 3), **self.measure(coordinator, query)})
+            coordinator.memory.close()
+        return points
+
+    def sweep_corpus(self, sizes: List[int]) -> List[Dict[str, Any]]:
+        """Simple scenario latency as the research corpus grows"""
+        query = next(s['query'] for s in SCENARIOS if s['name'] == 'simple')
+        points = []
+        for size in sizes:
+            print(f"  corpus size {size}...", flush=True)
+            coordinator = CoordinatorAgent()
+            coordinator.research.add_topics({
+                f"synthetic topic {i}": {
+                    'description': filler_text(24, i),
+                    'applications': [filler_text(3, i + j) for j in range(4)]
+                }
+                for i in range(size)
+            })
+
+            points.append({'size': size, **self.measure(coordinator, query)})
+            coordinator.memory.close()
+        return points
+
+    def sweep_query_length(self, lengths: List[int]) -> List[Dict[str, Any]]:
+        """Simple scenario latency as the query grows, padded with filler words"""
+        base = next(s['query'] for s in SCENARIOS if s['name'] == 'simple')
+        points = []
+        for length in lengths:
+            print(f"  query length {length}...", flush=True)
+            coordinator = CoordinatorAgent()
+            padding = max(0, length - len(base.split()))
+            query = f"{base} {filler_text(padding)}".strip()
+
+            points.append({'words': len(query.split()), **self.measure(coordinator, query)})
+            coordinator.memory.close()
+        return points
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], thresholds: Dict[str, float],
+            metrics: List[str], min_delta_ms: float) -> List[Dict[str, Any]]:
+    """
+    Find benchmarks that got slower than the baseline allows
+    thresholds maps a benchmark name (e.g. 'simple' or 'memory:1000') to the
+    allowed relative slowdown; the '*' entry applies to everything else
+    """
+    def flatten(data: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+        flat = {name: entry['latency'] for name, entry in data.get('scenarios', {}).items()}
+        for axis, points in data.get('sweeps', {}).items():
+            for point in points:
+                value = point.get('size', point.get('words'))
+                flat[f"{axis}:{value}"] = point['latency']
+        return flat
+
+    current = flatten(results)
+    previous = flatten(baseline)
+    regressions = []
+    for name, latency in current.items():
+        if name not in previous:
+            continue
+        allowed = thresholds.get(name, thresholds['*'])
+        for metric in metrics:
+            before, after = previous[name].get(metric), latency.get(metric)
+            if before is None or after is None:
+                continue
+            if after - before > min_delta_ms and after > before * (1 + allowed):
+                regressions.append({
+                    'benchmark': name,
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': round(after / before - 1, 3) if before else float('inf'),
+                    'threshold': allowed
+                })
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    """Current commit of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_sizes(value: str) -> List[int]:
+    """Parse a comma-separated list of sizes"""
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_thresholds(values: List[str]) -> Dict[str, float]:
+    """Parse '0.2' (default) and 'name=0.5' (per benchmark) threshold options"""
+    thresholds = {'*': 0.2}
+    for value in values or []:
+        name, _, threshold = value.rpartition('=')
+        thresholds[name or '*'] = float(threshold)
+    return thresholds
+
+
+def main():
+    """Entry point for benchmarking"""
+    parser = argparse.ArgumentParser(description="Benchmark the Multi-Agent Chat System")
+    parser.add_argument('--repeats', type=int, default=20, help="timed runs per benchmark (default: 20)")
+    parser.add_argument('--warmup', type=int, default=3, help="untimed runs before each benchmark (default: 3)")
+    parser.add_argument('--scenarios', type=lambda v: v.split(','), default=None,
+                        help="comma-separated scenario names to run (default: all)")
+    parser.add_argument('--sweep', action='append', choices=SWEEPS + ('all',), default=[],
+                        help="scaling axis to sweep; may be repeated")
+    parser.add_argument('--memory-sizes', type=parse_sizes, default=DEFAULT_MEMORY_SIZES,
+                        help="memory store sizes for the memory sweep, e.g. 10,1000,1000000")
+    parser.add_argument('--corpus-sizes', type=parse_sizes, default=DEFAULT_CORPUS_SIZES,
+                        help="synthetic topics added for the corpus sweep")
+    parser.add_argument('--query-lengths', type=parse_sizes, default=DEFAULT_QUERY_LENGTHS,
+                        help="query lengths in words for the query length sweep")
+    parser.add_argument('--output', default="benchmarks/latest.json", help="where to write the JSON results")
+    parser.add_argument('--baseline', help="earlier results to check for regressions")
+    parser.add_argument('--threshold', action='append', metavar='[NAME=]RATIO',
+                        help="allowed slowdown, e.g. 0.2 or memory:1000=0.5 (default: 0.2)")
+    parser.add_argument('--metrics', type=lambda v: v.split(','), default=DEFAULT_METRICS,
+                        help="latency metrics to compare (default: p50_ms,p95_ms)")
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="ignore slowdowns smaller than this (default: 0.5)")
+    parser.add_argument('--log-level', default="info", help="system log level while benchmarking")
+    args = parser.parse_args()
+
+    # Console output would dominate the timings
+    SystemLogger.configure(level=args.log_level, console=False)
+
+    benchmark = Benchmark(repeats=args.repeats, warmup=args.warmup)
+    sweeps = SWEEPS if 'all' in args.sweep else args.sweep
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'repeats': args.repeats, 'warmup': args.warmup, 'log_level': args.log_level},
+        'scenarios': {},
+        'sweeps': {}
+    }
+
+    print("Benchmarking scenarios")
+    results['scenarios'] = benchmark.run_scenarios(args.scenarios)
+    if 'memory' in sweeps:
+        print("Sweeping memory store size")
+        results['sweeps']['memory'] = benchmark.sweep_memory(args.memory_sizes)
+    if 'corpus' in sweeps:
+        print("Sweeping corpus size")
+        results['sweeps']['corpus'] = benchmark.sweep_corpus(args.corpus_sizes)
+    if 'query_length' in sweeps:
+        print("Sweeping query length")
+        results['sweeps']['query_length'] = benchmark.sweep_query_length(args.query_lengths)
+
+    print(f"\n{'Benchmark':<24}{'Route':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, entry in results['scenarios'].items():
+        latency = entry['latency']
+        print(f"{name:<24}{entry['route']:<12}{latency['p50_ms']:>10.3f}{latency['p95_ms']:>10.3f}{latency['p99_ms']:>10.3f}")
+    for axis, points in results['sweeps'].items():
+        for point in points:
+            label = f"{axis}:{point.get('size', point.get('words'))}"
+            latency = point['latency']
+            print(f"{label:<24}{point['route']:<12}{latency['p50_ms']:>10.3f}{latency['p95_ms']:>10.3f}{latency['p99_ms']:>10.3f}")
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved in: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, parse_thresholds(args.threshold), args.metrics, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline} ({baseline.get('commit')}):")
+            for r in regressions:
+                print(f"  • {r['benchmark']} {r['metric']}: {r['baseline']:.3f} → {r['current']:.3f} ms "
+                      f"(+{r['change']:.0%}, allowed +{r['threshold']:.0%})")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} ({baseline.get('commit')})")
+
+
+if __name__ == "__main__":
+    main()
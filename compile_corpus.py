@@ -0,0 +1,60 @@
+"""
+Corpus compiler for the Multi-Agent Chat System
+Serializes the research corpus and its inverted index into a binary artifact
+that processes map read-only at startup (--corpus-index) instead of rebuilding it
+"""
+
+import argparse
+import sys
+import time
+from agents.corpus_index import CorpusIndex, write_artifact
+from agents.research_agent import ResearchAgent
+from utils.logger import SystemLogger
+
+DEFAULT_ARTIFACT = "corpus.idx"
+
+
+def check(path: str, knowledge_base) -> bool:
+    """Report whether an artifact is intact and matches the current corpus"""
+    started = time.perf_counter()
+    try:
+        index = CorpusIndex.load(path)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return False
+    load_ms = (time.perf_counter() - started) * 1000
+
+    intact = index.verify()
+    current = index.is_current(knowledge_base)
+    stats = index.get_statistics()
+    print(f"{path}: {stats['documents']} topics, {stats['terms']} terms, {stats['postings']} postings, "
+          f"{stats['bytes']} bytes, mapped in {load_ms:.2f} ms")
+    print(f"  payload checksum: {'ok' if intact else 'MISMATCH'}")
+    print(f"  corpus:           {'current' if current else 'STALE, recompile'}")
+    return intact and current
+
+
+def main():
+    """Entry point for the corpus compiler"""
+    parser = argparse.ArgumentParser(description="Compile the research corpus into a mappable index artifact")
+    parser.add_argument('-o', '--output', default=DEFAULT_ARTIFACT, help=f"artifact path (default: {DEFAULT_ARTIFACT})")
+    parser.add_argument('--check', action='store_true',
+                        help="verify an existing artifact instead of compiling; exits with status 1 if stale or corrupt")
+    args = parser.parse_args()
+
+    SystemLogger.configure(console=False)
+    knowledge_base = ResearchAgent().knowledge_base
+
+    if args.check:
+        sys.exit(0 if check(args.output, knowledge_base) else 1)
+
+    started = time.perf_counter()
+    size = write_artifact(knowledge_base, args.output)
+    print(f"✅ Compiled {len(knowledge_base)} topics into {args.output} "
+          f"({size} bytes) in {(time.perf_counter() - started) * 1000:.1f} ms")
+    check(args.output, knowledge_base)
+    print(f"   Use it with: python main.py --corpus-index {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Load generator for the Multi-Agent Chat System
+Drives a CoordinatorAgent with synthetic or replayed queries at a target
+QPS or concurrency and reports throughput, latency, errors and memory growth
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from agents.coordinator import CoordinatorAgent
+from utils.logger import SystemLogger
+from utils.replay import extract_query
+from utils.response_cache import ResponseCache
+
+# Query templates per scenario type; {topic} is filled from the research corpus
+TEMPLATES = {
+    'simple': [
+        "What are the main types of {topic}?",
+        "Tell me about {topic}.",
+        "Explain {topic}."
+    ],
+    'complex': [
+        "Research {topic}, analyze their computational efficiency, and summarize key trade-offs.",
+        "Analyze the effectiveness of {topic}."
+    ],
+    'memory': [
+        "What did we discuss about {topic} earlier?",
+        "What have we learned about {topic}?"
+    ],
+    'multi-step': [
+        "Find recent papers on {topic}, analyze their methodologies, and identify common challenges.",
+        "First research {topic}, and then evaluate the main approaches."
+    ],
+    'collaborative': [
+        "Compare {topic} techniques and recommend which is better.",
+        "Compare the approaches in {topic} and evaluate their trade-offs."
+    ]
+}
+
+# Share of each scenario type in the synthetic mix
+DEFAULT_MIX = {'simple': 40, 'complex': 20, 'memory': 20, 'multi-step': 10, 'collaborative': 10}
+
+
+class TemplateSource:
+    """Endless stream of queries drawn from the scenario templates"""
+
+    def __init__(self, topics: List[str], mix: Optional[Dict[str, int]] = None, seed: Optional[int] = None):
+        self.topics = topics
+        self.mix = {**DEFAULT_MIX, **(mix or {})}
+        self._kinds = [kind for kind, weight in self.mix.items() if weight > 0]
+        self._weights = [self.mix[kind] for kind in self._kinds]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_query(self) -> Optional[str]:
+        """Next synthetic query; the stream never runs out"""
+        with self._lock:
+            kind = self._random.choices(self._kinds, self._weights)[0]
+            template = self._random.choice(TEMPLATES[kind])
+            return template.format(topic=self._random.choice(self.topics))
+
+
+class ReplaySource:
+    """Queries replayed from a JSONL file, optionally looping over it"""
+
+    def __init__(self, path: str, field: Optional[str] = None, loop: bool = False):
+        self.path = path
+        self.field = field
+        self.loop = loop
+        self._lines = self._read_queries()
+        self._lock = threading.Lock()
+
+    def _read_queries(self) -> Iterator[str]:
+        while True:
+            found = False
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    query = extract_query(line, self.field)
+                    if query:
+                        found = True
+                        yield query
+            if not (self.loop and found):
+                return
+
+    def next_query(self) -> Optional[str]:
+        """Next recorded query, or None when the file is exhausted"""
+        with self._lock:
+            return next(self._lines, None)
+
+
+class LoadRecorder:
+    """Thread-safe collection of per-query outcomes"""
+
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, finished: float, latency: float, route: Optional[str],
+               error: Optional[str] = None, degraded: bool = False, cached: bool = False):
+        with self._lock:
+            self.results.append({
+                'finished': finished, 'latency': latency, 'route': route,
+                'error': error, 'degraded': degraded, 'cached': cached
+            })
+
+    def since(self, start: float) -> List[Dict[str, Any]]:
+        """Results finished at or after `start`"""
+        with self._lock:
+            return [r for r in self.results if r['finished'] >= start]
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where unavailable)"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if maxrss > 1 << 32 else maxrss * 1024
+
+
+def summarize(results: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles and error rate of a set of results"""
+    latencies = sorted(r['latency'] for r in results if not r['error'])
+    errors = sum(1 for r in results if r['error'])
+
+    def quantile(q: float) -> float:
+        if not latencies:
+            return 0.0
+        return round(latencies[min(len(latencies) - 1, int(round(q * (len(latencies) - 1))))] * 1000, 3)
+
+    return {
+        'requests': len(results),
+        'throughput_qps': round(len(results) / seconds, 2) if seconds > 0 else 0.0,
+        'p50_ms': quantile(0.5),
+        'p99_ms': quantile(0.99),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'degraded': sum(1 for r in results if r['degraded']),
+        'cache_hits': sum(1 for r in results if r['cached'])
+    }
+
+
+class LoadGenerator:
+    def __init__(self, coordinator: CoordinatorAgent, source, recorder: Optional[LoadRecorder] = None):
+        self.coordinator = coordinator
+        self.source = source
+        self.recorder = recorder or LoadRecorder()
+        self._stop = threading.Event()
+
+    def _issue(self, query: str, scheduled: float):
+        """Run one query; latency counts from its scheduled start so queueing delay is included"""
+        try:
+            result = self.coordinator.process_query_with_metadata(query)
+            metadata = result['metadata']
+            self.recorder.record(time.perf_counter(), time.perf_counter() - scheduled, metadata.get('route'),
+                                 degraded=bool(metadata.get('degraded')), cached='cache' in metadata)
+        except Exception as e:
+            self.recorder.record(time.perf_counter(), time.perf_counter() - scheduled, None, error=str(e))
+
+    def run_concurrency(self, concurrency: int, duration: float, max_requests: Optional[int] = None):
+        """Closed loop: `concurrency` threads each issue queries back to back"""
+        end = time.perf_counter() + duration
+        issued = [0]
+        lock = threading.Lock()
+
+        def worker():
+            while not self._stop.is_set() and time.perf_counter() < end:
+                with lock:
+                    if max_requests is not None and issued[0] >= max_requests:
+                        return
+                    issued[0] += 1
+                query = self.source.next_query()
+                if query is None:
+                    return
+                self._issue(query, time.perf_counter())
+
+        threads = [threading.Thread(target=worker, name=f"load-{i}", daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_qps(self, qps: float, duration: float, max_requests: Optional[int] = None,
+                workers: int = 32, poisson: bool = False):
+        """
+        Open loop: start queries at a fixed (or Poisson) arrival rate regardless of
+        how long earlier ones take, so a slow system builds up a visible backlog
+        """
+        rng = random.Random()
+        start = time.perf_counter()
+        next_at = start
+        issued = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load") as pool:
+            while not self._stop.is_set() and next_at < start + duration:
+                if max_requests is not None and issued >= max_requests:
+                    break
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                query = self.source.next_query()
+                if query is None:
+                    break
+                pool.submit(self._issue, query, next_at)
+                issued += 1
+                next_at += rng.expovariate(qps) if poisson else 1.0 / qps
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    """Entry point for load generation"""
+    parser = argparse.ArgumentParser(description="Generate load against the Multi-Agent Chat System")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--qps', type=float, help="target arrival rate (open loop)")
+    mode.add_argument('--concurrency', type=int, default=4, help="concurrent clients (closed loop, default: 4)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds to run (default: 30)")
+    parser.add_argument('--requests', type=int, help="stop after this many queries")
+    parser.add_argument('--workers', type=int, default=32, help="max in-flight queries in --qps mode (default: 32)")
+    parser.add_argument('--poisson', action='store_true', help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument('--replay', metavar='JSONL', help="replay queries from a JSONL file instead of templates")
+    parser.add_argument('--field', help="JSON field holding the query when replaying")
+    parser.add_argument('--loop', action='store_true', help="restart the replay file when it runs out")
+    parser.add_argument('--mix', default="",
+                        help="template mix, e.g. simple=5,memory=1 (default: %s)" %
+                        ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument('--seed', type=int, help="random seed for the template mix")
+    parser.add_argument('--no-cache', action='store_true', help="disable the response cache")
+    parser.add_argument('--interval', type=float, default=5.0, help="seconds between progress reports (default: 5)")
+    parser.add_argument('--output', help="write the summary and timeline to this JSON file")
+    args = parser.parse_args()
+
+    mix = {}
+    for item in filter(None, args.mix.split(',')):
+        kind, separator, weight = item.partition('=')
+        if kind not in TEMPLATES:
+            parser.error(f"unknown scenario type in --mix: {kind}")
+        if not separator or not weight.strip().isdigit():
+            parser.error(f"--mix entries must be type=weight with a non-negative integer weight: {item}")
+        mix[kind] = int(weight)
+    if not any(weight > 0 for weight in {**DEFAULT_MIX, **mix}.values()):
+        parser.error("--mix leaves no scenario type with a positive weight")
+
+    # Console logging from many threads would swamp the report
+    SystemLogger.configure(console=False)
+
+    coordinator = CoordinatorAgent()
+    if args.no_cache:
+        coordinator.response_cache = ResponseCache(max_entries=0)
+
+    if args.replay:
+        source = ReplaySource(args.replay, field=args.field, loop=args.loop)
+    else:
+        source = TemplateSource(list(coordinator.research.knowledge_base), mix=mix, seed=args.seed)
+
+    generator = LoadGenerator(coordinator, source)
+    if args.qps:
+        target = lambda: generator.run_qps(args.qps, args.duration, args.requests, args.workers, args.poisson)
+        print(f"Driving {args.qps} QPS for up to {args.duration}s")
+    else:
+        target = lambda: generator.run_concurrency(args.concurrency, args.duration, args.requests)
+        print(f"Driving {args.concurrency} concurrent clients for up to {args.duration}s")
+
+    driver = threading.Thread(target=target, name="load-driver", daemon=True)
+    start = time.perf_counter()
+    rss_start = rss_bytes()
+    timeline = []
+    driver.start()
+
+    print(f"\n{'t (s)':>7}{'reqs':>7}{'qps':>9}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS MiB':>10}{'memory':>9}")
+    window_start = start
+    try:
+        while driver.is_alive():
+            driver.join(args.interval)
+            now = time.perf_counter()
+            window = summarize(generator.recorder.since(window_start), now - window_start)
+            point = {
+                't': round(now - start, 2),
+                **window,
+                'rss_mib': round(rss_bytes() / (1 << 20), 1),
+                'memory_records': coordinator.memory.get_statistics()['knowledge_items']
+            }
+            timeline.append(point)
+            print(f"{point['t']:>7.1f}{point['requests']:>7}{point['throughput_qps']:>9.1f}{point['p50_ms']:>10.2f}"
+                  f"{point['p99_ms']:>10.2f}{point['error_rate']:>8.1%}{point['rss_mib']:>10.1f}{point['memory_records']:>9}")
+            window_start = now
+    except KeyboardInterrupt:
+        print("\nStopping...")
+        generator.stop()
+        driver.join()
+
+    elapsed = time.perf_counter() - start
+    results = generator.recorder.since(start)
+    summary = summarize(results, elapsed)
+    summary['rss_growth_mib'] = round((rss_bytes() - rss_start) / (1 << 20), 1)
+    summary['by_route'] = {
+        route: summarize([r for r in results if r['route'] == route], elapsed)
+        for route in sorted({r['route'] for r in results if r['route']})
+    }
+
+    print(f"\nTotal: {summary['requests']} queries in {elapsed:.1f}s ({summary['throughput_qps']} QPS), "
+          f"p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms, "
+          f"errors {summary['error_rate']:.1%}, cache hits {summary['cache_hits']}, "
+          f"RSS +{summary['rss_growth_mib']} MiB")
+    for route, stats in summary['by_route'].items():
+        print(f"  {route:<12}{stats['requests']:>7} queries  p50 {stats['p50_ms']:>9.2f} ms  p99 {stats['p99_ms']:>9.2f} ms")
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'config': vars(args),
+                'summary': summary,
+                'timeline': timeline
+            }, f, indent=2)
+        print(f"\nResults saved in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,26 @@ Multi-Agent Chat System
 Main entry point for the system
 """
 
+import argparse
 import json
 import sys
 from datetime import datetime
 from agents.coordinator import CoordinatorAgent
 from utils.logger import SystemLogger
+from utils.profiling import QueryProfiler
+from utils.tracing import tracer
 
 class MultiAgentChatSystem:
-    def __init__(self):
-        self.coordinator = CoordinatorAgent()
+    def __init__(self, profiler=None, corpus_index=None, memory_shards=1):
+        self.coordinator = CoordinatorAgent(corpus_index=corpus_index, memory_shards=memory_shards)
         self.logger = SystemLogger()
         self.running = True
+        self.profiler = profiler
+        self.query_count = 0
+        
+        if profiler:
+            # Index memory inline so embedding cost shows up in the query that stored it
+            self.coordinator.memory.set_write_behind(False)
         
     def display_welcome(self):
         """Display welcome message and instructions"""
@@ -29,6 +38,7 @@ class MultiAgentChatSystem:
         print("  • Type your question and press Enter")
         print("  • Type 'exit' or 'quit' to end session")
         print("  • Type 'memory' to view stored knowledge")
+        print("  • Type 'stats' to view per-stage latency")
         print("  • Type 'clear' to clear conversation history")
         print("="*70 + "\n")
     
@@ -55,6 +65,10 @@ class MultiAgentChatSystem:
             self.show_memory_contents()
             return True
         
+        elif command == 'stats':
+            self.show_latency_stats()
+            return True
+        
         elif command == 'clear':
             print("\n🗑️  Conversation history cleared.")
             return True
@@ -76,6 +90,7 @@ class MultiAgentChatSystem:
         print("="*70)
         
         memory = self.coordinator.memory
+        memory.flush()
         
         # Show conversation count
         conv_count = len(memory.conversation_memory)
@@ -96,6 +111,38 @@ class MultiAgentChatSystem:
         state_count = len(memory.agent_states)
         print(f"\n🤖 Agent states tracked: {state_count}")
         
+        # Show response cache effectiveness
+        cache_stats = self.coordinator.response_cache.get_statistics()
+        print(f"⚡ Response cache: {cache_stats['exact_hits'] + cache_stats['semantic_hits']} hits, "
+              f"{cache_stats['misses']} misses, {cache_stats['latency_saved'] * 1000:.1f} ms saved")
+        fragment_stats = self.coordinator.fragments.get_statistics()
+        print(f"🧩 Rendered fragments: {fragment_stats['fragments']} cached, "
+              f"{fragment_stats['hit_rate']:.0%} hit rate")
+        
+        # Show embedding cache effectiveness
+        embedding_stats = memory.embedder.get_statistics()
+        if 'hit_rate' in embedding_stats:
+            print(f"🧮 Embedding cache ({embedding_stats['provider']}): {embedding_stats['hit_rate']:.0%} hit rate, "
+                  f"{embedding_stats['cached_vectors']} vectors on disk")
+        
+        print("="*70 + "\n")
+    
+    def show_latency_stats(self):
+        """Display per-stage latency percentiles and export them for Prometheus"""
+        print("\n" + "="*70)
+        print("⏱️  LATENCY BY STAGE")
+        print("="*70)
+        
+        summary = tracer.get_summary()
+        if not summary:
+            print("\nNo queries processed yet.")
+        else:
+            print(f"\n{'Stage':<18}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+            for stage, stats in sorted(summary.items()):
+                print(f"{stage:<18}{stats['count']:>8}{stats['p50_ms']:>10.3f}"
+                      f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+            print(f"\n📈 Exported to {tracer.export_prometheus()}")
+        
         print("="*70 + "\n")
     
     def process_query(self, query):
@@ -106,17 +153,17 @@ class MultiAgentChatSystem:
         
         # Log the query
         self.logger.log_user_query(query)
+        self.query_count += 1
         
-        # Process through coordinator
+        # Process through coordinator, printing each section as it arrives
         try:
-            response = self.coordinator.process_query(query)
-            
-            # Display response
-            print(f"\n{'='*70}")
-            print(f"💬 RESPONSE")
-            print(f"{'='*70}\n")
-            print(response)
-            print(f"\n{'='*70}\n")
+            if self.profiler:
+                label = f"query_{self.query_count:03d}_{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+                with self.profiler.profile(label) as report:
+                    response = self._stream_response(query)
+                self.show_profile_report(report)
+            else:
+                response = self._stream_response(query)
             
             # Log the response
             self.logger.log_assistant_response(response)
@@ -125,6 +172,26 @@ class MultiAgentChatSystem:
             print(f"\n❌ Error processing query: {str(e)}")
             self.logger.log_error(str(e))
     
+    def _stream_response(self, query):
+        """Print the response sections as they arrive and return the full response"""
+        chunks = []
+        for chunk in self.coordinator.stream_query(query):
+            if not chunks:
+                print(f"\n{'='*70}")
+                print(f"💬 RESPONSE")
+                print(f"{'='*70}\n")
+            print(chunk, end="", flush=True)
+            chunks.append(chunk)
+        print(f"\n\n{'='*70}\n")
+        return "".join(chunks)
+    
+    def show_profile_report(self, report):
+        """Display where a profiled query spent its time"""
+        print(f"🔬 Profile saved: {report['pstats']} ({report['total_s'] * 1000:.1f} ms profiled)")
+        if 'allocations' in report:
+            print(f"🔬 Allocations saved: {report['allocations']} (peak {report['peak_kib']} KiB)")
+        print(report['summary'])
+    
     def run(self):
         """Main run loop"""
         self.display_welcome()
@@ -157,7 +224,36 @@ class MultiAgentChatSystem:
 
 def main():
     """Entry point"""
-    system = MultiAgentChatSystem()
+    parser = argparse.ArgumentParser(description="Multi-Agent Chat System")
+    QueryProfiler.add_arguments(parser)
+    parser.add_argument('--serve', action='store_true', help="serve the HTTP/JSON API instead of the interactive loop")
+    parser.add_argument('--host', default="127.0.0.1", help="address to serve on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port to serve on (default: 8080)")
+    parser.add_argument('--workers', type=int, default=4, help="query workers when serving (default: 4)")
+    parser.add_argument('--prewarm', action='store_true',
+                        help="build the agents and load numpy in the background while waiting for input")
+    parser.add_argument('--corpus-index', metavar='PATH',
+                        help="compiled research corpus index to map (see compile_corpus.py)")
+    parser.add_argument('--memory-shards', type=int, default=1, metavar='N',
+                        help="partition memory across N worker processes (default: 1, in-process)")
+    parser.add_argument('--prefork', type=int, default=0, metavar='N',
+                        help="with --serve, answer queries in N pre-forked worker processes sharing one memory")
+    args = parser.parse_args()
+    if args.prefork and not args.serve:
+        parser.error("--prefork requires --serve")
+    if args.prefork and args.memory_shards > 1:
+        parser.error("--memory-shards cannot be combined with --prefork (workers share one memory segment)")
+    
+    if args.serve:
+        from server import serve
+        serve(args.host, args.port, args.workers, corpus_index=args.corpus_index, memory_shards=args.memory_shards,
+              prefork=args.prefork)
+        return
+    
+    system = MultiAgentChatSystem(profiler=QueryProfiler.from_args(args), corpus_index=args.corpus_index,
+                                  memory_shards=args.memory_shards)
+    if args.prewarm:
+        system.coordinator.prewarm(background=True)
     system.run()
 
 if __name__ == "__main__":
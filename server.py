@@ -0,0 +1,317 @@
+"""
+HTTP/JSON serving mode for the Multi-Agent Chat System
+Many clients share one coordinator (corpus, indexes, caches) while each
+session gets its own memory; queries run on the query scheduler's worker pool
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from agents.coordinator import CoordinatorAgent
+from agents.prefork import PreforkCoordinator
+from utils.deadline import Deadline
+from utils.logger import SystemLogger, DEBUG
+from utils.scheduler import QueryScheduler
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024
+
+# Seconds an idle keep-alive connection is held open
+KEEP_ALIVE_TIMEOUT = 30
+
+
+class SessionStore:
+    """
+    Conversation sessions keyed by session id
+    Least recently used sessions are evicted beyond max_sessions, and
+    sessions idle for longer than idle_timeout seconds expire
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_timeout: float = 3600, history_size: int = 20):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.history_size = history_size
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, session_id: str):
+        """Mark a session as used, creating it if the id is unknown or expired"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or now - session['last_seen'] > self.idle_timeout:
+                session = {
+                    'created': datetime.now().isoformat(),
+                    'last_seen': now,
+                    'queries': 0,
+                    'history': deque(maxlen=self.history_size)
+                }
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            session['last_seen'] = now
+            self._sessions.move_to_end(session_id)
+
+    def record(self, session_id: str, query: str, metadata: Dict[str, Any]):
+        """Add a finished query to the session's history"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session['queries'] += 1
+            session['history'].append({
+                'timestamp': datetime.now().isoformat(),
+                'query': query,
+                'route': metadata.get('route'),
+                'confidence': metadata.get('confidence')
+            })
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a session, or None if it is unknown"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            return {
+                'session_id': session_id,
+                'created': session['created'],
+                'queries': session['queries'],
+                'history': list(session['history'])
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class ChatRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints:
+      POST /query            {"query": str, "session_id"?: str, "timeout"?: seconds}
+      POST /memory/search    {"query": str, "filters"?: {...}, "top_k"?: int, "session_id"?: str}
+      GET  /sessions/<id>    recent queries of a session
+      GET  /memory/stats     memory, cache, scheduler and session statistics
+      GET  /health           liveness and uptime
+    """
+
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    server_version = "MultiAgentChat/1.0"
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/health':
+            self._send_json(200, self.server.health())
+        elif path == '/memory/stats':
+            self._send_json(200, self.server.statistics())
+        elif path.startswith('/sessions/'):
+            session = self.server.sessions.get(path[len('/sessions/'):])
+            if session is None:
+                self._send_error(404, "Unknown session")
+            else:
+                self._send_json(200, session)
+        else:
+            self._send_error(404, f"No such endpoint: {path}")
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path not in ('/query', '/memory/search'):
+            self._send_error(404, f"No such endpoint: {path}")
+            return
+
+        request, error = self._read_json()
+        if error:
+            self._send_error(*error)
+            return
+        if path == '/memory/search':
+            self._search_memory(request)
+            return
+
+        query = request.get('query')
+        if not isinstance(query, str) or not query.strip():
+            self._send_error(400, "'query' must be a non-empty string")
+            return
+
+        deadline = None
+        if request.get('timeout') is not None:
+            try:
+                deadline = Deadline(float(request['timeout']))
+            except (TypeError, ValueError):
+                self._send_error(400, "'timeout' must be a number of seconds")
+                return
+
+        # Sessions are opt-in: without an id the query reads and writes the default memory
+        session_id = request.get('session_id') or self.headers.get('X-Session-Id')
+        if session_id is not None and not isinstance(session_id, str):
+            self._send_error(400, "'session_id' must be a string")
+            return
+        if session_id:
+            self.server.sessions.open(session_id)
+        try:
+            result = self.server.scheduler.submit(query.strip(), deadline=deadline, session_id=session_id).result()
+        except RuntimeError as e:
+            self._send_error(503, str(e))
+            return
+        except Exception as e:
+            self.server.logger.log_error(f"Query failed: {e}")
+            self._send_error(500, "Query failed")
+            return
+
+        metadata = result['metadata']
+        status = 503 if metadata.get('rejected') else 200
+        if not session_id:
+            self._send_json(status, result)
+            return
+        self.server.sessions.record(session_id, query, metadata)
+        self._send_json(status, {**result, 'session_id': session_id}, {'X-Session-Id': session_id})
+
+    def _search_memory(self, request: Dict[str, Any]):
+        """Filtered memory retrieval, from a session's memory or the shared one"""
+        query = request.get('query')
+        filters = request.get('filters')
+        top_k = request.get('top_k', 5)
+        if not isinstance(query, str):
+            self._send_error(400, "'query' must be a string")
+            return
+        if filters is not None and not isinstance(filters, dict):
+            self._send_error(400, "'filters' must be an object")
+            return
+        if not isinstance(top_k, int) or top_k < 1:
+            self._send_error(400, "'top_k' must be a positive integer")
+            return
+        session_id = request.get('session_id')
+        if session_id is not None and not isinstance(session_id, str):
+            self._send_error(400, "'session_id' must be a string")
+            return
+
+        try:
+            result = self.server.coordinator.search_memory(query, top_k=top_k, filters=filters,
+                                                           session_id=session_id)
+        except (ValueError, TypeError) as e:
+            self._send_error(400, f"Invalid filters: {e}")
+            return
+        if result is None:
+            self._send_error(404, "Unknown session")
+            return
+        self._send_json(200, result)
+
+    def _read_json(self) -> Tuple[Dict[str, Any], Optional[Tuple[int, str]]]:
+        """Read the request body as a JSON object"""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            return {}, (400, "Invalid Content-Length")
+        if length < 0:
+            # read(-1) would block until the client closes the connection
+            self.close_connection = True
+            return {}, (400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            # The unread body would corrupt the next request on this connection
+            self.close_connection = True
+            return {}, (413, "Request body too large")
+
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return {}, (400, "Request body must be JSON")
+        if not isinstance(request, dict):
+            return {}, (400, "Request body must be a JSON object")
+        return request, None
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {'error': message})
+
+    def log_message(self, format, *args):
+        """Send access logs to the system log instead of stderr"""
+        self.server.logger.log_agent_action("Server", "Request", format % args, level=DEBUG)
+
+
+class ChatServer(ThreadingHTTPServer):
+    """HTTP server holding the state shared by all connections"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], coordinator: Optional[CoordinatorAgent] = None,
+                 workers: int = 4, overload_policy: str = "degrade"):
+        super().__init__(address, ChatRequestHandler)
+        self.coordinator = coordinator or CoordinatorAgent()
+        self.scheduler = QueryScheduler(self.coordinator, workers=workers, overload_policy=overload_policy)
+        self.sessions = SessionStore()
+        self.logger = SystemLogger()
+        self.started = time.monotonic()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'uptime_s': round(time.monotonic() - self.started, 1),
+            'sessions': len(self.sessions),
+            'corpus_version': self.coordinator.research.corpus_version,
+            'corpus_index': self.coordinator.research.index.source
+        }
+
+    def statistics(self) -> Dict[str, Any]:
+        stats = {
+            'memory': self.coordinator.memory.get_statistics(),
+            'scheduler': self.scheduler.get_statistics(),
+            'sessions': len(self.sessions)
+        }
+        if isinstance(self.coordinator, PreforkCoordinator):
+            # Caches and session memories live in the workers; this process's are unused
+            stats['workers'] = self.coordinator.get_worker_statistics()
+        else:
+            stats.update(self.coordinator.get_statistics())
+        return stats
+
+    def server_close(self):
+        super().server_close()
+        self.scheduler.shutdown()
+        # Keep conversations across restarts
+        self.coordinator.sessions.spill_all()
+        self.coordinator.close()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080, workers: int = 4, corpus_index: Optional[str] = None,
+          memory_shards: int = 1, prefork: int = 0):
+    """
+    Run the HTTP server until interrupted
+    With prefork, queries run on that many pre-forked worker processes
+    Memory shards hold the default memory, used by queries without a session id;
+    session memories stay in-process
+    """
+    if prefork and memory_shards > 1:
+        raise ValueError("Memory shards cannot be combined with pre-forked workers")
+    # Per-action console output from concurrent requests is unreadable; the log file keeps it
+    SystemLogger.configure(console=False)
+    if prefork:
+        # Fork before the server starts any threads; one query thread per worker at least
+        coordinator = PreforkCoordinator(workers=prefork, corpus_index=corpus_index)
+        workers = max(workers, prefork)
+    else:
+        coordinator = CoordinatorAgent(corpus_index=corpus_index, memory_shards=memory_shards)
+    server = ChatServer((host, port), coordinator=coordinator, workers=workers)
+    if not prefork:
+        # Pay for agent construction and numpy before the first client does (workers do their own)
+        server.coordinator.prewarm()
+    print(f"🌐 Serving on http://{host}:{server.server_address[1]} with {workers} query workers")
+    print("   POST /query · GET /memory/stats · GET /health · GET /sessions/<id>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
@@ -0,0 +1,119 @@
+"""
+Startup-time benchmark for the Multi-Agent Chat System
+Measures how long it takes to import main.py and construct the chat system,
+with a `python -X importtime` breakdown, and guards against heavy modules
+creeping back into startup
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Imported in a fresh interpreter; prints the timings and the forbidden modules it loaded
+STARTUP_SCRIPT = """
+import sys, time, json
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.MultiAgentChatSystem()
+constructed = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'construct_ms': (constructed - imported) * 1000,
+    'loaded': [m for m in sys.argv[1:] if m in sys.modules]
+}))
+"""
+
+# Modules that must not be imported just to start the CLI
+DEFAULT_FORBIDDEN = ['numpy', 'concurrent.futures', 'pstats', 'tracemalloc']
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_startup(forbidden: List[str], importtime: bool = False) -> Dict[str, Any]:
+    """Start a fresh interpreter and measure startup, optionally with -X importtime"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', STARTUP_SCRIPT] + forbidden
+    completed = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if importtime:
+        result['modules'] = parse_importtime(completed.stderr)
+    return result
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """Parse `-X importtime` lines into per-module self and cumulative microseconds"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us)
+        })
+    return modules
+
+
+def main():
+    """Entry point for the startup benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark startup time of the Multi-Agent Chat System")
+    parser.add_argument('--repeats', type=int, default=10, help="fresh interpreters to time (default: 10)")
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list (default: 15)")
+    parser.add_argument('--max-ms', type=float, help="fail if median import + construct time exceeds this")
+    parser.add_argument('--forbid', action='append', metavar='MODULE',
+                        help="module that must not load at startup (default: %s)" % ", ".join(DEFAULT_FORBIDDEN))
+    parser.add_argument('--output', help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    forbidden = args.forbid or DEFAULT_FORBIDDEN
+
+    # The first run also compiles bytecode; keep it out of the numbers
+    run_startup(forbidden)
+    runs = [run_startup(forbidden) for _ in range(args.repeats)]
+    breakdown = run_startup(forbidden, importtime=True)
+
+    totals = [run['import_ms'] + run['construct_ms'] for run in runs]
+    summary = {
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 3),
+        'construct_ms': round(statistics.median(run['construct_ms'] for run in runs), 3),
+        'total_ms': round(statistics.median(totals), 3),
+        'max_total_ms': round(max(totals), 3),
+        'forbidden_loaded': breakdown['loaded']
+    }
+
+    print(f"Startup over {args.repeats} runs (median): import {summary['import_ms']:.1f} ms, "
+          f"construct {summary['construct_ms']:.2f} ms, total {summary['total_ms']:.1f} ms")
+
+    # Slowest imports, including everything they pull in
+    slowest = sorted(breakdown['modules'], key=lambda m: m['cumulative_us'], reverse=True)[:args.top]
+    print(f"\n{'Module':<40}{'self ms':>10}{'cumulative ms':>16}")
+    for module in slowest:
+        print(f"{module['module']:<40}{module['self_us'] / 1000:>10.2f}"
+              f"{module['cumulative_us'] / 1000:>16.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'runs': runs, 'importtime': breakdown['modules']}, f, indent=2)
+        print(f"\nResults saved in: {args.output}")
+
+    failures = []
+    if summary['forbidden_loaded']:
+        failures.append(f"heavy modules loaded at startup: {', '.join(summary['forbidden_loaded'])}")
+    if args.max_ms is not None and summary['total_ms'] > args.max_ms:
+        failures.append(f"startup took {summary['total_ms']:.1f} ms, budget is {args.max_ms:.1f} ms")
+
+    if failures:
+        for failure in failures:
+            print(f"\n❌ {failure}")
+        sys.exit(1)
+    print("\n✅ Startup is within limits")
+
+
+if __name__ == "__main__":
+    main()
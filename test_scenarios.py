@@ -3,16 +3,61 @@ Automated test scenarios for the Multi-Agent Chat System
 Runs all 5 required test cases and saves outputs
 """
 
+import argparse
 import sys
 import os
 from datetime import datetime
 from agents.coordinator import CoordinatorAgent
+from utils.deadline import Deadline
+from typing import Dict, List
+from utils.logger import SystemLogger
+from utils.profiling import QueryProfiler
+
+# The five required scenarios, in the order they run
+# (the memory scenario relies on the two before it having been stored)
+SCENARIOS: List[Dict[str, str]] = [
+    {
+        'name': 'simple',
+        'title': 'SIMPLE QUERY',
+        'query': "What are the main types of neural networks?",
+        'output': 'simple_query.txt'
+    },
+    {
+        'name': 'complex',
+        'title': 'COMPLEX QUERY',
+        'query': "Research transformer architectures, analyze their computational efficiency, and summarize key trade-offs.",
+        'output': 'complex_query.txt'
+    },
+    {
+        'name': 'memory',
+        'title': 'MEMORY QUERY',
+        'query': "What did we discuss about neural networks earlier?",
+        'output': 'memory_test.txt'
+    },
+    {
+        'name': 'multi-step',
+        'title': 'MULTI-STEP QUERY',
+        'query': "Find recent papers on reinforcement learning, analyze their methodologies, and identify common challenges.",
+        'output': 'multi_step.txt'
+    },
+    {
+        'name': 'collaborative',
+        'title': 'COLLABORATIVE QUERY',
+        'query': "Compare machine learning optimization techniques and recommend which is better.",
+        'output': 'collaborative.txt'
+    }
+]
 
 class TestScenarios:
-    def __init__(self):
+    def __init__(self, profiler=None):
         self.coordinator = CoordinatorAgent()
         self.output_dir = "outputs"
+        self.profiler = profiler
         self._ensure_output_directory()
+        
+        if profiler:
+            # Index memory inline so embedding cost shows up in the query that stored it
+            self.coordinator.memory.set_write_behind(False)
     
     def _ensure_output_directory(self):
         """Ensure output directory exists"""
@@ -39,75 +84,52 @@ class TestScenarios:
         
         print(f"✅ Saved: {filepath}")
     
-    def test_simple_query(self):
-        """Test Scenario 1: Simple Query"""
+    def run_query(self, query: str, label: str) -> str:
+        """Run a query, profiling it under `label` when profiling is enabled"""
+        if not self.profiler:
+            return self.coordinator.process_query(query)
+        
+        with self.profiler.profile(label) as report:
+            response = self.coordinator.process_query(query)
+        print(f"🔬 Profile saved: {report['pstats']}")
+        if 'allocations' in report:
+            print(f"🔬 Allocations saved: {report['allocations']}")
+        return response
+    
+    def run_scenario(self, number: int, scenario: Dict[str, str]):
+        """Run one scenario and save its output"""
         print("\n" + "="*70)
-        print("TEST 1: SIMPLE QUERY")
+        print(f"TEST {number}: {scenario['title']}")
         print("="*70 + "\n")
         
-        query = "What are the main types of neural networks?"
+        query = scenario['query']
         print(f"Query: {query}\n")
         
-        response = self.coordinator.process_query(query)
+        label = scenario['output'].replace('.txt', '')
+        response = self.run_query(query, label)
         print(f"\nResponse:\n{response}\n")
         
-        self.save_output("simple_query.txt", query, response)
+        self.save_output(scenario['output'], query, response)
+    
+    def test_simple_query(self):
+        """Test Scenario 1: Simple Query"""
+        self.run_scenario(1, SCENARIOS[0])
     
     def test_complex_query(self):
         """Test Scenario 2: Complex Query"""
-        print("\n" + "="*70)
-        print("TEST 2: COMPLEX QUERY")
-        print("="*70 + "\n")
-        
-        query = "Research transformer architectures, analyze their computational efficiency, and summarize key trade-offs."
-        print(f"Query: {query}\n")
-        
-        response = self.coordinator.process_query(query)
-        print(f"\nResponse:\n{response}\n")
-        
-        self.save_output("complex_query.txt", query, response)
+        self.run_scenario(2, SCENARIOS[1])
     
     def test_memory_query(self):
         """Test Scenario 3: Memory Test"""
-        print("\n" + "="*70)
-        print("TEST 3: MEMORY QUERY")
-        print("="*70 + "\n")
-        
-        query = "What did we discuss about neural networks earlier?"
-        print(f"Query: {query}\n")
-        
-        response = self.coordinator.process_query(query)
-        print(f"\nResponse:\n{response}\n")
-        
-        self.save_output("memory_test.txt", query, response)
+        self.run_scenario(3, SCENARIOS[2])
     
     def test_multistep_query(self):
         """Test Scenario 4: Multi-step Query"""
-        print("\n" + "="*70)
-        print("TEST 4: MULTI-STEP QUERY")
-        print("="*70 + "\n")
-        
-        query = "Find recent papers on reinforcement learning, analyze their methodologies, and identify common challenges."
-        print(f"Query: {query}\n")
-        
-        response = self.coordinator.process_query(query)
-        print(f"\nResponse:\n{response}\n")
-        
-        self.save_output("multi_step.txt", query, response)
+        self.run_scenario(4, SCENARIOS[3])
     
     def test_collaborative_query(self):
         """Test Scenario 5: Collaborative Query"""
-        print("\n" + "="*70)
-        print("TEST 5: COLLABORATIVE QUERY")
-        print("="*70 + "\n")
-        
-        query = "Compare machine learning optimization techniques and recommend which is better."
-        print(f"Query: {query}\n")
-        
-        response = self.coordinator.process_query(query)
-        print(f"\nResponse:\n{response}\n")
-        
-        self.save_output("collaborative.txt", query, response)
+        self.run_scenario(5, SCENARIOS[4])
     
     def run_all_tests(self):
         """Run all test scenarios"""
@@ -141,15 +163,121 @@ class TestScenarios:
             print("  • memory_test.txt")
             print("  • multi_step.txt")
             print("  • collaborative.txt")
+            if self.profiler:
+                print("\nProfiles: <name>.pstats" + (" and <name>_alloc.txt" if self.profiler.trace_memory else ""))
+                print("  Inspect with: python -m pstats outputs/<name>.pstats")
             
         except Exception as e:
             print(f"\n❌ Test failed with error: {str(e)}")
             import traceback
             traceback.print_exc()
 
+# Regression checks: plain asserts, run by pytest or by `python test_scenarios.py --checks`
+
+def test_find_and_analyze_keeps_subject():
+    """A bare verb before "and analyze X" researches X instead of the verb alone"""
+    coordinator = CoordinatorAgent()
+    assert coordinator._decompose_query("Find and analyze reinforcement learning") == [
+        ['Find reinforcement learning', 'analyze reinforcement learning']
+    ]
+    
+    response = coordinator.process_query("Find and analyze reinforcement learning")
+    assert "✓ Found: reinforcement learning" in response
+    assert "Cannot analyze without data" not in response
+
+def test_multistep_retry_after_deadline():
+    """A retry after a timed-out multi-step query recomputes analysis built on partial research"""
+    coordinator = CoordinatorAgent()
+    query = SCENARIOS[3]['query']
+    
+    first = coordinator.process_query_with_metadata(query, deadline=Deadline(0))
+    assert first['metadata']['degraded']
+    
+    retry = coordinator.process_query_with_metadata(query)
+    assert not retry['metadata']['degraded']
+    assert "✓ Found: reinforcement learning" in retry['response']
+    assert "Cannot analyze without data" not in retry['response']
+    assert "Skipped" not in retry['response']
+    
+    # Only the full answer is cached
+    again = coordinator.process_query_with_metadata(query)
+    assert again['metadata'].get('cache') == 'exact'
+    assert again['response'] == retry['response']
+
+def test_multistep_retry_after_failed_research():
+    """Analysis of a failed research node is not checkpointed for the retry to reuse"""
+    coordinator = CoordinatorAgent()
+    query = "Find and analyze reinforcement learning"
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError("research backend unavailable")
+    coordinator.research.search = fail
+    first = coordinator.process_query_with_metadata(query)
+    assert first['metadata']['failed_stages']
+    del coordinator.research.search
+    
+    retry = coordinator.process_query_with_metadata(query)
+    assert not retry['metadata']['degraded'] and 'failed_stages' not in retry['metadata']
+    assert "Cannot analyze without data" not in retry['response']
+
+def test_prefork_query_fills_shared_segment():
+    """Under --prefork, a /query without a session id is stored in the shared memory segment"""
+    import http.client
+    import json
+    import threading
+    from agents.prefork import PreforkCoordinator
+    from server import ChatServer
+    
+    server = ChatServer(("127.0.0.1", 0), coordinator=PreforkCoordinator(workers=2), workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+        connection.request('POST', '/query', body=json.dumps({'query': SCENARIOS[0]['query']}))
+        reply = json.loads(connection.getresponse().read())
+        assert 'session_id' not in reply
+        
+        connection.request('GET', '/memory/stats')
+        stats = json.loads(connection.getresponse().read())
+        assert stats['workers']['shared_memory']['records'] == 1
+        # The server process reads the segment too
+        assert stats['memory']['conversations'] == 1
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+REGRESSION_CHECKS = [
+    test_find_and_analyze_keeps_subject,
+    test_multistep_retry_after_deadline,
+    test_multistep_retry_after_failed_research,
+    test_prefork_query_fills_shared_segment
+]
+
+def run_checks() -> bool:
+    """Run the regression checks, reporting each; True if all passed"""
+    failures = 0
+    for check in REGRESSION_CHECKS:
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ {check.__name__}: {type(e).__name__}: {e}")
+    print(f"\n{len(REGRESSION_CHECKS) - failures}/{len(REGRESSION_CHECKS)} checks passed")
+    return failures == 0
+
 def main():
     """Main entry point for automated testing"""
-    tester = TestScenarios()
+    parser = argparse.ArgumentParser(description="Run the Multi-Agent Chat System test scenarios")
+    QueryProfiler.add_arguments(parser)
+    parser.add_argument('--checks', action='store_true', help="run the regression checks instead of the scenarios")
+    args = parser.parse_args()
+    
+    if args.checks:
+        SystemLogger.configure(console=False)
+        sys.exit(0 if run_checks() else 1)
+    
+    tester = TestScenarios(profiler=QueryProfiler.from_args(args))
     tester.run_all_tests()
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+"""
+Deadline - Per-request time budget passed through the agent pipeline
+"""
+
+import time
+
+
+class Deadline:
+    def __init__(self, budget: float):
+        """Start a budget of `budget` seconds from now"""
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Check whether the budget has run out"""
+        return time.monotonic() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"Deadline(budget={self.budget}, remaining={self.remaining():.3f})"
@@ -0,0 +1,62 @@
+"""
+Fragment Cache - Rendered per-topic response fragments
+A topic's rendering depends only on its corpus data, so each fragment is
+rendered once per corpus version and then reused by every response
+"""
+
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class FragmentCache:
+    def __init__(self):
+        self.corpus_version = None
+        self._fragments: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0
+        }
+
+    def get(self, kind: str, topic: str, corpus_version: Any, render: Callable[[], str]) -> str:
+        """
+        The rendered fragment of one kind for a topic, rendering it on a miss
+        Every fragment is dropped when the corpus version changes
+        """
+        key = (kind, topic)
+        with self._lock:
+            if corpus_version != self.corpus_version:
+                if self._fragments:
+                    self.stats['invalidations'] += 1
+                self._fragments = {}
+                self.corpus_version = corpus_version
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self.stats['hits'] += 1
+                return fragment
+            self.stats['misses'] += 1
+            fragments = self._fragments
+
+        # Render outside the lock; a concurrent miss on the same key renders the same string
+        fragment = render()
+        with self._lock:
+            # Skip the store if the corpus changed while rendering
+            if fragments is self._fragments:
+                fragments[key] = fragment
+        return fragment
+
+    def clear(self):
+        """Drop all rendered fragments"""
+        with self._lock:
+            self._fragments = {}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get fragment hit/miss metrics"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'fragments': len(self._fragments),
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0
+            }
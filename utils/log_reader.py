@@ -0,0 +1,315 @@
+"""
+Log Reader - Indexed and tail-seeking access to the system log
+"""
+
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional
+from utils import log_rotation
+
+# Bytes read per step when seeking backward from the end of the log
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+class LogReader:
+    """
+    Reads a JSON-lines log through a sidecar offset index
+    The index (<log>.idx) maps every entry to its byte range, entry type and
+    hour bucket; it is extended incrementally as the log grows
+    Rotated segments are read only when the live log cannot answer a query,
+    and the segment manifest lets queries skip segments that cannot match
+    """
+
+    _readers: Dict[str, 'LogReader'] = {}
+    _readers_lock = threading.Lock()
+
+    def __init__(self, log_file: str):
+        self.log_file = log_file
+        self.index_file = log_file + ".idx"
+        self._lock = threading.Lock()
+        self._inode = None
+        self._reset()
+
+    @classmethod
+    def for_file(cls, log_file: str) -> 'LogReader':
+        """Get the shared reader for a log file"""
+        path = os.path.abspath(log_file)
+        with cls._readers_lock:
+            if path not in cls._readers:
+                cls._readers[path] = LogReader(path)
+            return cls._readers[path]
+
+    def _reset(self):
+        """Forget the in-memory index"""
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self.by_type: Dict[str, List[int]] = {}
+        self.bucket_names: List[str] = []
+        self.bucket_starts: List[int] = []
+        self.indexed_upto = 0
+        self._index_read_pos = 0
+
+    def get_logs(self, log_type: Optional[str] = None, limit: int = 100,
+                 since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the most recent `limit` entries (all if limit is falsy), oldest first
+        since/until are ISO timestamps bounding the entries' 'timestamp'
+        """
+        logs = self._get_live_logs(log_type, limit, since, until)
+
+        # Fall back to rotated segments, newest first, only as far as needed
+        for segment in reversed(self._segments(log_type, since, until)):
+            if limit and len(logs) >= limit:
+                break
+            older = [e for e in self._read_segment(segment) if self._matches(e, log_type, since, until)]
+            logs = older + logs
+
+        return logs[-limit:] if limit else logs
+
+    def _get_live_logs(self, log_type: Optional[str], limit: int,
+                       since: Optional[str], until: Optional[str]) -> List[Dict[str, Any]]:
+        """Get matching entries from the live log file"""
+        if not os.path.exists(self.log_file):
+            return []
+
+        if limit and log_type is None and since is None and until is None:
+            return self._tail(limit)
+
+        with self._lock:
+            self._refresh()
+            positions = self._positions(log_type, since, until)
+
+        logs = []
+        with open(self.log_file, 'rb') as f:
+            for pos in reversed(positions):
+                entry = self._read_entry(f, pos)
+                if entry is not None and self._in_range(entry, since, until):
+                    logs.append(entry)
+                    if limit and len(logs) >= limit:
+                        break
+
+        logs.reverse()
+        return logs
+
+    def iter_logs(self, log_type: Optional[str] = None, since: Optional[str] = None,
+                  until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream matching entries oldest first without loading the whole log"""
+        for segment in self._segments(log_type, since, until):
+            for entry in self._read_segment(segment):
+                if self._matches(entry, log_type, since, until):
+                    yield entry
+
+        if not os.path.exists(self.log_file):
+            return
+
+        with self._lock:
+            self._refresh()
+            positions = self._positions(log_type, since, until)
+
+        with open(self.log_file, 'rb') as f:
+            for pos in positions:
+                entry = self._read_entry(f, pos)
+                if entry is not None and self._in_range(entry, since, until):
+                    yield entry
+
+    def _tail(self, limit: int) -> List[Dict[str, Any]]:
+        """Read the last `limit` entries by seeking backward from the end of the file"""
+        with open(self.log_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b""
+
+            # One extra line so that a partial first line can be dropped
+            while position > 0 and data.count(b"\n") <= limit:
+                step = min(TAIL_BLOCK_SIZE, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+
+        lines = data.split(b"\n")
+        if position > 0:
+            lines = lines[1:]
+
+        logs = []
+        for line in lines:
+            entry = self._parse(line)
+            if entry is not None:
+                logs.append(entry)
+        return logs[-limit:]
+
+    def _positions(self, log_type: Optional[str], since: Optional[str], until: Optional[str]):
+        """Entry positions that may match, narrowed by type and hour bucket"""
+        start = 0
+        end = len(self.offsets)
+        if since:
+            idx = bisect_left(self.bucket_names, since[:13])
+            start = self.bucket_starts[idx] if idx < len(self.bucket_starts) else end
+        if until:
+            idx = bisect_right(self.bucket_names, until[:13])
+            end = self.bucket_starts[idx] if idx < len(self.bucket_starts) else end
+
+        if log_type is None:
+            return range(start, end)
+
+        positions = self.by_type.get(log_type, [])
+        return positions[bisect_left(positions, start):bisect_left(positions, end)]
+
+    def _refresh(self):
+        """Bring the in-memory index up to date with the log and its sidecar"""
+        stat = os.stat(self.log_file)
+        if stat.st_ino != self._inode or stat.st_size < self.indexed_upto:
+            # The log was rotated, truncated or replaced: start over
+            self._reset()
+            self._inode = stat.st_ino
+
+        self._load_sidecar()
+        if stat.st_size > self.indexed_upto:
+            self._index_tail()
+
+    def _load_sidecar(self):
+        """Load index lines appended to the sidecar since the last refresh"""
+        if not os.path.exists(self.index_file):
+            return
+
+        with open(self.index_file, 'rb') as f:
+            if self._index_read_pos == 0:
+                # A sidecar left over from a rotated log describes another file
+                header = f.readline()
+                if header != self._index_header().encode('utf-8'):
+                    f.close()
+                    os.remove(self.index_file)
+                    return
+                self._index_read_pos = len(header)
+
+            f.seek(self._index_read_pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._index_read_pos += len(line)
+                try:
+                    offset, length, log_type, bucket = line.decode('utf-8').split()
+                    offset, length = int(offset), int(length)
+                except ValueError:
+                    continue
+
+                # Skip entries another reader already indexed; stop at a gap
+                if offset < self.indexed_upto:
+                    continue
+                if offset > self.indexed_upto:
+                    break
+                self._add_entry(offset, length, log_type, bucket)
+
+    def _index_tail(self):
+        """Index log lines past the indexed range and append them to the sidecar"""
+        index_lines = []
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.indexed_upto)
+            for line in f:
+                # A partial line is still being written
+                if not line.endswith(b"\n"):
+                    break
+
+                entry = self._parse(line) or {}
+                log_type = "".join(str(entry.get('type', '-')).split()) or '-'
+                bucket = str(entry.get('timestamp', ''))[:13] or '-'
+                index_lines.append(f"{self.indexed_upto} {len(line)} {log_type} {bucket}\n")
+                self._add_entry(self.indexed_upto, len(line), log_type, bucket)
+
+        if index_lines:
+            if not os.path.exists(self.index_file):
+                index_lines.insert(0, self._index_header())
+            try:
+                with open(self.index_file, 'a', encoding='utf-8') as f:
+                    f.write("".join(index_lines))
+            except OSError as e:
+                print(f"Warning: Could not write log index: {e}")
+
+    def _index_header(self) -> str:
+        """First line of the sidecar, tying it to the live log file"""
+        return f"# {self._inode}\n"
+
+    def _segments(self, log_type: Optional[str], since: Optional[str], until: Optional[str]) -> List[str]:
+        """Rotated segments that may hold matching entries, oldest first"""
+        manifest = log_rotation.load_manifest(self.log_file)
+        segments = {}
+        for path in log_rotation.segment_paths(self.log_file):
+            # A segment may briefly exist both raw and compressed; prefer the archive
+            base = path.split('.gz')[0].split('.xz')[0]
+            if base not in segments or os.path.basename(path) in manifest:
+                segments[base] = path
+
+        selected = []
+        for base in sorted(segments):
+            path = segments[base]
+            stats = manifest.get(os.path.basename(path))
+            if stats:
+                if log_type is not None and log_type not in stats['types']:
+                    continue
+                if since and stats['last'] and stats['last'] < since:
+                    continue
+                if until and stats['first'] and stats['first'] > until:
+                    continue
+            selected.append(path)
+        return selected
+
+    def _read_segment(self, path: str) -> Iterator[Dict[str, Any]]:
+        """Parse a rotated segment line by line, decompressing as it is read"""
+        candidates = [path] + [path + ext for ext, _ in log_rotation.COMPRESSORS.values()]
+        for candidate in candidates:
+            try:
+                f = log_rotation.open_segment(candidate)
+            except FileNotFoundError:
+                continue
+            with f:
+                for line in f:
+                    entry = self._parse(line)
+                    if entry is not None:
+                        yield entry
+            return
+
+    def _matches(self, entry: Dict[str, Any], log_type: Optional[str],
+                 since: Optional[str], until: Optional[str]) -> bool:
+        """Check an entry against the type and time filters"""
+        if log_type is not None and entry.get('type') != log_type:
+            return False
+        return self._in_range(entry, since, until)
+
+    def _add_entry(self, offset: int, length: int, log_type: str, bucket: str):
+        """Add one entry to the in-memory index"""
+        pos = len(self.offsets)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.by_type.setdefault(log_type, []).append(pos)
+        if bucket != '-' and (not self.bucket_names or bucket > self.bucket_names[-1]):
+            self.bucket_names.append(bucket)
+            self.bucket_starts.append(pos)
+        self.indexed_upto = offset + length
+
+    def _read_entry(self, f, pos: int) -> Optional[Dict[str, Any]]:
+        """Read a single indexed entry"""
+        f.seek(self.offsets[pos])
+        return self._parse(f.read(self.lengths[pos]))
+
+    @staticmethod
+    def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+        """Parse one JSON log line, ignoring blank or corrupt lines"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+
+    @staticmethod
+    def _in_range(entry: Dict[str, Any], since: Optional[str], until: Optional[str]) -> bool:
+        """Check an entry's timestamp against the requested range"""
+        timestamp = entry.get('timestamp', '')
+        if since and timestamp < since:
+            return False
+        if until and timestamp > until:
+            return False
+        return True
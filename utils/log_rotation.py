@@ -0,0 +1,175 @@
+"""
+Log Rotation - Rotated, compressed segments of the system log
+"""
+
+import glob
+import importlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is still safe within one process
+    fcntl = None
+
+# Compression method -> (file extension, module providing open()); the
+# modules are imported only when a segment is compressed or read
+COMPRESSORS = {
+    'gzip': ('.gz', 'gzip'),
+    'lzma': ('.xz', 'lzma')
+}
+
+# Serializes rotation and manifest updates between threads; the lock file
+# (see log_lock) does the same between processes sharing a log
+_log_lock = threading.Lock()
+
+
+def manifest_path(log_file: str) -> str:
+    """Path of the manifest describing a log's archived segments"""
+    return log_file + ".segments.json"
+
+
+def lock_path(log_file: str) -> str:
+    """Path of the file locked while a log is rotated or its manifest updated"""
+    return log_file + ".lock"
+
+
+@contextmanager
+def log_lock(log_file: str) -> Iterator[None]:
+    """Hold the log's rotation lock, across threads and processes"""
+    with _log_lock, open(lock_path(log_file), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def segment_paths(log_file: str) -> List[str]:
+    """Rotated segments of a log, oldest first"""
+    paths = []
+    for path in glob.glob(glob.escape(log_file) + ".*"):
+        suffix = path[len(log_file) + 1:]
+        if suffix[:1].isdigit() and not path.endswith('.tmp'):
+            paths.append(path)
+    return sorted(paths)
+
+
+def load_manifest(log_file: str) -> Dict[str, Dict[str, Any]]:
+    """Load the segment manifest: segment file name -> stats"""
+    try:
+        with open(manifest_path(log_file), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(log_file: str, manifest: Dict[str, Dict[str, Any]]):
+    """Atomically replace the segment manifest"""
+    tmp_path = manifest_path(log_file) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path(log_file))
+
+
+def rotate(log_file: str) -> Optional[str]:
+    """
+    Move the live log aside as a new raw segment
+    The caller must hold log_lock() and have closed the file; its offset index is dropped
+    """
+    if not os.path.exists(log_file) or os.path.getsize(log_file) == 0:
+        return None
+
+    segment = f"{log_file}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    os.replace(log_file, segment)
+    if os.path.exists(log_file + ".idx"):
+        os.remove(log_file + ".idx")
+    return segment
+
+
+def open_segment(path: str):
+    """Open a raw or compressed segment for binary reading"""
+    for extension, module in COMPRESSORS.values():
+        if path.endswith(extension):
+            return importlib.import_module(module).open(path, 'rb')
+    return open(path, 'rb')
+
+
+def summarize_segment(path: str) -> Dict[str, Any]:
+    """Collect the entry types and time range of a segment"""
+    types: Dict[str, int] = {}
+    first = last = None
+    with open_segment(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            log_type = entry.get('type', '-')
+            types[log_type] = types.get(log_type, 0) + 1
+            timestamp = entry.get('timestamp')
+            if timestamp:
+                first = timestamp if first is None else min(first, timestamp)
+                last = timestamp if last is None else max(last, timestamp)
+    return {'types': types, 'first': first, 'last': last}
+
+
+def compress_segment(log_file: str, segment: str, method: Optional[str],
+                     max_segments: Optional[int] = None, max_age: Optional[float] = None):
+    """
+    Compress a raw segment, record it in the manifest and apply retention
+    Runs on a background thread started by the log writer
+    """
+    try:
+        summary = summarize_segment(segment)
+        final_path = segment
+        if method:
+            extension, module = COMPRESSORS[method]
+            final_path = segment + extension
+            with open(segment, 'rb') as src, importlib.import_module(module).open(final_path + ".tmp", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(final_path + ".tmp", final_path)
+
+        with log_lock(log_file):
+            manifest = load_manifest(log_file)
+            manifest[os.path.basename(final_path)] = summary
+            _save_manifest(log_file, manifest)
+
+        if final_path != segment:
+            os.remove(segment)
+
+        apply_retention(log_file, max_segments, max_age)
+    except Exception as e:
+        print(f"Warning: Could not archive log segment {segment}: {e}")
+
+
+def apply_retention(log_file: str, max_segments: Optional[int] = None, max_age: Optional[float] = None):
+    """Delete the oldest segments beyond the count limit or older than max_age seconds"""
+    segments = segment_paths(log_file)
+    expired = []
+    if max_segments is not None and len(segments) > max_segments:
+        expired = segments[:len(segments) - max_segments]
+    if max_age is not None:
+        cutoff = time.time() - max_age
+        expired += [s for s in segments if s not in expired and os.path.getmtime(s) < cutoff]
+
+    if not expired:
+        return
+
+    with log_lock(log_file):
+        manifest = load_manifest(log_file)
+        for path in expired:
+            manifest.pop(os.path.basename(path), None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        _save_manifest(log_file, manifest)
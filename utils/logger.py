@@ -2,36 +2,310 @@
 System Logger - Logging and tracing utility
 """
 
+import atexit
 import json
+import queue
+import random
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Iterator
 import os
+from utils import log_rotation
+from utils.log_reader import LogReader
+
+# Log levels, lowest to highest severity
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+
+# Console icons per agent
+AGENT_ICONS = {
+    'Coordinator': '🎯',
+    'Research': '🔍',
+    'Analysis': '📊',
+    'Memory': '💾'
+}
+
+# Process-wide defaults for the background log writers
+DEFAULT_WRITER_CONFIG = {
+    'queue_size': 10000,      # Max lines buffered in memory per log file
+    'flush_interval': 0.5,    # Max seconds a line is held to fill a batch before being written
+    'batch_size': 512,        # Max lines per write call
+    'fsync': 'never',         # 'never', 'batch' (after every write) or 'interval'
+    'fsync_interval': 1.0,    # Seconds between fsyncs with the 'interval' policy
+    'full_policy': 'drop',    # 'drop' or 'block' when the queue is full
+    'rotate_bytes': 50 * 1024 * 1024,  # Rotate once the live log reaches this size (None = never)
+    'rotate_interval': None,  # Rotate after this many seconds (None = never)
+    'compression': 'gzip',    # 'gzip', 'lzma' or None for rotated segments
+    'max_segments': 10,       # Rotated segments to keep (None = unlimited)
+    'max_age': None           # Delete segments older than this many seconds (None = keep)
+}
+
+class _LogWriter:
+    """
+    Background writer shared by every SystemLogger that logs to the same file
+    Lines are queued in memory and written in batches by a single thread
+    """
+    
+    def __init__(self, log_file: str, config: Dict[str, Any]):
+        self.log_file = log_file
+        self.config = config
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=config['queue_size'])
+        self._file = None
+        self._segment_started = time.monotonic()
+        self._last_fsync = time.monotonic()
+        self._archivers = []
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+    
+    def put(self, line: str):
+        """Queue a line, dropping or blocking when the queue is full"""
+        if self.config['full_policy'] == 'block':
+            self._queue.put(line)
+            return
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+    
+    def flush(self):
+        """Block until every line queued so far has been written"""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+    
+    def close(self):
+        """Write out everything queued and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+        for archiver in self._archivers:
+            archiver.join()
+    
+    def _run(self):
+        """
+        Writer thread: batch queued lines into large writes
+        A batch is written once it holds batch_size lines or its first line has
+        waited flush_interval seconds; flush() and close() write it at once
+        """
+        while True:
+            item = self._queue.get()
+            deadline = time.monotonic() + self.config['flush_interval']
+            
+            lines, waiters, stop = [], [], False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(item)
+                if stop or waiters or len(lines) >= self.config['batch_size']:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            
+            if lines:
+                self._write(lines)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                if self._file:
+                    self._file.close()
+                return
+    
+    def _write(self, lines):
+        """Append a batch of lines with a single write"""
+        try:
+            data = "".join(lines).encode('utf-8')
+            self._open()
+            if self._should_rotate(len(data)):
+                self._rotate(len(data))
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+            
+            policy = self.config['fsync']
+            now = time.monotonic()
+            if policy == 'batch' or (policy == 'interval' and now - self._last_fsync >= self.config['fsync_interval']):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+        except Exception as e:
+            print(f"Warning: Could not write to log file: {e}")
+    
+    def _open(self):
+        """Open the live log, reopening it if another process has rotated it away"""
+        if self._file is not None:
+            try:
+                current = os.stat(self.log_file).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(self._file.fileno()).st_ino:
+                return
+            self._file.close()
+            self._segment_started = time.monotonic()
+        self._file = open(self.log_file, 'ab')
+    
+    def _should_rotate(self, incoming: int) -> bool:
+        """Check the size and age limits of the live log"""
+        # Every process appending to the log counts towards its size
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            return False
+        
+        rotate_bytes = self.config['rotate_bytes']
+        rotate_interval = self.config['rotate_interval']
+        if rotate_bytes and size + incoming > rotate_bytes:
+            return True
+        return bool(rotate_interval) and time.monotonic() - self._segment_started >= rotate_interval
+    
+    def _rotate(self, incoming: int):
+        """Move the live log aside and compress it in the background"""
+        with log_rotation.log_lock(self.log_file):
+            # Another process sharing the log may have rotated it while this one waited
+            self._open()
+            if not self._should_rotate(incoming):
+                return
+            self._file.close()
+            self._file = None
+            segment = log_rotation.rotate(self.log_file)
+        
+        self._segment_started = time.monotonic()
+        if segment is None:
+            return
+        
+        archiver = threading.Thread(
+            target=log_rotation.compress_segment,
+            args=(self.log_file, segment, self.config['compression'],
+                  self.config['max_segments'], self.config['max_age']),
+            name="log-archiver",
+            daemon=True
+        )
+        archiver.start()
+        self._archivers = [a for a in self._archivers if a.is_alive()] + [archiver]
+
 
 class SystemLogger:
+    _writer_config = dict(DEFAULT_WRITER_CONFIG)
+    _writers: Dict[str, _LogWriter] = {}
+    _writers_lock = threading.Lock()
+    _generation = 0
+    
+    # Process-wide filtering, checked before any entry is built
+    _level = INFO
+    _console = True
+    _sample_rates: Dict[str, float] = {}
+    
     def __init__(self, log_file: str = "logs/system.log"):
         self.log_file = log_file
-        self._ensure_log_directory()
+        # The log directory and the shared writer are set up on the first write
+        self._writer = None
+        self._writer_generation = None
+    
+    @classmethod
+    def configure(cls, level=None, console: bool = None, sample_rates: Dict[str, float] = None, **options):
+        """
+        Change process-wide logging settings
+        level: minimum level to record ('debug', 'info', 'warning', 'error' or an int)
+        console: False turns off all console output
+        sample_rates: fraction of events to keep per event type, e.g. {'agent_action': 0.01}
+        Other options are writer settings (see DEFAULT_WRITER_CONFIG); they apply to
+        existing writers too, except for the queue size
+        """
+        unknown = set(options) - set(DEFAULT_WRITER_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown logger options: {', '.join(sorted(unknown))}")
+        cls._writer_config.update(options)
+        
+        if level is not None:
+            cls._level = LEVELS[level.lower()] if isinstance(level, str) else level
+        if console is not None:
+            cls._console = console
+        if sample_rates is not None:
+            cls._sample_rates = dict(sample_rates)
+    
+    @staticmethod
+    def is_enabled(event_type: str, level: int = INFO) -> bool:
+        """
+        Cheap check whether an event would be recorded
+        Applies the level threshold and the event type's sampling rate
+        """
+        if level < SystemLogger._level:
+            return False
+        rate = SystemLogger._sample_rates.get(event_type)
+        return rate is None or rate >= 1.0 or random.random() < rate
+    
+    @classmethod
+    def _get_writer(cls, log_file: str) -> _LogWriter:
+        """Get the shared writer for a log file, starting it on first use"""
+        path = os.path.abspath(log_file)
+        with cls._writers_lock:
+            if path not in cls._writers:
+                cls._writers[path] = _LogWriter(path, cls._writer_config)
+            return cls._writers[path]
+    
+    @classmethod
+    def flush_all(cls):
+        """Write out every queued line for all log files"""
+        with cls._writers_lock:
+            writers = list(cls._writers.values())
+        for writer in writers:
+            writer.flush()
+    
+    @classmethod
+    def shutdown(cls):
+        """Flush and stop all writers (registered to run at exit)"""
+        with cls._writers_lock:
+            writers = list(cls._writers.values())
+            cls._writers.clear()
+        for writer in writers:
+            writer.close()
+    
+    @classmethod
+    def _reset_after_fork(cls):
+        """Writer threads do not survive fork; children start their own"""
+        cls._writers = {}
+        cls._writers_lock = threading.Lock()
+        cls._generation += 1
     
     def _ensure_log_directory(self):
         """Ensure log directory exists"""
         log_dir = os.path.dirname(self.log_file)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
     
-    def log_agent_action(self, agent_name: str, action: str, details: str = ""):
+    def log_agent_action(self, agent_name: str, action: str, details: str = "", level: int = INFO):
         """Log an agent action"""
+        if not self.is_enabled('agent_action', level):
+            return
+        
+        now = datetime.now()
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'type': 'agent_action',
             'agent': agent_name,
             'action': action,
             'details': details
         }
         self._write_log(log_entry)
-        self._print_log(agent_name, action, details)
+        if SystemLogger._console:
+            self._print_log(agent_name, action, details, now)
     
     def log_user_query(self, query: str):
         """Log user query"""
+        if not self.is_enabled('user_query'):
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'user_query',
@@ -41,6 +315,9 @@ class SystemLogger:
     
     def log_assistant_response(self, response: str):
         """Log assistant response"""
+        if not self.is_enabled('assistant_response'):
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'assistant_response',
@@ -48,53 +325,75 @@ class SystemLogger:
         }
         self._write_log(log_entry)
     
+    def log_span(self, span: Dict[str, Any]):
+        """Log a finished tracing span"""
+        if not self.is_enabled('span'):
+            return
+        
+        log_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'type': 'span',
+            **span
+        }
+        self._write_log(log_entry)
+    
     def log_error(self, error_message: str):
         """Log error"""
+        if not self.is_enabled('error', ERROR):
+            return
+        
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'type': 'error',
             'message': error_message
         }
         self._write_log(log_entry)
-        print(f"❌ ERROR: {error_message}")
+        if SystemLogger._console:
+            print(f"❌ ERROR: {error_message}")
     
     def _write_log(self, log_entry: Dict[str, Any]):
-        """Write log entry to file"""
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry) + '\n')
-        except Exception as e:
-            print(f"Warning: Could not write to log file: {e}")
+        """Queue log entry for the background writer"""
+        self._current_writer().put(json.dumps(log_entry) + '\n')
     
-    def _print_log(self, agent_name: str, action: str, details: str):
+    def _current_writer(self) -> _LogWriter:
+        """Get this logger's writer, starting it on first use and re-attaching after a fork"""
+        if self._writer is None or self._writer_generation != SystemLogger._generation:
+            self._ensure_log_directory()
+            self._writer = self._get_writer(self.log_file)
+            self._writer_generation = SystemLogger._generation
+        return self._writer
+    
+    def flush(self):
+        """Block until every entry logged so far is on disk"""
+        self._current_writer().flush()
+    
+    def _print_log(self, agent_name: str, action: str, details: str, now: datetime):
         """Print log to console with nice formatting"""
-        icons = {
-            'Coordinator': '🎯',
-            'Research': '🔍',
-            'Analysis': '📊',
-            'Memory': '💾'
-        }
-        icon = icons.get(agent_name, '🤖')
+        icon = AGENT_ICONS.get(agent_name, '🤖')
         
-        timestamp = datetime.now().strftime('%H:%M:%S')
+        timestamp = now.strftime('%H:%M:%S')
         print(f"[{timestamp}] {icon} {agent_name}: {action}")
         if details and len(details) < 100:
             print(f"         └─ {details[:80]}")
     
-    def get_logs(self, log_type: str = None, limit: int = 100) -> list:
-        """Retrieve logs from file"""
-        logs = []
+    def get_logs(self, log_type: str = None, limit: int = 100,
+                 since: str = None, until: str = None) -> list:
+        """
+        Retrieve the most recent logs from file, optionally filtered by type and time
+        Tail reads seek from the end of the file; filtered reads use the sidecar index
+        """
+        self.flush()
         try:
-            if os.path.exists(self.log_file):
-                with open(self.log_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        try:
-                            log_entry = json.loads(line.strip())
-                            if log_type is None or log_entry.get('type') == log_type:
-                                logs.append(log_entry)
-                        except json.JSONDecodeError:
-                            continue
+            return LogReader.for_file(self.log_file).get_logs(log_type, limit, since, until)
         except Exception as e:
             print(f"Warning: Could not read log file: {e}")
-        
-        return logs[-limit:] if limit else logs
\ No newline at end of file
+            return []
+    
+    def iter_logs(self, log_type: str = None, since: str = None, until: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream logs oldest first without loading the whole file"""
+        self.flush()
+        return LogReader.for_file(self.log_file).iter_logs(log_type, since, until)
+
+atexit.register(SystemLogger.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=SystemLogger._reset_after_fork)
@@ -0,0 +1,139 @@
+"""
+Profiling - Per-query CPU and allocation profiles
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# cProfile, pstats and tracemalloc are imported when profiling starts, so that
+# entry points can offer --profile without paying for them at startup
+
+
+class QueryProfiler:
+    """
+    Runs queries under cProfile and, optionally, tracemalloc
+    Each profiled query writes <label>.pstats and, with memory tracing,
+    <label>_alloc.txt with the top allocation sites to the output directory
+    Threads started while a query is profiled (e.g. task graph workers)
+    are profiled too and merged into the query's stats
+    """
+
+    def __init__(self, output_dir: str = "outputs", trace_memory: bool = False, top_n: int = 20):
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        self.top_n = top_n
+        self._thread_profiles: List[Any] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def add_arguments(parser):
+        """Add the profiling options to an argparse parser"""
+        parser.add_argument('--profile', action='store_true',
+                            help="profile each query with cProfile and save .pstats files")
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="with --profile, also record top allocation sites with tracemalloc")
+        parser.add_argument('--profile-top', type=int, default=20, metavar='N',
+                            help="number of functions/allocation sites to report (default: 20)")
+
+    @classmethod
+    def from_args(cls, args, output_dir: str = "outputs") -> Optional['QueryProfiler']:
+        """Build a profiler from parsed arguments, or None if profiling is off"""
+        if not args.profile:
+            return None
+        return cls(output_dir=output_dir, trace_memory=args.trace_memory, top_n=args.profile_top)
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[Dict[str, Any]]:
+        """
+        Profile the enclosed block and save the reports under `label`
+        Yields a dict that is filled with the report paths when the block exits
+        """
+        import cProfile
+        import tracemalloc
+
+        report = {}
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.take_snapshot()
+
+        self._thread_profiles = []
+        threading.setprofile(self._profile_thread)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield report
+        finally:
+            profiler.disable()
+            threading.setprofile(None)
+
+            # Snapshot allocations before building the stats allocates anything itself
+            if self.trace_memory:
+                report.update(self._save_allocations(label, baseline))
+                if started_tracing:
+                    tracemalloc.stop()
+            report.update(self._save_stats(label, profiler))
+
+    def _profile_thread(self, frame, event, arg):
+        """Installed in new threads: replace this hook with a per-thread profiler"""
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles through sys.monitoring, which already covers every thread
+            return
+        with self._lock:
+            self._thread_profiles.append(profiler)
+
+    def _save_stats(self, label: str, profiler) -> Dict[str, Any]:
+        """Merge the thread profiles into the query's stats and write the .pstats file"""
+        import io
+        import pstats
+
+        stats = pstats.Stats(profiler)
+        with self._lock:
+            thread_profiles, self._thread_profiles = self._thread_profiles, []
+        for thread_profiler in thread_profiles:
+            # The worker threads have exited by now; collect what they recorded
+            thread_profiler.create_stats()
+            if thread_profiler.stats:
+                stats.add(thread_profiler)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{label}.pstats")
+        stats.dump_stats(path)
+
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        return {'pstats': path, 'summary': summary.getvalue(), 'total_s': stats.total_tt}
+
+    def _save_allocations(self, label: str, baseline) -> Dict[str, Any]:
+        """Write the top allocation sites since the block started"""
+        import tracemalloc
+
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ]
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        current, peak = tracemalloc.get_traced_memory()
+        top_stats = snapshot.compare_to(baseline.filter_traces(filters), 'lineno')[:self.top_n]
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{label}_alloc.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"ALLOCATIONS: {label}\n")
+            f.write(f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n")
+            f.write(f"Top {self.top_n} allocation sites (growth since query start):\n")
+            for stat in top_stats:
+                f.write(f"{stat}\n")
+
+        return {'allocations': path, 'peak_kib': round(peak / 1024, 1)}
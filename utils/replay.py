@@ -0,0 +1,29 @@
+"""
+Replay - Query text from replayed JSONL records
+Shared by the load generator and batch mode
+"""
+
+import json
+from typing import Optional
+
+# Fields tried, in order, when replaying JSONL records
+REPLAY_FIELDS = ('query', 'body', 'title', 'text')
+
+
+def extract_query(line: str, field: Optional[str] = None) -> Optional[str]:
+    """Get the query text from one JSONL record (or a plain text line)"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return line
+    if isinstance(record, str):
+        return record
+    if not isinstance(record, dict):
+        return None
+    for name in ([field] if field else REPLAY_FIELDS):
+        if record.get(name):
+            return str(record[name])
+    return None
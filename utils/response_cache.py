@@ -0,0 +1,131 @@
+"""
+Response Cache - Exact and semantic reuse of coordinator responses
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # numpy is imported on first use to keep startup fast
+    import numpy as np
+
+
+class ResponseCache:
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 256):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.corpus_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'exact_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'latency_saved': 0.0
+        }
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query into an exact-match cache key"""
+        return " ".join(re.sub(r'[^\w\s]', ' ', query.lower()).split())
+
+    def lookup(self, query: str, route: str, corpus_version: Any,
+               embed: Callable[[str], "np.ndarray"]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached response for the query
+        Tries the normalized key first, then the most similar cached query on the same route
+        The query is only embedded when the exact lookup misses
+        """
+        started = time.perf_counter()
+        key = self.normalize(query)
+
+        with self._lock:
+            self._check_corpus_version(corpus_version)
+
+            entry = self._entries.get(key)
+            if entry is not None and entry['route'] == route:
+                match = 'exact'
+            else:
+                entry = self._find_similar(route, embed(query))
+                match = 'semantic'
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(entry['key'])
+            self.stats[f'{match}_hits'] += 1
+            self.stats['latency_saved'] += max(entry['latency'] - (time.perf_counter() - started), 0.0)
+
+            return {
+                'response': entry['response'],
+                'metadata': {**entry['metadata'], 'cache': match, 'cached_query': entry['query']}
+            }
+
+    def store(self, query: str, route: str, corpus_version: Any,
+              embed: Callable[[str], "np.ndarray"], response: str,
+              metadata: Dict[str, Any], latency: float):
+        """Cache a freshly computed response"""
+        key = self.normalize(query)
+        vector = embed(query)
+
+        with self._lock:
+            self._check_corpus_version(corpus_version)
+            self._entries[key] = {
+                'key': key,
+                'query': query,
+                'route': route,
+                'vector': vector,
+                'response': response,
+                'metadata': metadata,
+                'latency': latency
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _find_similar(self, route: str, vector: "np.ndarray") -> Optional[Dict[str, Any]]:
+        """Find the most similar cached entry above the similarity threshold"""
+        import numpy as np
+
+        if not np.any(vector):
+            return None
+
+        best, best_score = None, self.similarity_threshold
+        for entry in self._entries.values():
+            if entry['route'] != route:
+                continue
+            score = float(np.dot(vector, entry['vector']))
+            if score >= best_score:
+                best, best_score = entry, score
+
+        return best
+
+    def _check_corpus_version(self, corpus_version: Any):
+        """Drop every entry when the research corpus has changed"""
+        if corpus_version != self.corpus_version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self.corpus_version = corpus_version
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache hit/miss and latency-saved metrics"""
+        with self._lock:
+            hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,200 @@
+"""
+Query Scheduler - Priority queues and admission control in front of the coordinator
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+from utils.deadline import Deadline
+
+# Relative share of worker time per complexity class
+DEFAULT_WEIGHTS = {'memory': 4, 'simple': 4, 'complex': 2, 'multi-step': 1}
+
+# Maximum number of queued (not yet running) queries per class
+DEFAULT_MAX_DEPTHS = {'memory': 64, 'simple': 64, 'complex': 32, 'multi-step': 16}
+
+# Classes whose queries can be degraded to a research-only answer when overloaded
+HEAVY_CLASSES = ('complex', 'multi-step')
+
+# Workers that only run light (memory and simple) queries, so heavy ones never hold them all
+DEFAULT_RESERVED_WORKERS = 1
+
+
+class QueryScheduler:
+    def __init__(self, coordinator, workers: int = 4,
+                 weights: Optional[Dict[str, int]] = None,
+                 max_depths: Optional[Dict[str, int]] = None,
+                 overload_policy: str = "degrade",
+                 reserved_workers: int = DEFAULT_RESERVED_WORKERS):
+        if overload_policy not in ("degrade", "reject"):
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
+
+        self.coordinator = coordinator
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.max_depths = {**DEFAULT_MAX_DEPTHS, **(max_depths or {})}
+        self.overload_policy = overload_policy
+
+        self._queues = {cls: deque() for cls in self.weights}
+        self._credits = {cls: 0 for cls in self.weights}
+        self._condition = threading.Condition()
+        self._running = True
+        # Heavy queries may run on every worker but the reserved ones (a lone worker runs everything)
+        self.reserved_workers = min(reserved_workers, workers - 1) if workers > 1 else 0
+        self._heavy_limit = workers - self.reserved_workers
+        self._heavy_running = 0
+        # Counted under the class a query was submitted as, even when it was degraded
+        self.stats = {
+            cls: {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'degraded': 0,
+                  'latencies': deque(maxlen=1000)}
+            for cls in self.weights
+        }
+
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"query-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, query: str, deadline: Optional[Deadline] = None,
+               session_id: Optional[str] = None) -> Future:
+        """
+        Queue a query for processing, optionally against a session's memory
+        Returns a Future resolving to {'response': str, 'metadata': {...}}
+        Overloaded classes are degraded or rejected immediately instead of queueing
+        Time spent waiting in the queue counts against the deadline
+        """
+        query_class = self.coordinator.classify_query(query)
+        stats_class = query_class
+        future = Future()
+        route = None
+
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("Scheduler has been shut down")
+
+            self.stats[query_class]['submitted'] += 1
+
+            if len(self._queues[query_class]) >= self.max_depths[query_class]:
+                if (self.overload_policy == "degrade" and query_class in HEAVY_CLASSES
+                        and len(self._queues['simple']) < self.max_depths['simple']):
+                    # Answer from research alone rather than turning the user away
+                    self.stats[query_class]['degraded'] += 1
+                    route = "simple"
+                    query_class = "simple"
+                else:
+                    self.stats[query_class]['rejected'] += 1
+                    future.set_result({
+                        'response': "❌ The system is busy right now. Please try again shortly.",
+                        'metadata': {'route': query_class, 'rejected': True}
+                    })
+                    return future
+
+            self._queues[query_class].append((query, route, deadline, session_id, stats_class, future,
+                                              time.perf_counter()))
+            self._condition.notify()
+
+        return future
+
+    def process_query(self, query: str, deadline: Optional[Deadline] = None,
+                      session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Submit a query and wait for its result"""
+        return self.submit(query, deadline=deadline, session_id=session_id).result()
+
+    def _next_item(self):
+        """
+        Pick the next query using smooth weighted round-robin over the non-empty
+        queues this worker may take from; None if there is nothing it can run
+        Heavy classes are skipped while they already hold every unreserved worker
+        Must be called with the condition held
+        """
+        heavy_full = self._heavy_running >= self._heavy_limit
+        ready = [cls for cls, queue in self._queues.items()
+                 if queue and not (heavy_full and cls in HEAVY_CLASSES)]
+        if not ready:
+            return None
+        total = sum(self.weights[cls] for cls in ready)
+
+        for cls in ready:
+            self._credits[cls] += self.weights[cls]
+        chosen = max(ready, key=lambda cls: self._credits[cls])
+        self._credits[chosen] -= total
+
+        if chosen in HEAVY_CLASSES:
+            self._heavy_running += 1
+        return chosen, self._queues[chosen].popleft()
+
+    def _worker_loop(self):
+        """Worker thread: run queued queries until shut down"""
+        while True:
+            with self._condition:
+                while True:
+                    item = self._next_item()
+                    if item is not None:
+                        break
+                    if not self._running and not any(self._queues.values()):
+                        return
+                    self._condition.wait()
+                query_class, (query, route, deadline, session_id, stats_class, future, enqueued) = item
+
+            failed = False
+            if future.set_running_or_notify_cancel():
+                started = time.perf_counter()
+                try:
+                    result = self.coordinator.process_query_with_metadata(query, route=route, deadline=deadline,
+                                                                          session_id=session_id)
+                    result['metadata']['queue_class'] = query_class
+                    result['metadata']['queue_wait_ms'] = round((started - enqueued) * 1000, 3)
+                    if route:
+                        result['metadata']['degraded'] = True
+                    future.set_result(result)
+                except Exception as e:
+                    failed = True
+                    future.set_exception(e)
+
+            with self._condition:
+                if query_class in HEAVY_CLASSES:
+                    self._heavy_running -= 1
+                    # Workers may be waiting for a heavy slot (or, at shutdown, to exit)
+                    self._condition.notify_all()
+                if future.cancelled():
+                    continue
+                self.stats[stats_class]['failed' if failed else 'completed'] += 1
+                self.stats[stats_class]['latencies'].append(time.perf_counter() - enqueued)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting queries; workers drain the queues before exiting"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def get_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-class queue depth, counts and latency percentiles (ms)"""
+        with self._condition:
+            report = {}
+            for cls, stats in self.stats.items():
+                latencies = sorted(stats['latencies'])
+                report[cls] = {
+                    'queued': len(self._queues[cls]),
+                    'submitted': stats['submitted'],
+                    'completed': stats['completed'],
+                    'failed': stats['failed'],
+                    'rejected': stats['rejected'],
+                    'degraded': stats['degraded'],
+                    'p50_ms': self._percentile(latencies, 50),
+                    'p99_ms': self._percentile(latencies, 99)
+                }
+            return report
+
+    @staticmethod
+    def _percentile(values, pct: float) -> float:
+        """Nearest-rank percentile of sorted seconds, in milliseconds"""
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+        return round(values[index] * 1000, 3)
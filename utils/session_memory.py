@@ -0,0 +1,195 @@
+"""
+Session Memory - Per-session memory agents within a memory budget
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Default budget for all live session memories together
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+class SessionMemoryPool:
+    """
+    One memory agent per session id
+    When the live sessions together exceed the byte budget, the least recently
+    used idle sessions are spilled to disk (or dropped if there is no spill
+    directory) and rehydrated on their next request
+    """
+
+    def __init__(self, factory: Callable[[], Any], budget_bytes: int = DEFAULT_BUDGET_BYTES,
+                 spill_dir: Optional[str] = None):
+        self.factory = factory
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+
+        self._live: OrderedDict = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._in_use: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        # Sessions being read from or written to disk; set once the transfer is done
+        self._transfers: Dict[str, threading.Event] = {}
+        self.stats = {'created': 0, 'rehydrated': 0, 'spilled': 0, 'evicted': 0}
+
+    @contextmanager
+    def use(self, session_id: str, create: bool = True) -> Iterator[Optional[Any]]:
+        """
+        Hold a session's memory agent; it cannot be spilled while in use
+        With create=False an unknown session (neither live nor spilled) is not
+        created and None is yielded instead
+        """
+        memory = self._acquire(session_id, create)
+        try:
+            yield memory
+        finally:
+            if memory is not None:
+                self._release(session_id, memory)
+
+    def _acquire(self, session_id: str, create: bool = True):
+        """
+        Get the live agent for a session, rehydrating or creating it
+        The spill file is read outside the pool lock; other requests for the
+        same session wait for that read, requests for other sessions do not
+        """
+        while True:
+            with self._lock:
+                memory = self._live.get(session_id)
+                if memory is not None:
+                    self._live.move_to_end(session_id)
+                    self._in_use[session_id] = self._in_use.get(session_id, 0) + 1
+                    return memory
+                transfer = self._transfers.get(session_id)
+                if transfer is None:
+                    transfer = self._transfers[session_id] = threading.Event()
+                    break
+            # Being spilled or rehydrated for another request
+            transfer.wait()
+
+        memory, state, size = None, None, 0
+        try:
+            state = self._load_spilled(session_id)
+            if state is not None or create:
+                memory = self.factory()
+                if state is not None:
+                    memory.load_state(state)
+                size = memory.estimate_size()
+        finally:
+            with self._lock:
+                del self._transfers[session_id]
+                if memory is not None:
+                    self.stats['created' if state is None else 'rehydrated'] += 1
+                    self._live[session_id] = memory
+                    self._set_size(session_id, size)
+                    self._in_use[session_id] = self._in_use.get(session_id, 0) + 1
+            transfer.set()
+        return memory
+
+    def _release(self, session_id: str, memory):
+        """Record the session's new size and enforce the budget"""
+        size = memory.estimate_size()
+        with self._lock:
+            self._in_use[session_id] -= 1
+            if not self._in_use[session_id]:
+                del self._in_use[session_id]
+            if self._live.get(session_id) is memory:
+                self._set_size(session_id, size)
+            spills = self._take_idle(over_budget_only=True)
+        self._write_spills(spills)
+
+    def _set_size(self, session_id: str, size: int):
+        """Update a live session's size; caller holds the lock"""
+        self._total_bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+
+    def _take_idle(self, over_budget_only: bool) -> List[Tuple[str, Any, threading.Event]]:
+        """
+        Remove idle sessions from the live set, oldest first, either until the
+        pool is under budget or all of them; caller holds the lock
+        Sessions to be spilled are marked as in transfer and returned
+        """
+        spills = []
+        for session_id in list(self._live):
+            if over_budget_only and self._total_bytes <= self.budget_bytes:
+                break
+            if session_id in self._in_use:
+                continue
+
+            memory = self._live.pop(session_id)
+            self._total_bytes -= self._sizes.pop(session_id, 0)
+            if self.spill_dir:
+                transfer = self._transfers[session_id] = threading.Event()
+                spills.append((session_id, memory, transfer))
+            elif over_budget_only:
+                self.stats['evicted'] += 1
+        return spills
+
+    def _write_spills(self, spills: List[Tuple[str, Any, threading.Event]]):
+        """Write sessions taken by _take_idle() to disk, outside the pool lock"""
+        for session_id, memory, transfer in spills:
+            spilled = False
+            try:
+                spilled = self._spill(session_id, memory)
+            finally:
+                with self._lock:
+                    del self._transfers[session_id]
+                    self.stats['spilled' if spilled else 'evicted'] += 1
+                transfer.set()
+
+    def _spill_path(self, session_id: str) -> str:
+        """File holding a spilled session; ids are hashed so clients cannot pick paths"""
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.json")
+
+    def _spill(self, session_id: str, memory) -> bool:
+        """Write a session's memory to disk; False if it could not be written"""
+        path = self._spill_path(session_id)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'session_id': session_id, **memory.export_state()}, f, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not spill session memory: {e}")
+            return False
+        return True
+
+    def _load_spilled(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Read and remove a spilled session, if there is one"""
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load spilled session memory: {e}")
+            return None
+        # The live agent is authoritative from now on
+        os.remove(path)
+        return state
+
+    def spill_all(self):
+        """Spill every idle live session, e.g. before shutting down"""
+        with self._lock:
+            spills = self._take_idle(over_budget_only=False)
+        self._write_spills(spills)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get live session counts, memory use and spill activity"""
+        with self._lock:
+            return {
+                'live_sessions': len(self._live),
+                'in_use': len(self._in_use),
+                'bytes': self._total_bytes,
+                'budget_bytes': self.budget_bytes,
+                **self.stats
+            }
@@ -0,0 +1,123 @@
+"""
+Task Graph - Dependency-aware scheduling of agent sub-tasks
+"""
+
+import contextvars
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class TaskNode:
+    """A single unit of work in a task graph"""
+
+    def __init__(self, node_id: str, kind: str, clause: str,
+                 func: Callable[[Dict[str, Any]], Any], depends_on: List[str]):
+        self.node_id = node_id
+        self.kind = kind
+        self.clause = clause
+        self.func = func
+        self.depends_on = depends_on
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.duration = None
+        # Result carried over from an earlier run instead of being computed
+        self.restored = False
+
+
+class TaskGraph:
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.nodes: Dict[str, TaskNode] = {}
+        self._started = None
+
+    def add_node(self, node_id: str, kind: str, clause: str,
+                 func: Callable[[Dict[str, Any]], Any],
+                 depends_on: Optional[List[str]] = None) -> TaskNode:
+        """
+        Add a node to the graph
+        Dependencies must already be in the graph, which keeps it acyclic
+        """
+        depends_on = list(depends_on or [])
+        for dep in depends_on:
+            if dep not in self.nodes:
+                raise ValueError(f"Unknown dependency '{dep}' for node '{node_id}'")
+
+        node = TaskNode(node_id, kind, clause, func, depends_on)
+        self.nodes[node_id] = node
+        return node
+
+    def restore(self, node_id: str, result: Any):
+        """Mark a node as already done with a result from an earlier run; it will not be executed"""
+        node = self.nodes[node_id]
+        node.result = result
+        node.restored = True
+
+    def execute(self) -> Iterator[TaskNode]:
+        """
+        Run every node as soon as its dependencies have finished
+        Independent nodes run concurrently; finished nodes are yielded in completion order,
+        after any restored nodes, which are yielded first without running
+        """
+        # Imported here: only multi-step queries need a thread pool
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+        self._started = time.perf_counter()
+        pending = {}
+        running = {}
+        done = set()
+        for node_id, node in self.nodes.items():
+            if node.restored:
+                done.add(node_id)
+                yield node
+            else:
+                pending[node_id] = node
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for node_id, node in list(pending.items()):
+                    if all(dep in done for dep in node.depends_on):
+                        # Pass intermediate results along the edges
+                        inputs = {dep: self.nodes[dep].result for dep in node.depends_on}
+                        # Carry the caller's context (e.g. the open tracing span) into the worker
+                        context = contextvars.copy_context()
+                        running[pool.submit(context.run, self._run_node, node, inputs)] = node
+                        del pending[node_id]
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    done.add(node.node_id)
+                    yield node
+
+    def run(self) -> Dict[str, TaskNode]:
+        """Run the whole graph and return all nodes"""
+        for _ in self.execute():
+            pass
+        return self.nodes
+
+    def _run_node(self, node: TaskNode, inputs: Dict[str, Any]):
+        """Execute a node, recording its timing and any error"""
+        node.started_at = time.perf_counter()
+        try:
+            node.result = node.func(inputs)
+        except Exception as e:
+            node.error = str(e)
+        finally:
+            node.duration = time.perf_counter() - node.started_at
+
+    def get_timings(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-node timings relative to the start of execution"""
+        timings = {}
+        for node_id, node in self.nodes.items():
+            if node.started_at is None:
+                continue
+            timings[node_id] = {
+                'kind': node.kind,
+                'clause': node.clause,
+                'depends_on': node.depends_on,
+                'start_ms': round((node.started_at - self._started) * 1000, 3),
+                'duration_ms': round(node.duration * 1000, 3),
+                'error': node.error
+            }
+        return timings
@@ -0,0 +1,229 @@
+"""
+Tracing - Per-stage latency spans across the agent pipeline
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Generator, Iterator, List, Optional
+from utils.logger import SystemLogger
+
+# The span that new spans are nested under in the current thread/context
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# List that finished spans are also appended to, set by Tracer.collect()
+_collector = contextvars.ContextVar('span_collector', default=None)
+
+_span_ids = itertools.count(1)
+
+# Quantiles reported per stage
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Span:
+    """A timed stage of work within a query"""
+
+    def __init__(self, name: str, query_id: Optional[str], parent_id: Optional[int],
+                 attributes: Dict[str, Any]):
+        self.name = name
+        self.query_id = query_id
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = datetime.now()
+        self.duration = None
+
+    def set_attribute(self, key: str, value: Any):
+        """Attach extra information to the span record"""
+        self.attributes[key] = value
+
+    def to_record(self) -> Dict[str, Any]:
+        """Structured record written to the system log"""
+        return {
+            'name': self.name,
+            'query_id': self.query_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes
+        }
+
+
+class Tracer:
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self.logger = SystemLogger()
+        self._samples: Dict[str, deque] = {}
+        self._totals: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_query_id() -> str:
+        """Generate an id that ties together the spans of one query"""
+        return os.urandom(6).hex()
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        """The innermost open span, if any"""
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, query_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """
+        Time a stage of work on the monotonic clock
+        Spans nest under the enclosing span and inherit its query id
+        """
+        parent = _current_span.get()
+        if query_id is None and parent is not None:
+            query_id = parent.query_id
+
+        span = Span(name, query_id, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - started
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # A generator was finished from another context
+                _current_span.set(parent)
+            self._record(span)
+
+    def stream(self, name: str, generator: Generator, query_id: Optional[str] = None,
+               **attributes) -> Generator:
+        """
+        Run a generator inside a span that times only the generator's own work
+        The span is current while the generator runs, not while its consumer
+        handles a yielded item, so consumer time is not counted and spans the
+        consumer opens between items do not nest under it. The generator's
+        return value is passed through
+        """
+        parent = _current_span.get()
+        if query_id is None and parent is not None:
+            query_id = parent.query_id
+
+        span = Span(name, query_id, parent.span_id if parent else None, attributes)
+        # The innermost span open inside the generator when it last paused
+        inner = span
+        span.duration = 0.0
+        value = None
+        try:
+            while True:
+                outer = _current_span.get()
+                _current_span.set(inner)
+                started = time.perf_counter()
+                try:
+                    item = generator.send(value)
+                except StopIteration as done:
+                    return done.value
+                finally:
+                    span.duration += time.perf_counter() - started
+                    inner = _current_span.get()
+                    _current_span.set(outer)
+                value = yield item
+        finally:
+            generator.close()
+            self._record(span)
+
+    @contextmanager
+    def collect(self) -> Iterator[List[Span]]:
+        """
+        Gather the spans finished inside the block, including those of task
+        graph workers started from it
+        """
+        spans = []
+        token = _collector.set(spans)
+        try:
+            yield spans
+        finally:
+            _collector.reset(token)
+
+    @staticmethod
+    def stage_timings(spans: List[Span]) -> Dict[str, float]:
+        """Total milliseconds per stage over collected spans"""
+        timings: Dict[str, float] = {}
+        for span in spans:
+            timings[span.name] = round(timings.get(span.name, 0.0) + span.duration * 1000, 3)
+        return timings
+
+    def _record(self, span: Span):
+        """Add a finished span to its stage histogram and the system log"""
+        with self._lock:
+            if span.name not in self._samples:
+                self._samples[span.name] = deque(maxlen=self.max_samples)
+                self._totals[span.name] = [0, 0.0]
+            self._samples[span.name].append(span.duration)
+            self._totals[span.name][0] += 1
+            self._totals[span.name][1] += span.duration
+
+        collector = _collector.get()
+        if collector is not None:
+            collector.append(span)
+        self.logger.log_span(span.to_record())
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, mean and p50/p95/p99 latency in milliseconds"""
+        with self._lock:
+            snapshot = {name: (sorted(samples), list(self._totals[name]))
+                        for name, samples in self._samples.items()}
+
+        summary = {}
+        for name, (samples, (count, total)) in snapshot.items():
+            summary[name] = {
+                'count': count,
+                'mean_ms': round(total / count * 1000, 3) if count else 0.0,
+                **{f"p{int(q * 100)}_ms": round(self._quantile(samples, q) * 1000, 3) for q in QUANTILES}
+            }
+        return summary
+
+    def export_prometheus(self, path: str = "logs/metrics.prom") -> str:
+        """Write the per-stage latency summaries in Prometheus text format"""
+        with self._lock:
+            snapshot = {name: (sorted(samples), list(self._totals[name]))
+                        for name, samples in self._samples.items()}
+
+        lines = [
+            "# HELP agent_stage_duration_seconds Latency of agent pipeline stages",
+            "# TYPE agent_stage_duration_seconds summary"
+        ]
+        for name, (samples, (count, total)) in sorted(snapshot.items()):
+            for q in QUANTILES:
+                lines.append(
+                    f'agent_stage_duration_seconds{{stage="{name}",quantile="{q}"}} {self._quantile(samples, q):.6f}'
+                )
+            lines.append(f'agent_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'agent_stage_duration_seconds_count{{stage="{name}"}} {count}')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+    def reset(self):
+        """Drop all collected samples"""
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    @staticmethod
+    def _quantile(samples, q: float) -> float:
+        """Nearest-rank quantile of sorted samples"""
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+
+# Process-wide tracer shared by all agents
+tracer = Tracer()